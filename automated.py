@@ -14,8 +14,11 @@ Test procedure is:
   electrical contact with the DUT. For pre-flex-bonding units (backplanes, sensor arrays),
   this is an interactive function that gives audio feedback until electrical contact is made
   on both loopbacks
-* Tests -- depends on 1T or 3T array type, each test saves its own output CSV file
+* Tests -- depends on 1T or 3T array type, each test saves its own output CSV file.
+  Finished cells/tests are checkpointed, so an interrupted run can be resumed where it stopped
 * Data saving -- saves *summary.txt of the entire test, and uploads summary to Google Sheets
+  through a local outbox that retries until the upload succeeds, see RESULTS_OUTBOX_FILENAME
+  (plus a *trace.json timeline of the run, see TRACE_RUNS_DEFAULT)
 * File compare -- provides the option to compare summary files with a previous test
 
 Dependencies: test_helper_functions.py. See that file for the list of required
@@ -34,7 +37,12 @@ def main():
         inst = None
         psu = None
         tester_serial_number = None
+        start_run_trace()           # timeline of the run, saved next to the summary file
         ser, inst, psu, tester_serial_number = init_equipment_with_config(rm, debug_mode=SET_DEBUG_MODE)
+        # hold the PSU on for the whole run, so the test suites don't switch it on/off each time;
+        # shutdown_equipment turns it off at the end or on error. It powers up in the background
+        # while the DUT information is entered, and is waited on before the first measurement
+        tester_power_up = start_tester_power_up(ser, inst, psu)
         print("\nSetup Instructions:\n" +
             "- Connect multimeter (+) lead to secondary mux board ROW (+)/red wire\n" +
             "- Connect multimeter (-) lead to secondary mux board COL (+)/red wire\n" +
@@ -57,6 +65,7 @@ def main():
 
         # Query full name of entered device ID from Google Sheets
         creds = get_creds()
+        start_results_outbox(creds)     # also uploads results an earlier run couldn't
         dut_name_input = get_array_full_name(creds, dut_name_input_raw)
 
         # If a valid array name, or a substring of an array name, is entered...
@@ -185,6 +194,23 @@ def main():
         dut_name_full += dut_stage_input
         print(str(array_tft_type) + "T test data for " + dut_name_full + " will save to path " + path + "\n")
 
+        # offer to resume an interrupted run of the same DUT + stage on this tester
+        resume_run = False
+        if (os.path.exists(get_checkpoint_filename(path, dut_name_full, tester_serial_number))):
+            print("An earlier run of " + dut_name_full + " on this tester was interrupted.")
+            valid_responses = {'': "resume, skipping the cells and tests already measured", 'N': "start over"}
+            resume_run = (query_valid_response(valid_responses) == '')
+        start_run_checkpoint(path, dut_name_full, tester_serial_number, resume_run)
+        # shutdown_equipment saves the trace here if the run is interrupted or crashes
+        set_run_trace_filename(path + datetime_now.strftime('%Y-%m-%d_%H-%M-%S') + "_" + dut_name_full + "_summary.txt")
+
+        # after a re-probe/re-bond, optionally only retest the cells that failed in the previous run
+        retest_failures = False
+        if (not resume_run and len(glob.glob(glob.escape(path) + "*_" + glob.escape(dut_name_full) + "_*.csv")) > 0):
+            print("Found previous results for " + dut_name_full + ".")
+            valid_responses = {'': "measure every cell", 'R': "retest only the cells that failed last time"}
+            retest_failures = (query_valid_response(valid_responses) == 'R')
+
         loop_one_res = 0
         loop_two_res = 0
         out_string = (datetime_now.strftime('%Y-%m-%d %H:%M:%S') + "\n" +
@@ -195,6 +221,7 @@ def main():
                     "Tester S/N: " + tester_serial_number + "\n" +
                     "\nIf there are shorts, the output (.) means open and (X) means short\n\n")
 
+        init_helper(tester_power_up.result())
         if (array_stage_raw in [1, 2]): # Runs loopback check on bare backplanes and sensor arrays not bonded to flex
             print("Press 'q' to skip loopback check...")
             (loop_one_res, loop_two_res) = test_loopback_resistance(ser, inst, silent=SET_LOOPBACK_SILENT)
@@ -240,13 +267,13 @@ def main():
 
             if (special_test_state == 1): # only run capacitance and TFT ON tests
                 output_payload_gsheets_dict, out_string_test = test_cap_tft_array_1t(ser, inst, psu, path, dut_name_input,
-                                                                                     dut_stage_input, array_stage_text)
+                                                                                     dut_stage_input, array_stage_text, retest=retest_failures)
                 out_string += out_string_test
             elif (special_test_state == 2):
-                output_payload_gsheets_dict, out_string_test, has_shorts = test_cont_array_1t(ser, inst, psu, path, dut_name_full)
+                output_payload_gsheets_dict, out_string_test, has_shorts = test_cont_array_1t(ser, inst, psu, path, dut_name_full, retest=retest_failures)
                 out_string += out_string_test
             else:
-                output_payload_gsheets_cont_dict, out_string_cont_test, has_shorts = test_cont_array_1t(ser, inst, psu, path, dut_name_full)
+                output_payload_gsheets_cont_dict, out_string_cont_test, has_shorts = test_cont_array_1t(ser, inst, psu, path, dut_name_full, retest=retest_failures)
                 out_string += out_string_cont_test
 
                 response = ""
@@ -263,7 +290,7 @@ def main():
                         response = ""
                 if (response.lower() == "test"):
                     output_payload_gsheets_captft_dict, out_string_test = test_cap_tft_array_1t(ser, inst, psu, path, dut_name_input,
-                                                                                         dut_stage_input, array_stage_text)
+                                                                                         dut_stage_input, array_stage_text, retest=retest_failures)
                     output_payload_gsheets_dict = merge_dict_b_into_a(output_payload_gsheets_cont_dict, output_payload_gsheets_captft_dict)
                     out_string += "\n" + out_string_test
                 else:
@@ -271,7 +298,7 @@ def main():
 
         # 3T array testing
         elif (array_tft_type == 3):
-            output_payload_gsheets_dict, out_string_test = test_cont_array_3t(ser, inst, psu, path, dut_name_full)
+            output_payload_gsheets_dict, out_string_test = test_cont_array_3t(ser, inst, psu, path, dut_name_full, retest=retest_failures)
             out_string += out_string_test
         else:
             print("Undefined array TFT type, skipping all tests...")
@@ -294,14 +321,11 @@ def main():
         output_payload_gsheets_dict["Loopback One (ohm)"] = loop_one_res
         output_payload_gsheets_dict["Loopback Two (ohm)"] = loop_two_res
 
-        output_payload_gsheets = list(output_payload_gsheets_dict.values())
-        write_success = write_to_spreadsheet(creds, output_payload_gsheets)
-        if (write_success):
-            print("Successfully wrote data to Google Sheets!")
-        else:
-            print("ERROR: Could not write data to Google Sheets")
+        # queues the upload while the PSU turns off, then clears the checkpoint and saves the run trace
+        asyncio.run(finish_run_async(psu, creds, output_payload_gsheets_dict, output_filename_full))
+        print("Queued data for upload to Google Sheets")
 
-        shutdown_equipment(ser, inst, psu, False)
+        shutdown_equipment(ser, inst, psu, False)      # waits for the upload (RESULTS_UPLOAD_FLUSH_TIMEOUT)
 
         # --- begin file compare section ---
 
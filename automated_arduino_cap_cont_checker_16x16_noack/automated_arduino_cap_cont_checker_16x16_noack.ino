@@ -18,6 +18,47 @@ const int AUTO_N_ROW_MODE_SEL = 13;
 
 const int DELAY_TIME = 10;
 
+const char FRAME_START = '<';
+const char FRAME_END = '>';
+const int MAX_FRAME_LENGTH = 32;
+const unsigned long FRAME_TIMEOUT_MS = 50;
+
+// Optional acknowledged mode: once enabled with '[', every command (or whole frame) is answered with
+// ACK_CHAR after the mux pins have settled, or NAK_CHAR if a frame was dropped. ']' goes back to
+// the default no-ack behavior, which older host code relies on.
+const char ACK_MODE_ON = '[';
+const char ACK_MODE_OFF = ']';
+const char ACK_CHAR = 0x06;
+const char NAK_CHAR = 0x15;
+const unsigned int MUX_SETTLE_TIME_US = 500;
+bool ackMode = false;
+
+// Autonomous scan sequencer: the host sends the scan type and range once as "{" + 8 characters + "}",
+// e.g. "{UR0fL0fO}" = secondary mode, dim1 write mode, dim1 start, dim1 end, dim2 write mode,
+// dim2 start, dim2 end, output mode (start/end are inclusive hex indices).
+// The tester is set to the first cell, then steps to the next cell (dim2 fastest) on every 'G' from
+// the host or falling edge on SCAN_TRIGGER_PIN (e.g. DMM trigger out). After the last cell, or on 'H',
+// the scan stops and the tester is set to all off.
+const char SCAN_START = '{';
+const char SCAN_END = '}';
+const char SCAN_NEXT = 'G';
+const char SCAN_HALT = 'H';
+const int SCAN_SETUP_LENGTH = 8;
+const int SCAN_TRIGGER_PIN = 19;
+const char HEX_CHARS[] = "0123456789abcdef";
+bool scanActive = false;
+char scanSecondary = ' ';
+char scanDim1Mode = ' ';
+char scanDim2Mode = ' ';
+char scanOutputMode = ' ';
+int scanDim1Start = 0;
+int scanDim1End = 0;
+int scanDim2Start = 0;
+int scanDim2End = 0;
+int scanDim1 = 0;
+int scanDim2 = 0;
+volatile unsigned int scanTriggerCount = 0;
+
 void setup() {
   for (int i=0;i<4;i++)
   {
@@ -48,6 +89,8 @@ void setup() {
   pinMode(AUTO_ROW_MUX_EN, OUTPUT);
   pinMode(AUTO_N_ROW_DEC_EN, OUTPUT);
   pinMode(AUTO_N_ROW_MODE_SEL, OUTPUT);
+  pinMode(SCAN_TRIGGER_PIN, INPUT_PULLUP);
+  attachInterrupt(digitalPinToInterrupt(SCAN_TRIGGER_PIN), onScanTrigger, FALLING);
   offMode();
   Serial.begin(115200);
 }
@@ -93,6 +136,12 @@ the reason we're using these names is because we're limited to one character + c
 - '&' for loopback 1A/1B resistance
 - '*' for loopback 2A/2B resistance
 - '(' for writing secondary board to "SHIELD/PZBIAS" output
+- '<' ... '>' for a framed command, e.g. "<ZUR3L5O>", applied in order once the whole frame is received
+- '[' to enable acknowledged mode (tester replies ACK/NAK after each command or frame)
+- ']' to disable acknowledged mode (default)
+- '{' ... '}' for setting up a scan, e.g. "{UR0fL0fO}", see SCAN_START
+- 'G' for stepping the scan to the next cell
+- 'H' for halting the scan (all off)
 */
 bool hasPrinted = false;
 
@@ -101,8 +150,164 @@ void loop() {
   if (Serial.available() > 0) { // > 0
     cmd = Serial.read();
     hasPrinted = false;
+    bool success = true;
+    if (cmd == FRAME_START) { // framed command, apply the whole mux state at once
+      success = handleFrame();
+    }
+    else if (cmd == SCAN_START) { // scan setup, step through the range on 'G' or trigger
+      success = handleScanSetup();
+    }
+    else {
+      handleCommand(cmd);
+    }
+    if (ackMode) {
+      delayMicroseconds(MUX_SETTLE_TIME_US);
+      Serial.write(success ? ACK_CHAR : NAK_CHAR);
+    }
+  }
+  if (scanActive && (scanTriggerCount > 0)) { // hardware trigger, step without replying to the host
+    noInterrupts();
+    scanTriggerCount--;
+    interrupts();
+    advanceScan();
+  }
+}
+
+void onScanTrigger() {
+  scanTriggerCount++;
+}
+
+int hexToInt(char c) {
+  char cs[2] = {c, 0};
+  return (int) strtol(cs, 0, 16);
+}
+
+/*
+Reads the rest of a scan setup ('{' ... '}'), sets the tester to the first cell of the scan and
+starts the sequencer. Invalid setups are dropped and the tester is set to all off.
+Returns true if the scan was started, false if the setup was dropped.
+*/
+bool handleScanSetup() {
+  char setup[SCAN_SETUP_LENGTH];
+  int setupLength = 0;
+  unsigned long startTime = millis();
+  scanActive = false;
+  while (millis() - startTime < FRAME_TIMEOUT_MS) {
+    if (Serial.available() > 0) {
+      char c = Serial.read();
+      if (c == SCAN_END) {
+        if ((setupLength == SCAN_SETUP_LENGTH) &&
+            isHexadecimalDigit(setup[2]) && isHexadecimalDigit(setup[3]) &&
+            isHexadecimalDigit(setup[5]) && isHexadecimalDigit(setup[6])) {
+          scanSecondary = setup[0];
+          scanDim1Mode = setup[1];
+          scanDim1Start = hexToInt(setup[2]);
+          scanDim1End = hexToInt(setup[3]);
+          scanDim2Mode = setup[4];
+          scanDim2Start = hexToInt(setup[5]);
+          scanDim2End = hexToInt(setup[6]);
+          scanOutputMode = setup[7];
+          if ((scanDim1End >= scanDim1Start) && (scanDim2End >= scanDim2Start)) {
+            scanDim1 = scanDim1Start;
+            scanDim2 = scanDim2Start;
+            handleCommand('Z');
+            handleCommand(scanSecondary);
+            applyScanAddress();
+            noInterrupts();
+            scanTriggerCount = 0;
+            interrupts();
+            scanActive = true;
+            return true;
+          }
+        }
+        break;
+      }
+      if (setupLength >= SCAN_SETUP_LENGTH) {
+        break;
+      }
+      setup[setupLength] = c;
+      setupLength++;
+    }
+  }
+  state = 'Z';
+  offMode();
+  return false;
+}
+
+void applyScanAddress() {
+  handleCommand(scanDim1Mode);
+  handleCommand(HEX_CHARS[scanDim1]);
+  handleCommand(scanDim2Mode);
+  handleCommand(HEX_CHARS[scanDim2]);
+  handleCommand(scanOutputMode);
+}
+
+void advanceScan() {
+  if (!scanActive) {
+    return;
+  }
+  if (scanDim2 < scanDim2End) {
+    scanDim2++;
+  }
+  else if (scanDim1 < scanDim1End) {
+    scanDim1++;
+    scanDim2 = scanDim2Start;
+  }
+  else { // last cell done
+    scanActive = false;
+    handleCommand('Z');
+    return;
+  }
+  applyScanAddress();
+}
+
+/*
+Reads the rest of a framed command ('<' ... '>') and applies every character in it, in order,
+as if each one had been sent on its own. The frame is buffered completely before anything
+is applied, so the host can send the full mux state (e.g. "<ZUR3L5O>") in a single write.
+Incomplete or oversized frames are dropped and the tester is set to all off.
+Returns true if the frame was applied, false if it was dropped.
+*/
+bool handleFrame() {
+  char frame[MAX_FRAME_LENGTH];
+  int frameLength = 0;
+  unsigned long startTime = millis();
+  while (millis() - startTime < FRAME_TIMEOUT_MS) {
+    if (Serial.available() > 0) {
+      char c = Serial.read();
+      if (c == FRAME_END) {
+        for (int i=0; i<frameLength; i++) {
+          handleCommand(frame[i]);
+        }
+        return true;
+      }
+      if (frameLength >= MAX_FRAME_LENGTH) {
+        break;
+      }
+      frame[frameLength] = c;
+      frameLength++;
+    }
+  }
+  state = 'Z';
+  offMode();
+  return false;
+}
+
+void handleCommand(char cmd) {
+  if (cmd == ACK_MODE_ON) { // reply to every command once the muxes have settled
+    ackMode = true;
+  }
+  else if (cmd == ACK_MODE_OFF) { // back to default no-reply mode
+    ackMode = false;
+  }
+  else if (cmd == SCAN_NEXT) { // step the scan sequencer to the next cell
+    advanceScan();
+  }
+  else if (cmd == SCAN_HALT) { // stop the scan sequencer and turn everything off
+    scanActive = false;
+    handleCommand('Z');
   }
-  if (cmd == 'O') { // continuity check mode
+  else if (cmd == 'O') { // continuity check mode
     state = 'O';
     digitalWrite(N_ROW_MODE_SEL, HIGH);
     digitalWrite(N_ROW_DEC_EN, HIGH);
@@ -26,6 +26,7 @@ def main():
 
         # Query wafer ID from Google Sheets to determine if it's a BT2 or BT3 wafer
         creds = get_creds()
+        start_results_outbox(creds)     # also uploads results an earlier run couldn't
         wafer_name_input = wafer_name_input_raw.strip().upper()
         wafer_build_type_raw = str(get_wafer_build_type(creds, wafer_name_input, debug_mode_in=SET_DEBUG_MODE))
         wafer_build_type = ""
@@ -59,6 +60,10 @@ def main():
         print("Connecting equipment...")
         rm = pyvisa.ResourceManager()
         ser, inst, psu, tester_serial_number = init_equipment_with_config(rm, debug_mode=SET_DEBUG_MODE)
+        # hold the PSU on for the whole run, so the test suites don't switch it on/off each time;
+        # shutdown_equipment turns it off at the end or on error. It powers up in the background
+        # while the recipe and first die are selected, and is waited on before the first measurement
+        tester_power_up = start_tester_power_up(ser, inst, psu)
         
         print("\nRunning tests for BT" + str(wafer_build_type) + " wafer build type...")
 
@@ -113,6 +118,7 @@ def main():
                     list_of_test_coords.append(die_address)
 
         for coord in list_of_test_coords:
+            start_run_trace()       # one timeline per die, saved next to its summary file
             dut_name =  wafer_name_input + "-" + coord
             dut_name_full = dut_name + "_" + wafer_assy_stage_text
             tft_type = get_array_transistor_type(creds, dut_name, debug_mode_in=SET_DEBUG_MODE)
@@ -152,6 +158,8 @@ def main():
                 loop_one_res = 0
                 loop_two_res = 0
                 datetime_now = dt.datetime.now()
+                # shutdown_equipment saves the trace here if the die's run is interrupted or crashes
+                set_run_trace_filename(path_base + datetime_now.strftime('%Y-%m-%d_%H-%M-%S') + "_" + dut_name_full + "_summary.txt")
                 out_string = (datetime_now.strftime('%Y-%m-%d %H:%M:%S') + "\n" +
                 "Array ID: " + dut_name + "\n" +
                 "Array Stage: " + wafer_assy_stage_text + "\n" +
@@ -160,6 +168,7 @@ def main():
                 "Tester S/N: " + tester_serial_number + "\n" +
                 "\nIf there are shorts, the output (.) means open and (X) means short\n\n")
 
+                init_helper(tester_power_up.result())
                 print("Press 'q' to skip loopback check...")
                 (loop_one_res, loop_two_res) = test_loopback_resistance(ser, inst, silent=SET_LOOPBACK_SILENT)
                 out_string += "Loopback 1 resistance: " + str(loop_one_res) + " ohms" + "\n"
@@ -231,12 +240,9 @@ def main():
                     output_payload_gsheets_dict["TFT Type"]             = str(tft_type) + "T"
                     output_payload_gsheets_dict["Loopback One (ohm)"] = loop_one_res
                     output_payload_gsheets_dict["Loopback Two (ohm)"] = loop_two_res
-                    output_payload_gsheets = list(output_payload_gsheets_dict.values())
-                    write_success = write_to_spreadsheet(creds, output_payload_gsheets)
-                    if (write_success):
-                        print("Successfully wrote data from " + str(coord) + " to Google Sheets!")
-                    else:
-                        print("ERROR: Could not write data to Google Sheets")
+                    queue_results_upload(creds, output_payload_gsheets_dict)   # uploaded in one batch per wafer
+                    print("Queued data from " + str(coord) + " for upload to Google Sheets")
+                    save_run_trace(output_filename_full)
                 elif (tft_type == 3):
                     output_payload_gsheets_dict, out_string_test = test_cont_array_3t(ser, inst, psu, path_base, dut_name_full)
                     out_string += out_string_test
@@ -255,16 +261,14 @@ def main():
                     output_payload_gsheets_dict["TFT Type"]             = str(tft_type) + "T"
                     output_payload_gsheets_dict["Loopback One (ohm)"] = loop_one_res
                     output_payload_gsheets_dict["Loopback Two (ohm)"] = loop_two_res
-                    output_payload_gsheets = list(output_payload_gsheets_dict.values())
-                    write_success = write_to_spreadsheet(creds, output_payload_gsheets)
-                    if (write_success):
-                        print("Successfully wrote data from " + str(coord) + " to Google Sheets!")
-                    else:
-                        print("ERROR: Could not write data to Google Sheets")
+                    queue_results_upload(creds, output_payload_gsheets_dict)   # uploaded in one batch per wafer
+                    print("Queued data from " + str(coord) + " for upload to Google Sheets")
+                    save_run_trace(output_filename_full)
                 else:
                     print("Undefined array TFT type, skipping all tests...")
                     pass
         print("\nDone with tests! Exiting...")
+        flush_results_outbox()      # uploads the wafer's rows while the equipment shuts down
         shutdown_equipment(ser, inst, psu, exit_program=True)
     except KeyboardInterrupt:
         print("\nProgram interrupted. Exiting program...")
@@ -0,0 +1,286 @@
+'''
+This program benchmarks the 1T/3T test suites without a probe station, by running them against
+the simulated tester (Tester_Sim, see tester_hw_test_classes.py) with its timing model turned on.
+
+For each suite it reports:
+* Wall time and cells measured per second
+* Time split between serial (Arduino), DMM, PSU, sleeps and file I/O in the scan thread,
+  plus file I/O done by the background result consumer (overlaps the scan, not part of the split)
+
+Results are appended as one JSON object per run to BENCHMARK_RESULTS_FILENAME (tester_hw_configs.py),
+tagged with the git commit, so scan loop changes can be compared commit to commit.
+
+With --inventory-rows it instead times the Google Sheets inventory lookups (TFT type, wafer build type,
+full name wildcard search) against a synthetic in-memory inventory of that many rows, so lookups can be
+checked to stay sub-millisecond as the sheet grows.
+
+Usage:
+    python benchmark.py [--suites cont_1t cont_3t cap_1t] [--repeat N] [--no-ack] [--no-timing]
+                        [--output benchmark_results.jsonl]
+    python benchmark.py --plans [--no-ack]     (dry run: serial byte/sleep budget of every 2D scan plan)
+    python benchmark.py --inventory-rows 100000 [--output benchmark_results.jsonl]
+
+Dependencies: test_helper_functions.py
+'''
+
+import argparse
+import builtins
+import json
+import random
+import subprocess
+import tempfile
+import threading
+from collections import defaultdict
+
+import test_helper_functions as thf
+from test_helper_functions import *
+
+BENCHMARK_SUITES = {
+    "cont_1t": lambda ser, inst, psu, path: thf.test_cont_array_1t(ser, inst, psu, path, "BENCH"),
+    "cont_3t": lambda ser, inst, psu, path: thf.test_cont_array_3t(ser, inst, psu, path, "BENCH"),
+    "cap_1t" : lambda ser, inst, psu, path: thf.test_cap_tft_array_1t(ser, inst, psu, path, "BENCH_T1_x",
+                                                                      "bench", "Sensor Modules")
+}
+
+'''
+Accumulates time spent in each category (serial, dmm, psu, sleep, file_io), per thread.
+Only the outermost timed call counts, e.g. the DMM's simulated reading time isn't also counted as sleep.
+'''
+class Benchmark_Timer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.main_thread = threading.main_thread()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.totals = defaultdict(float)
+            self.counts = defaultdict(int)
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    '''
+    Returns a wrapper that times each call to func under the given category
+    '''
+    def wrap(self, category, func):
+        def timed(*args, **kwargs):
+            if (getattr(self.local, "active", False)):
+                return func(*args, **kwargs)
+            self.local.active = True
+            start_time = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start_time
+                self.local.active = False
+                key = category
+                if (threading.current_thread() is not self.main_thread):
+                    key += "_background"
+                with self.lock:
+                    self.totals[key] += elapsed
+        return timed
+
+'''
+File object wrapper that times writes/closes as file I/O
+'''
+class Timed_File:
+    def __init__(self, file, timer):
+        self.file = file
+        self.write = timer.wrap("file_io", file.write)
+        self.close = timer.wrap("file_io", file.close)
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+    def __enter__(self):
+        return self
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+    def __iter__(self):
+        return iter(self.file)
+
+'''
+Instruments the simulated tester and test_helper_functions so the benchmark timer sees every
+serial write/read, DMM and PSU command, sleep and result file write
+Parameters:
+    sim: Tester_Sim being benchmarked
+    timer: Benchmark_Timer to accumulate into
+Returns: None
+'''
+def instrument(sim, timer):
+    sim.arduino.write = timer.wrap("serial", sim.arduino.write)
+    sim.arduino.read = timer.wrap("serial", sim.arduino.read)
+    sim.dmm.query = timer.wrap("dmm", sim.dmm.query)
+    sim.dmm.write = timer.wrap("dmm", sim.dmm.write)
+    sim.psu.query = timer.wrap("psu", sim.psu.query)
+    sim.psu.write = timer.wrap("psu", sim.psu.write)
+    time.sleep = timer.wrap("sleep", time.sleep)
+    open_file = timer.wrap("file_io", builtins.open)
+    thf.open = lambda *args, **kwargs: Timed_File(open_file(*args, **kwargs), timer)
+    Test_Result_Array.save_alt_csv = timer.wrap("file_io", Test_Result_Array.save_alt_csv)
+    # count cells: every reading handed to the result consumer, plus every node measurement
+    consumer_put = Scan_Result_Consumer.put
+    def counted_put(consumer, *args):
+        timer.count("cells")
+        consumer_put(consumer, *args)
+    Scan_Result_Consumer.put = counted_put
+    test_cont_node = thf.test_cont_node
+    def counted_test_cont_node(*args, **kwargs):
+        timer.count("cells")
+        return test_cont_node(*args, **kwargs)
+    thf.test_cont_node = counted_test_cont_node
+
+'''
+Builds a synthetic inventory sheet: every row is a module on one of the wafers, with a unique flex
+serial number at the end of its die ID, like 'E2421-002-001-E5_T1_R1-103'
+Parameters:
+    num_rows: Number of rows
+    seed: Random seed
+Returns:
+    Dictionary {column letter: list of cell values} for Sheets_Inventory.load_snapshot()
+'''
+def make_synthetic_inventory(num_rows, seed=0):
+    rng = random.Random(seed)
+    values = {'A': ["DieID"], 'L': ["Wafer ID"], 'M': ["Mask"], 'R': ["TFT Type"]}
+    for i in range(num_rows):
+        wafer_id = "E" + str(2400 + (i // 4000) % 100) + "-" + str((i // 40) % 100).zfill(3)
+        die_id = wafer_id + "-" + str(i % 40).zfill(3) + "-E" + str(rng.randint(1, 9))
+        tft_type = rng.choice(["1T", "3T", "FS-1T", "FS-3T"])
+        values['A'].append(die_id + "_T" + tft_type[-2] + "_R1-" + str(100000 + i))
+        values['L'].append(wafer_id)
+        values['M'].append("BT" + str(rng.randint(1, 3)))
+        values['R'].append(tft_type)
+    return values
+
+'''
+Times each inventory lookup against a synthetic inventory (no Google Sheets access)
+Parameters:
+    num_rows: Number of rows in the synthetic inventory
+    num_lookups: Number of lookups of each kind
+Returns:
+    Dictionary with the index build times and mean/max time per lookup kind, in ms
+'''
+def benchmark_inventory(num_rows, num_lookups=1000):
+    creds = object()                                # never used, the snapshot is loaded directly
+    values = make_synthetic_inventory(num_rows)
+    get_sheets_inventory(creds).load_snapshot(values)
+    rng = random.Random(1)
+    rows = [rng.randint(1, num_rows) for i in range(num_lookups)]
+    lookups = {
+        "tft_type":    lambda row: get_array_transistor_type(creds, values['A'][row]),
+        "wafer_build": lambda row: get_wafer_build_type(creds, values['L'][row]),
+        "full_name":   lambda row: get_array_full_name(creds, values['A'][row].split("-")[-1])  # flex serial
+    }
+    results = {"rows": num_rows, "lookups": num_lookups}
+    for (name, lookup) in lookups.items():
+        start_time = time.perf_counter()
+        lookup(rows[0])                             # first lookup builds the index
+        results[name + "_first_ms"] = round((time.perf_counter() - start_time)*1000, 3)
+        times = []
+        for row in rows:
+            start_time = time.perf_counter()
+            lookup(row)
+            times.append(time.perf_counter() - start_time)
+        results[name + "_mean_ms"] = round(sum(times)/len(times)*1000, 4)
+        results[name + "_max_ms"] = round(max(times)*1000, 4)
+    return results
+
+def get_git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception as e:
+        return ""
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the test suites against the simulated tester")
+    parser.add_argument("--suites", nargs="+", default=list(BENCHMARK_SUITES.keys()), choices=list(BENCHMARK_SUITES.keys()))
+    parser.add_argument("--repeat", type=int, default=1, help="number of times to run each suite")
+    parser.add_argument("--no-ack", action="store_true", help="use fixed serial delays instead of acknowledged mode")
+    parser.add_argument("--no-timing", action="store_true", help="zero the simulator's serial, mux settle, DMM latency and PSU ramp times (DMM integration time is kept)")
+    parser.add_argument("--output", default=BENCHMARK_RESULTS_FILENAME, help="JSON lines file to append results to")
+    parser.add_argument("--plans", action="store_true", help="only print the serial budget of every 2D scan plan (dry run)")
+    parser.add_argument("--inventory-rows", type=int, help="only benchmark inventory lookups on a synthetic inventory of this many rows")
+    args = parser.parse_args()
+    if (args.plans):
+        dry_run_scan_plans(ack_mode=(not args.no_ack))
+        return
+    if (args.inventory_rows is not None):
+        results = {
+            "timestamp": dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "commit": get_git_commit(),
+            "inventory": benchmark_inventory(args.inventory_rows)
+        }
+        print("\nInventory lookup benchmark (commit " + results["commit"] + "): " + str(results["inventory"]))
+        with open(args.output, 'a') as file:
+            file.write(json.dumps(results) + "\n")
+        print("Results appended to " + args.output)
+        return
+
+    # seeded, fault-free array so every run measures the same thing
+    thf.SIM_SHORTS = []
+    thf.SIM_OPENS = []
+    thf.SIM_SEED = 0
+    if (args.no_timing):
+        (thf.SIM_SERIAL_BYTE_TIME, thf.SIM_MUX_SETTLE_TIME, thf.SIM_DMM_LATENCY,
+         thf.SIM_DMM_JITTER, thf.SIM_PSU_RAMP_TIME) = (0, 0, 0, 0, 0)
+    thf.query_valid_response = lambda options: ""   # take the default answer to every prompt
+    sim = get_tester_sim()
+    timer = Benchmark_Timer()
+    instrument(sim, timer)
+
+    ser = init_serial("SIM", debug_mode_in=True, ack_mode=(not args.no_ack))
+    inst = init_multimeter(None, debug_mode_in=True)
+    psu = init_psu(None, debug_mode_in=True)
+    path = tempfile.mkdtemp(prefix="benchmark_") + os.sep
+    init_helper(psu.acquire())                      # held for the whole run, like automated.py
+
+    results = {
+        "timestamp": dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "commit": get_git_commit(),
+        "config": {
+            "ack_mode": isinstance(ser, Serial_Ack_Transport) and ser.ack_mode,
+            "timing_model": not args.no_timing,
+            "serial_delay_time": SERIAL_DELAY_TIME,
+            "sim_serial_byte_time": thf.SIM_SERIAL_BYTE_TIME,
+            "sim_mux_settle_time": thf.SIM_MUX_SETTLE_TIME,
+            "sim_dmm_latency": thf.SIM_DMM_LATENCY,
+            "sim_dmm_jitter": thf.SIM_DMM_JITTER,
+            "dmm_profile_cont": DMM_PROFILE_CONT,
+            "dmm_profile_cap": DMM_PROFILE_CAP
+        },
+        "suites": {}
+    }
+    for suite in args.suites:
+        runs = []
+        for i in range(args.repeat):
+            timer.reset()
+            start_time = time.perf_counter()
+            BENCHMARK_SUITES[suite](ser, inst, psu, path)
+            wall_time = time.perf_counter() - start_time
+            split = {category: round(timer.totals[category], 4)
+                     for category in ("serial", "dmm", "psu", "sleep", "file_io")}
+            split["other"] = round(wall_time - sum(split.values()), 4)
+            runs.append({
+                "wall_time_s": round(wall_time, 4),
+                "cells": timer.counts["cells"],
+                "cells_per_s": round(timer.counts["cells"]/wall_time, 2),
+                "time_split_s": split,
+                "file_io_background_s": round(timer.totals["file_io_background"], 4)
+            })
+        results["suites"][suite] = runs
+    shutdown_equipment(ser, inst, psu)
+
+    print("\nBenchmark results (commit " + results["commit"] + "):")
+    for suite in results["suites"]:
+        for run in results["suites"][suite]:
+            print("  " + suite + ": " + str(run["wall_time_s"]) + " s, " + str(run["cells"]) + " cells, " +
+                  str(run["cells_per_s"]) + " cells/s, split " + str(run["time_split_s"]))
+    with open(args.output, 'a') as file:
+        file.write(json.dumps(results) + "\n")
+    print("Results appended to " + args.output)
+
+if (__name__ == "__main__"):
+    sys.exit(main())
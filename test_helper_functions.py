@@ -13,6 +13,7 @@ Hardware requirements:
   
   *******************************************************************************************************
   *** RUNNING THE AUTOMATED_ARDUINO_CAP_CONT_CHECKER_16X16_NO_ACK CODE THAT DOES NOT REPLY VIA SERIAL ***
+  *** UNLESS ACKNOWLEDGED MODE IS ENABLED ('[') -- SEE SERIAL_ACK_MODE_DEFAULT IN TESTER_HW_CONFIGS  ***
   *******************************************************************************************************
 
 - 2x SMA to DuPont loose plug cable
@@ -33,15 +34,24 @@ Software requirements
 ONE INDEXED OUTPUT!
 '''
 
+import asyncio
+import concurrent.futures
+import contextlib
 import csv
+import functools
 import glob
+import inspect
+import json
 import keyboard
 import os
 import os.path
 import pyvisa
+import queue
 import serial
+import sqlite3
 import serial.tools.list_ports
 import sys
+import threading
 import time
 import datetime as dt
 import numpy as np
@@ -49,6 +59,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.image as mpimg
 
+from google.auth.exceptions import TransportError
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
@@ -62,9 +73,14 @@ from tester_hw_test_classes import *
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
 from pygame import mixer
 
-# Environment variable to track power supply state
-# -1: OFF, 0: Undetermined, 1: ON
-PSU_IS_ON_NOW = 0
+# Simulated tester shared by the tester, DMM and PSU in debug mode, see get_tester_sim()
+TESTER_SIM = None
+
+# Run_Tracer collecting spans for the current run, None when the run isn't traced, see start_run_trace()
+RUN_TRACER = None
+
+# Run_Checkpoint for the current run, None when the run isn't checkpointed, see start_run_checkpoint()
+RUN_CHECKPOINT = None
 
 '''
 Dictionary used to store results from tests
@@ -195,16 +211,348 @@ def init_helper(object, exit_if_unsuccessful=True):
         return None
     return object
 
+'''
+Returns the simulated tester used in debug mode, creating it on first use from the SIM_* settings
+in tester_hw_configs.py. The Arduino, DMM and PSU stand-ins all come from the same Tester_Sim,
+so the DMM measures whatever the mux commands sent to the Arduino stand-in have selected.
+Returns:
+    Tester_Sim object
+'''
+def get_tester_sim():
+    global TESTER_SIM
+    if (TESTER_SIM is None):
+        array = Array_Sim(SIM_SHORTS, SIM_OPENS, SIM_CAP_PF, SIM_SEED)
+        TESTER_SIM = Tester_Sim(array, SIM_SERIAL_BYTE_TIME, SIM_MUX_SETTLE_TIME, SIM_DMM_LATENCY,
+                                SIM_DMM_JITTER, SIM_PSU_RAMP_TIME)
+        TESTER_SIM.arduino.gang_cols_supported = TESTER_CAN_GANG_COLUMNS
+        if (not USING_USB_PSU):
+            TESTER_SIM.dmm.psu = None           # tester boards powered some other way
+    return TESTER_SIM
+
+'''
+Collects timed spans for one run and saves them in the Chrome trace event format
+(chrome://tracing or ui.perfetto.dev), one track per thread, e.g. the scan loop and its result consumer.
+'''
+class Run_Tracer:
+    def __init__(self):
+        self.start_ns = time.perf_counter_ns()
+        self.events = []
+        self.thread_names = dict()
+        self.summary_filename = None    # set with set_run_trace_filename() once the run's output path is known
+
+    '''
+    Records one finished span, safe to call from any thread
+    Parameters:
+        name: Span name, e.g. "serial_write_with_delay"
+        category: Span category, e.g. "serial", "dmm", "test"
+        start_ns: time.perf_counter_ns() when the span started
+        end_ns: time.perf_counter_ns() when the span ended
+        args: Dictionary of extra values shown with the span, e.g. the command sent
+    Returns: None
+    '''
+    def add_span(self, name, category, start_ns, end_ns, args):
+        thread_id = threading.get_ident()
+        if (thread_id not in self.thread_names):
+            self.thread_names[thread_id] = threading.current_thread().name
+        event = {"name": name, "cat": category, "ph": "X", "pid": os.getpid(), "tid": thread_id,
+                 "ts": (start_ns - self.start_ns)/1000, "dur": (end_ns - start_ns)/1000}
+        if (len(args) > 0):
+            event["args"] = args
+        self.events.append(event)
+
+    '''
+    Writes every span recorded so far to a JSON file
+    Parameters:
+        filename: Full path of the file to write
+    Returns: None
+    '''
+    def save(self, filename):
+        events = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": thread_id, "args": {"name": thread_name}}
+                  for (thread_id, thread_name) in list(self.thread_names.items())]
+        events += self.events
+        with open(filename, 'w') as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file, default=str)
+
+'''
+Context manager that records the time spent in its 'with' block as one span
+'''
+class Trace_Span:
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.tracer.add_span(self.name, self.category, self.start_ns, time.perf_counter_ns(), self.args)
+        return False
+
+NO_TRACE_SPAN = contextlib.nullcontext() # returned by trace_span() when the run isn't traced
+
+'''
+Span around a 'with' block, e.g. one row or cell of a scan
+Parameters:
+    name: Span name, e.g. "row"
+    category: Span category, e.g. "scan"
+    **args: Extra values shown with the span, e.g. row=3
+Returns:
+    Context manager, which does nothing if the run isn't traced
+'''
+def trace_span(name, category="scan", **args):
+    if (RUN_TRACER is None):
+        return NO_TRACE_SPAN
+    return Trace_Span(RUN_TRACER, name, category, args)
+
+'''
+Decorator that records every call of the function as a span named after the function
+Parameters:
+    category: Span category, e.g. "serial", "dmm", "test"
+    arg_names: Names of the function's parameters to show with the span, e.g. ("test_id",)
+Returns:
+    Decorator; the wrapped function only checks whether the run is traced when it isn't
+'''
+def traced(category, arg_names=()):
+    def decorator(func):
+        signature = inspect.signature(func)
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            tracer = RUN_TRACER
+            if (tracer is None):
+                return func(*args, **kwargs)
+            span_args = dict()
+            if (len(arg_names) > 0):
+                bound_args = signature.bind(*args, **kwargs).arguments
+                span_args = {name: bound_args[name] for name in arg_names if name in bound_args}
+            with Trace_Span(tracer, func.__name__, category, span_args):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+'''
+Starts tracing a run, discarding any spans from a previous run that weren't saved
+Parameters:
+    enabled: True to trace the run, False to turn tracing off
+Returns: None
+'''
+def start_run_trace(enabled=TRACE_RUNS_DEFAULT):
+    global RUN_TRACER
+    RUN_TRACER = Run_Tracer() if enabled else None
+
+'''
+Sets where the current run's trace is saved if the run ends without save_run_trace() being given
+a filename, e.g. when shutdown_equipment() saves the trace of an interrupted or crashed run
+Parameters:
+    summary_filename: Full path the run's summary.txt will have, see save_run_trace()
+Returns: None
+'''
+def set_run_trace_filename(summary_filename):
+    if (RUN_TRACER is not None):
+        RUN_TRACER.summary_filename = summary_filename
+
+'''
+Saves the current run's trace and stops tracing
+Parameters:
+    summary_filename: Full path of the run's summary.txt, the trace is saved next to it
+                      with "_summary.txt" replaced by TRACE_FILENAME_SUFFIX.
+                      None for the one given to set_run_trace_filename()
+Returns:
+    Full path of the saved trace, or None if the run wasn't traced or the trace couldn't be saved
+'''
+def save_run_trace(summary_filename=None):
+    global RUN_TRACER
+    tracer = RUN_TRACER
+    RUN_TRACER = None
+    if (tracer is None):
+        return None
+    if (summary_filename is None):
+        summary_filename = tracer.summary_filename
+    if (summary_filename is None):
+        print("Run trace not saved, the run ended before its output path was known")
+        return None
+    trace_filename = summary_filename.removesuffix("_summary.txt").removesuffix(".txt") + TRACE_FILENAME_SUFFIX
+    try:
+        tracer.save(trace_filename)
+    except Exception as e:
+        print("ERROR: couldn't save run trace to " + trace_filename + "...")
+        return None
+    print("Saved run trace to " + trace_filename)
+    return trace_filename
+
+'''
+Append-only record of the cells and tests finished so far in a run, one JSON object per line:
+{"test": test name, "cell": [row, col], "vals": [...]} per measured cell, and
+{"test": test name, "result": [...]} per finished test (the tuple the test function returned).
+Every line is flushed as soon as it's written, so everything measured before an interruption
+(KeyboardInterrupt, USB disconnect, crash) is kept.
+Parameters:
+    filename: Full path of the checkpoint file
+    resume: True to load the existing checkpoint file and append to it, False to start a new one
+'''
+class Run_Checkpoint:
+    def __init__(self, filename, resume=False):
+        self.filename = filename
+        self.cells = dict()         # test name: {cell tuple: list of values}
+        self.results = dict()       # test name: result tuple
+        self.lock = threading.Lock()
+        if (resume and os.path.exists(filename)):
+            self.load()
+            self.file = open(filename, 'a')
+            self.file.write("\n")   # in case the last line was cut off by the interruption
+        else:
+            self.file = open(filename, 'w')
+
+    def load(self):
+        with open(self.filename) as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue                    # blank, or cut off by the interruption
+                if ("result" in record):
+                    self.results[record["test"]] = tuple(record["result"])
+                else:
+                    self.cells.setdefault(record["test"], dict())[tuple(record["cell"])] = record["vals"]
+
+    def write(self, record):
+        with self.lock:
+            self.file.write(json.dumps(record) + "\n")
+            self.file.flush()
+
+    def add_cell(self, test_name, cell, vals):
+        self.write({"test": test_name, "cell": list(cell), "vals": list(vals)})
+
+    def add_result(self, test_name, result):
+        self.write({"test": test_name, "result": list(result)})
+        os.fsync(self.file.fileno())
+
+    '''
+    Returns:
+        Total number of cells in the checkpoint
+    '''
+    def count_cells(self):
+        return sum([len(cells) for cells in self.cells.values()])
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+'''
+Builds the checkpoint filename for a DUT + stage on a tester
+Parameters:
+    path: Path the run saves its output files to
+    dut_name_full: Full name of device + stage of test
+    tester_serial_number: Tester serial number string from init_equipment_with_config()
+Returns:
+    Full path of the checkpoint file
+'''
+def get_checkpoint_filename(path, dut_name_full, tester_serial_number):
+    tester_name = "".join([char if (char.isalnum() or char in "-_") else "_" for char in str(tester_serial_number)])
+    return path + dut_name_full + "_" + tester_name + CHECKPOINT_FILENAME_SUFFIX
+
+'''
+Starts checkpointing a run, after this every test function records its measured cells and result
+Parameters:
+    path: Path the run saves its output files to
+    dut_name_full: Full name of device + stage of test
+    tester_serial_number: Tester serial number string from init_equipment_with_config()
+    resume: True to skip the cells and tests already in the DUT's checkpoint file,
+            False to start over with an empty checkpoint
+Returns: None
+'''
+def start_run_checkpoint(path, dut_name_full, tester_serial_number, resume=False):
+    global RUN_CHECKPOINT
+    finish_run_checkpoint(remove=False)
+    RUN_CHECKPOINT = Run_Checkpoint(get_checkpoint_filename(path, dut_name_full, tester_serial_number), resume)
+    if (resume):
+        print("Resuming run: " + str(len(RUN_CHECKPOINT.results)) + " test(s) done, " +
+              str(RUN_CHECKPOINT.count_cells()) + " cell(s) already measured")
+
+'''
+Stops checkpointing the run
+Parameters:
+    remove: True (default) to delete the checkpoint file because the run finished,
+            False to keep it so the run can be resumed
+Returns: None
+'''
+def finish_run_checkpoint(remove=True):
+    global RUN_CHECKPOINT
+    checkpoint = RUN_CHECKPOINT
+    RUN_CHECKPOINT = None
+    if (checkpoint is None):
+        return
+    checkpoint.close()
+    if (remove):
+        os.remove(checkpoint.filename)
+
+'''
+Parameters:
+    test_name: Test name, e.g. "CONT_ROW_TO_COL"
+Returns:
+    The result the test returned before the run was interrupted, or None if it still has to run
+'''
+def get_checkpoint_result(test_name):
+    if (RUN_CHECKPOINT is None or test_name not in RUN_CHECKPOINT.results):
+        return None
+    print(test_name + " already done before the run was interrupted, skipping...\n")
+    return RUN_CHECKPOINT.results[test_name]
+
+'''
+Parameters:
+    test_name: Test name, e.g. "CONT_ROW_TO_COL"
+Returns:
+    Dictionary of the test's cells measured before the run was interrupted, {(row, col): [values]},
+    empty if none
+'''
+def get_checkpoint_cells(test_name):
+    if (RUN_CHECKPOINT is None):
+        return dict()
+    return RUN_CHECKPOINT.cells.get(test_name, dict())
+
+'''
+Records a measured cell in the run's checkpoint, does nothing if the run isn't checkpointed
+Parameters:
+    test_name: Test name, e.g. "CONT_ROW_TO_COL"
+    cell: Tuple with the cell's indices, e.g. (row, col)
+    vals: List of the cell's measured values
+Returns: None
+'''
+def add_checkpoint_cell(test_name, cell, vals):
+    if (RUN_CHECKPOINT is not None):
+        RUN_CHECKPOINT.add_cell(test_name, cell, vals)
+
+'''
+Records a finished test in the run's checkpoint, does nothing if the run isn't checkpointed
+Parameters:
+    test_name: Test name, e.g. "CONT_ROW_TO_COL"
+    result: Tuple returned by the test function
+Returns:
+    result, so test functions can return set_checkpoint_result(...)
+'''
+def set_checkpoint_result(test_name, result):
+    if (RUN_CHECKPOINT is not None):
+        RUN_CHECKPOINT.add_result(test_name, result)
+    return result
+
 '''
 Initializes the Arduino serial port
 Parameters:
     com_port: COM port (Windows) as a string, 'COM[x]'
+    debug_mode_in: True to use a virtual serial device instead of real hardware
+    ack_mode: True to try the tester's acknowledged mode, falling back to fixed delays if the
+              firmware doesn't reply, False to always use fixed delays
 Returns:
-    PySerial object (if properly initialized), null object if not initialized
+    PySerial object (if properly initialized), wrapped in a Serial_Ack_Transport if ack_mode is True,
+    null object if not initialized
 '''
-def init_serial(com_port="", debug_mode_in=False):
+def init_serial(com_port="", debug_mode_in=False, ack_mode=SERIAL_ACK_MODE_DEFAULT):
     if (not debug_mode_in):
         ser = serial.Serial()
+    elif (DEBUG_USE_SIMULATOR):
+        ser = get_tester_sim().arduino
     else:
         ser = Serial_Dummy(com_port)
     ser.port = com_port
@@ -234,10 +582,138 @@ def init_serial(com_port="", debug_mode_in=False):
     try:
         ser.open()
         print("Connected to Arduino on " + ser.port.upper() + "!")
-        return ser
     except Exception as e:
         print("ERROR: couldn't open serial port...")
         return None
+    if (ack_mode):
+        ser = Serial_Ack_Transport(ser)
+        if (ser.enable_ack_mode()):
+            print("Tester acknowledged mode enabled")
+        else:
+            print("Tester did not acknowledge, using fixed serial delays (no-ack mode)")
+    return ser
+
+'''
+Serial transport for testers running firmware with the optional acknowledged mode.
+In acknowledged mode, every write blocks until the Arduino replies that its muxes have settled
+(or until SERIAL_ACK_TIMEOUT), so the fixed SERIAL_DELAY_TIME sleeps can be skipped. A write that isn't
+acknowledged is resent up to `retries` times, then raises, since the mux state is unknown from then on.
+If acknowledged mode isn't enabled (e.g. older firmware that never replies), it behaves exactly like
+the wrapped PySerial object and serial_write_with_delay() keeps sleeping the fixed delay.
+All other attributes (port, close(), etc.) are passed through to the wrapped PySerial object.
+Parameters:
+    ser: PySerial object that has been opened to the Arduino's serial port
+    ack_timeout: Max time in seconds to wait for each acknowledgement
+    retries: Number of times to resend a write that wasn't acknowledged
+'''
+class Serial_Ack_Transport:
+    def __init__(self, ser, ack_timeout=SERIAL_ACK_TIMEOUT, retries=SERIAL_ACK_RETRIES):
+        self.ser = ser
+        self.ack_timeout = ack_timeout
+        self.retries = retries
+        self.ack_mode = False
+        self.ser.timeout = ack_timeout
+
+    def __getattr__(self, name):
+        return getattr(self.ser, name)
+
+    def __str__(self):
+        return str(self.ser)
+
+    '''
+    Tries to switch the firmware into acknowledged mode.
+    Parameters:
+        attempts: Number of times to send the enable command before giving up
+    Returns:
+        True if the firmware acknowledged, False if it didn't (acknowledged mode stays off)
+    '''
+    def enable_ack_mode(self, attempts=SERIAL_ACK_PROBE_ATTEMPTS):
+        for i in range(attempts):
+            self.ser.write(SERIAL_ACK_MODE_ON)
+            if (self.ser.read(1) == SERIAL_ACK):
+                time.sleep(self.ack_timeout) # let acks from any earlier attempts arrive, then discard them
+                self.ser.reset_input_buffer()
+                self.ack_mode = True
+                return True
+        self.ack_mode = False
+        return False
+
+    '''
+    Switches the firmware back to its default no-ack mode
+    Returns: None
+    '''
+    def disable_ack_mode(self):
+        self.ser.write(SERIAL_ACK_MODE_OFF)
+        self.ack_mode = False
+
+    '''
+    Writes data to the Arduino and, in acknowledged mode, waits for one reply per command or frame.
+    If a command is dropped (NAK) or not acknowledged in time, late replies are discarded so they
+    aren't taken as replies to later commands, and the data is resent, except for scan steps
+    (SERIAL_SCAN_NEXT), where resending could skip a cell.
+    Parameters:
+        data: Data payload to send over serial
+    Returns:
+        True (always True outside of acknowledged mode)
+    Raises:
+        RuntimeError if the tester still didn't acknowledge every command after all retries
+    '''
+    def write(self, data):
+        for attempt in range(self.retries + 1):
+            if (attempt > 0):
+                print("WARNING: resending command " + str(data) + " to tester")
+            self.ser.write(data)
+            if (not self.ack_mode or self.read_acks(data)):
+                return True
+            time.sleep(self.ack_timeout)    # let late replies arrive, then discard them
+            self.ser.reset_input_buffer()
+            if (SERIAL_SCAN_NEXT in data):
+                break
+        raise RuntimeError("tester didn't acknowledge command " + str(data))
+
+    '''
+    Reads the replies to a write in acknowledged mode
+    Parameters:
+        data: Data payload that was sent over serial
+    Returns:
+        True if every command was acknowledged, False if one was dropped or not acknowledged in time
+    '''
+    def read_acks(self, data):
+        for i in range(count_serial_commands(data)):
+            reply = self.ser.read(1)
+            if (reply == SERIAL_NAK):
+                print("ERROR: tester dropped command " + str(data))
+                return False
+            elif (reply != SERIAL_ACK):
+                print("WARNING: no acknowledgement from tester for command " + str(data))
+                return False
+        return True
+
+'''
+Counts the number of replies the tester sends back for a serial payload in acknowledged mode:
+one per framed command ('<' ... '>') or scan setup ('{' ... '}') and one per character outside of those,
+except for the command that disables acknowledged mode
+Parameters:
+    data: Data payload sent over serial
+Returns:
+    Number of acknowledgements to expect
+'''
+def count_serial_commands(data):
+    count = 0
+    frame_end = None
+    for i in range(len(data)):
+        char = data[i:i+1]
+        if (frame_end is not None):
+            if (char == frame_end):
+                frame_end = None
+                count += 1
+        elif (char == SERIAL_FRAME_START):
+            frame_end = SERIAL_FRAME_END
+        elif (char == SERIAL_SCAN_START):
+            frame_end = SERIAL_SCAN_END
+        elif (char != SERIAL_ACK_MODE_OFF):
+            count += 1
+    return count
 
 '''
 Initializes the Keithley DMM6500 multimeter
@@ -246,16 +722,20 @@ Parameters:
     dmm_id: String serial name, default: USB0::0x05E6::0x6500::04611761::INSTR
     res_range: Default resistance range '100e6'
     cap_range: Default capacitance range '10e-3
+    profile: Name of the measurement profile to start with, one of DMM_PROFILES
 Returns:
     An initialized PyVISA object, or a null object if not initialized
 TODO: implement equipment type check that quits if this address is not actually the right equipment
 NOTE: remember to run 'dmm.close()' when done with the DMM
 '''
 def init_multimeter(rm, dmm_id=DMM_SERIAL_STRING_DEFAULT, res_range=RES_RANGE_DEFAULT, cap_range=CAP_RANGE_DEFAULT,
-                    debug_mode_in=False):
+                    debug_mode_in=False, profile=DMM_PROFILE_DEFAULT):
     try:
         if (not debug_mode_in):
             dmm = rm.open_resource(dmm_id)
+        elif (DEBUG_USE_SIMULATOR):
+            dmm = get_tester_sim().dmm
+            dmm.open(dmm_id)
         else:
             dmm = VISA_Dummy(dmm_id)
         print("Connected to VISA multimeter!")
@@ -266,30 +746,60 @@ def init_multimeter(rm, dmm_id=DMM_SERIAL_STRING_DEFAULT, res_range=RES_RANGE_DE
     dmm.read_termination = '\n'
     # Clear buffer and status
     dmm.write('*CLS')
+    # Set NPLC, autozero and cap averaging
+    set_dmm_profile(dmm, profile)
     # Set measurement ranges
     dmm.write('sens:res:rang ' + res_range) # sets resistance range to the default specified value
     dmm.write('sens:cap:rang ' + cap_range) # limits cap range to the smallest possible value
-    dmm.write('sens:cap:aver:tcon rep') # sets cap averaging to repeating (vs. moving) -- see Keithley 2000 user manual
-    dmm.write('sens:cap:aver:coun 10')  # sets averaging to 10 measurements per output
-    dmm.write('sens:cap:aver on')       # enables cap averaging
     return dmm
 
+'''
+Applies one of the measurement profiles in DMM_PROFILES (tester_hw_configs.py) to the DMM,
+i.e. resistance NPLC, autozero and range, and capacitance range and averaging
+Parameters:
+    inst: PyVISA object that has been initialized (i.e. the DMM in this case)
+    profile: Name of the profile, e.g. "fast_screen", "standard" or "characterization"
+    res_range: If specified, resistance range to use instead of the profile's (e.g. RES_RANGE_LOOPBACKS)
+Returns:
+    Name of the profile applied, or None if the profile doesn't exist
+'''
+def set_dmm_profile(inst, profile=DMM_PROFILE_DEFAULT, res_range=None):
+    if (profile not in DMM_PROFILES):
+        print("ERROR: DMM measurement profile " + str(profile) + " not valid...")
+        return None
+    settings = DMM_PROFILES[profile]
+    if (res_range is None):
+        res_range = settings["res_range"]
+    inst_write_with_delay(inst, 'sens:res:nplc ' + str(settings["res_nplc"]))    # integration time in power line cycles
+    inst_write_with_delay(inst, 'sens:res:azer ' + settings["res_azer"])         # autozero on/off
+    inst_write_with_delay(inst, 'sens:res:rang ' + res_range)
+    inst_write_with_delay(inst, 'sens:cap:rang ' + settings["cap_range"])
+    if (settings["cap_aver_count"] > 1):
+        inst_write_with_delay(inst, 'sens:cap:aver:tcon rep')    # sets cap averaging to repeating (vs. moving) -- see Keithley 2000 user manual
+        inst_write_with_delay(inst, 'sens:cap:aver:coun ' + str(settings["cap_aver_count"]))
+        inst_write_with_delay(inst, 'sens:cap:aver on')          # enables cap averaging
+    else:
+        inst_write_with_delay(inst, 'sens:cap:aver off')
+    return profile
+
 '''
 Initializes the BK power supply
 Parameters: 
     rm: A PyVISA resource manager object (rm)
     psu_id: String serial name, default: USB0::0x05E6::0x6500::04611761::INSTR
 Returns:
-    An initialized PyVISA object, or a null object if not initialized
+    A PSU_Power_Session wrapping the initialized PyVISA object (output not turned on yet),
+    or a null object if not initialized
 TODO: implement equipment type check that quits if this address is not actually the right equipment
 NOTE: remember to run 'psu.close()' when done with the PSU
 '''
 def init_psu(rm, psu_id=PSU_SERIAL_STRING_DEFAULT, debug_mode_in=False):
-    global PSU_IS_ON_NOW
-    PSU_IS_ON_NOW = 0
     try:
         if (not debug_mode_in):
             psu = rm.open_resource(psu_id)
+        elif (DEBUG_USE_SIMULATOR):
+            psu = get_tester_sim().psu
+            psu.open(psu_id)
         else:
             psu = VISA_Dummy(psu_id)
         print("Connected to VISA PSU!")
@@ -297,81 +807,552 @@ def init_psu(rm, psu_id=PSU_SERIAL_STRING_DEFAULT, debug_mode_in=False):
         psu.read_termination = '\n'
         # Clear buffer and status
         psu.write('*CLS')
-        return psu
+        return PSU_Power_Session(psu)
     except Exception as e:
         print("ERROR: couldn't connect to VISA power supply...")
         return None
 
 '''
-Turns on the BK power supply
+Measures the output voltage and current of both BK power supply channels
+Parameters:
+    psu: A PyVISA object containing the initialized power supply
+Returns:
+    List of (voltage, current) tuples, one per channel
+'''
+def measure_psu_outputs(psu):
+    outputs = []
+    for channel in range(2):
+        psu.write('INST:SEL ' + str(channel))
+        outputs.append((float(psu.query('MEAS:VOLT?')), float(psu.query('MEAS:CURR?'))))
+    return outputs
+
+'''
+Polls both BK power supply channels until their measured voltages are within tolerance of the target,
+then logs how long that took to the console and PSU_SETTLE_LOG_FILENAME (in PATH_BASE).
+Parameters:
+    psu: A PyVISA object containing the initialized power supply
+    event: Name of the event being logged, e.g. "on" or "off"
+    target_volts: Voltage both channels should settle at
+    tolerance: Max difference (volts) from target_volts to be considered settled
+    timeout: Max time to wait for the outputs to settle
+Returns:
+    Settle time in seconds, or None if the outputs didn't settle before the timeout
+'''
+def wait_for_psu_settle(psu, event, target_volts, tolerance, timeout=PSU_DELAY_TIME):
+    start_time = time.time()
+    settle_time = None
+    outputs = []
+    try:
+        while True:
+            outputs = measure_psu_outputs(psu)
+            elapsed = time.time() - start_time
+            if all(abs(volts - target_volts) <= tolerance for (volts, amps) in outputs):
+                settle_time = elapsed
+                break
+            if (elapsed > timeout):
+                break
+            time.sleep(PSU_SETTLE_POLL_TIME)
+    except Exception as e:
+        print("WARNING: couldn't measure PSU outputs, waiting " + str(timeout) + " s instead...")
+        time.sleep(max(timeout - (time.time() - start_time), 0))
+        return None
+    if (settle_time is None):
+        print("WARNING: PSU outputs didn't settle " + event + " within " + str(timeout) + " s: " + str(outputs))
+    else:
+        print("PSU settled " + event + " in " + str(round(settle_time*1000)) + " ms")
+    log_filename = os.path.join(PATH_BASE, PSU_SETTLE_LOG_FILENAME)
+    try:
+        log_exists = os.path.exists(log_filename)
+        with open(log_filename, 'a', newline='') as file:
+            writer = csv.writer(file)
+            if (not log_exists):
+                writer.writerow(["Timestamp", "Event", "Settle Time (s)", "Ch0 Voltage (V)", "Ch0 Current (A)",
+                                 "Ch1 Voltage (V)", "Ch1 Current (A)"])
+            writer.writerow([dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), event,
+                             "" if settle_time is None else settle_time] + [val for output in outputs for val in output])
+    except Exception as e:
+        print("WARNING: couldn't write to PSU settle log " + log_filename)
+    return settle_time
+
+'''
+Turns on the BK power supply, and turns it back off if the outputs don't settle at PSU_VOLTAGE_SETPOINT
+or a channel is in current limit (e.g. a shorted DUT), so tests never run on an unpowered tester
 Parameters: 
     psu: A PyVISA object containing the initialized power supply
-    psu_wait: The time to wait for the power supply to turn on
+    psu_wait: Max time to wait for the power supply outputs to settle on
 Returns:
     True if successfully turned PSU on, None if PSU not successfully turned on
 '''
+@traced("psu")
 def set_psu_on(psu, psu_wait=PSU_DELAY_TIME):
-    global PSU_IS_ON_NOW
-    if (PSU_IS_ON_NOW == 1):
-        print("PSU already on")
-        return True
-    else:
-        print("PSU turning on...")
-        try:
-            # set PSU voltage to 18V, current limits to 0.05A on (-) and 0.075A on (+)
-            psu.write('INST:SEL 0')
-            psu.write('APPL 18,0.05')
-            psu.write('OUTP:STAT 1')
-            psu.write('INST:SEL 1')
-            psu.write('APPL 18,0.075')
+    print("PSU turning on...")
+    try:
+        # set PSU voltage to 18V, current limits to 0.05A on (-) and 0.075A on (+)
+        for channel in range(2):
+            psu.write('INST:SEL ' + str(channel))
+            psu.write('APPL ' + str(PSU_VOLTAGE_SETPOINT) + ',' + str(PSU_CURRENT_LIMITS[channel]))
             psu.write('OUTP:STAT 1')
-            time.sleep(psu_wait)
-            print("PSU on!")
-            PSU_IS_ON_NOW = 1
-            return True
-        except Exception as e:
-            print("ERROR: couldn't turn on VISA power supply...")
-            PSU_IS_ON_NOW = 0 # undetermined
+        if (wait_for_psu_settle(psu, "on", PSU_VOLTAGE_SETPOINT, PSU_SETTLE_TOLERANCE, psu_wait) is None):
+            print("ERROR: PSU outputs didn't reach " + str(PSU_VOLTAGE_SETPOINT) + " V, turning PSU off...")
+            psu.write('OUTP:ALL 0')
             return None
+        outputs = measure_psu_outputs(psu)
+        for channel in range(2):
+            if (outputs[channel][1] >= PSU_CURRENT_LIMIT_FRACTION*PSU_CURRENT_LIMITS[channel]):
+                print("ERROR: PSU channel " + str(channel) + " in current limit (" + str(outputs[channel][1]) +
+                      " A), turning PSU off...")
+                psu.write('OUTP:ALL 0')
+                return None
+        print("PSU on!")
+        return True
+    except Exception as e:
+        print("ERROR: couldn't turn on VISA power supply...")
+        return None
 
 '''
 Turns off the BK power supply. Will not be successful if the PSU object has already been closed.
 Parameters:
     psu: A PyVISA object containing the initialized power supply
-    psu_wait: The time to wait for the power supply to turn off
+    psu_wait: Max time to wait for the power supply outputs to settle off
 Returns:
     True if successfully turned PSU off, False if PSU not successfully turned off
 NOTE: remember to run 'psu.close()' when done with the PSU
 '''
+@traced("psu")
 def set_psu_off(psu, psu_wait=PSU_DELAY_TIME):
-    global PSU_IS_ON_NOW
-    if (PSU_IS_ON_NOW == -1):
-        print("PSU already off")
+    print("Turning PSU off...")
+    try:
+        psu.write('OUTP:ALL 0')
+        wait_for_psu_settle(psu, "off", 0, PSU_OFF_VOLTAGE_THRESHOLD, psu_wait)
+        print("PSU off!")
         return True
-    else:
-        print("Turning PSU off...")
-        try:
-            psu.write('OUTP:ALL 0')
-            time.sleep(psu_wait)
-            print("PSU off!")
-            PSU_IS_ON_NOW = -1
+    except Exception as e:
+        print("ERROR: couldn't turn off VISA power supply...")
+        return None
+
+'''
+Power session around the BK power supply, so the supply is turned on once and stays on across
+nested test suites instead of being switched on/off (and waiting for it to settle) by every suite.
+The first acquire() (or 'with' block) turns the supply on, nested ones reuse the powered state,
+and the supply turns off when the outermost one is released or the session is closed.
+Anything else (write, query, read_termination, ...) is passed through to the PyVISA object.
+Parameters:
+    psu: A PyVISA object containing the initialized power supply
+    psu_wait: The time to wait for the power supply to turn on/off
+'''
+class PSU_Power_Session:
+    def __init__(self, psu, psu_wait=PSU_DELAY_TIME):
+        self.psu = psu
+        self.psu_wait = psu_wait
+        self.is_on = None       # None: undetermined, True: on, False: off
+        self.depth = 0
+
+    def __getattr__(self, name):
+        return getattr(self.psu, name)
+
+    def __enter__(self):
+        if (self.acquire() is None):
+            raise RuntimeError("couldn't turn on VISA power supply")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+        return False
+
+    '''
+    Turns the supply on if this is the outermost holder of the session
+    Returns:
+        True if the PSU is on, None if PSU not successfully turned on
+    '''
+    def acquire(self):
+        if (self.is_on):
+            print("PSU already on")
+        else:
+            self.is_on = set_psu_on(self.psu, self.psu_wait)
+            if (self.is_on is None):
+                return None
+        self.depth += 1
+        return True
+
+    '''
+    Turns the supply off if this is the outermost holder of the session
+    Returns: None
+    '''
+    def release(self):
+        self.depth = max(self.depth-1, 0)
+        if (self.depth == 0):
+            self.power_off()
+
+    '''
+    Turns the supply off right away, regardless of how many holders there are (e.g. on shutdown or error)
+    Returns:
+        True if successfully turned PSU off, None if PSU not successfully turned off
+    '''
+    def power_off(self):
+        self.depth = 0
+        if (self.is_on is False):
+            print("PSU already off")
             return True
-        except Exception as e:
-            print("ERROR: couldn't turn off VISA power supply...")
-            PSU_IS_ON_NOW = 0 # undetermined
-            return None
+        if (set_psu_off(self.psu, self.psu_wait)):
+            self.is_on = False
+            return True
+        self.is_on = None
+        return None
+
+    def close(self):
+        return self.psu.close()
+
+'''
+Returns the power session to hold while running a test suite, or a do-nothing context
+if the PSU isn't used
+Parameters:
+    psu: PSU_Power_Session returned by init_psu, or None
+    using_psu: True if the USB PSU is used, False to skip PSU stuff
+Returns:
+    Context manager that keeps the PSU on while held
+'''
+def psu_power_session(psu, using_psu=USING_USB_PSU):
+    if (using_psu and (psu is not None)):
+        return psu
+    return contextlib.nullcontext()
 
 '''
 Writes (or tries) specified data to the serial port.
+If the tester is in acknowledged mode, waits for the tester's reply instead of the fixed delay,
+and raises RuntimeError if the tester never acknowledges (see Serial_Ack_Transport.write()).
 Parameters:
     ser: PySerial object that has been initialized to the Arduino's serial port
     byte: Data payload to send over serial
-    delay: Amount of time to wait after writing serial command
+    delay: Amount of time to wait after writing serial command (no-ack mode only)
 Returns: None
 '''
+@traced("serial", ("byte",))
 def serial_write_with_delay(ser, byte, delay=SERIAL_DELAY_TIME):
     ser.write(byte)
-    time.sleep(delay)
+    if (not (isinstance(ser, Serial_Ack_Transport) and ser.ack_mode)):
+        time.sleep(delay)
+
+'''
+Builds a framed command that sets the whole tester mux state in one serial write,
+e.g. [b'Z', b'U', b'R', b'3', b'L', b'5', b'O'] becomes b'<ZUR3L5O>'.
+Parameters:
+    commands: List of 1-character commands (bytes), in the order the Arduino should apply them
+Returns:
+    Bytes with the framed command
+'''
+def build_serial_frame(commands):
+    return SERIAL_FRAME_START + b''.join(commands) + SERIAL_FRAME_END
+
+'''
+Writes (or tries) a list of 1-character commands to the serial port as one framed command,
+waiting only once afterwards instead of after every character.
+Parameters:
+    ser: PySerial object that has been initialized to the Arduino's serial port
+    commands: List of 1-character commands (bytes), in the order the Arduino should apply them
+    delay: Amount of time to wait after writing the framed command
+Returns: None
+'''
+def serial_write_frame_with_delay(ser, commands, delay=SERIAL_DELAY_TIME):
+    serial_write_with_delay(ser, build_serial_frame(commands), delay)
+
+'''
+Stateful driver for the tester muxes that remembers the last state sent to the Arduino
+and only sends the commands that change it, e.g. when stepping through columns on the same row
+only the column write mode + column address are re-sent.
+Mirrors the firmware's command semantics:
+- 'Z' turns off every mux enable (including the secondary board), addresses stay latched
+- secondary board commands (e.g. 'U') and output modes (e.g. 'O') change the firmware state,
+  so the row/col/rst write mode has to be re-sent before the next address
+- 'R'/'L'/'T' select which address the following hex character writes to
+Call invalidate() whenever the Arduino state is unknown (e.g. after a raw 'Z' or a reconnect),
+so the next set_state() starts over from all off.
+Parameters:
+    ser: PySerial object that has been initialized to the Arduino's serial port
+    delay: Amount of time to wait after each serial write
+'''
+class Tester_Mux_Driver:
+    def __init__(self, ser, delay=SERIAL_DELAY_TIME):
+        self.ser = ser
+        self.delay = delay
+        self.invalidate()
+
+    '''
+    Forgets the cached Arduino state, so the next set_state() resets the tester and sends everything
+    Returns: None
+    '''
+    def invalidate(self):
+        self.state_known = False
+        self.secondary = None
+        self.write_mode = None
+        self.output_mode = None
+        self.addresses = {}
+
+    '''
+    Computes the commands needed to go from the cached state to the requested state,
+    and updates the cached state as if they had been sent
+    Parameters:
+        secondary: 1-character command for the secondary mux mode (e.g. b'U')
+        addresses: List of (write mode, index) tuples, e.g. [(b'R', 3), (b'L', 5)], written in order
+        output_mode: 1-character command for the primary mux output mode (e.g. b'O')
+    Returns:
+        List of 1-character commands (bytes) to send, empty if nothing changes
+    '''
+    def get_commands(self, secondary, addresses, output_mode):
+        commands = []
+        if ((not self.state_known) or (secondary != self.secondary)):
+            commands.append(b'Z')                      # break before make when switching measurement paths
+            commands.append(secondary)
+            self.state_known = True
+            self.secondary = secondary
+            self.write_mode = None
+            self.output_mode = None
+        for (mode_cmd, index) in addresses:
+            if (self.addresses.get(mode_cmd) != index):
+                if (self.write_mode != mode_cmd):
+                    commands.append(mode_cmd)
+                    self.write_mode = mode_cmd
+                commands.append(bytes(hex(index)[2:], 'utf-8'))
+                self.addresses[mode_cmd] = index
+        if (output_mode != self.output_mode):
+            commands.append(output_mode)
+            self.write_mode = None
+            self.output_mode = output_mode
+        return commands
+
+    '''
+    Sets the tester muxes to the requested state, sending only what changed
+    (one framed write if there's more than one command, nothing if the state is unchanged)
+    Parameters:
+        secondary: 1-character command for the secondary mux mode (e.g. b'U')
+        addresses: List of (write mode, index) tuples, e.g. [(b'R', 3), (b'L', 5)], written in order
+        output_mode: 1-character command for the primary mux output mode (e.g. b'O')
+    Returns:
+        List of 1-character commands (bytes) that were sent
+    '''
+    def set_state(self, secondary, addresses, output_mode):
+        commands = self.get_commands(secondary, addresses, output_mode)
+        if (len(commands) == 1):
+            serial_write_with_delay(self.ser, commands[0], self.delay)
+        elif (len(commands) > 1):
+            serial_write_frame_with_delay(self.ser, commands, self.delay)
+        return commands
+
+    '''
+    Sets all mux enables + mux channels to OFF
+    Returns: None
+    '''
+    def reset(self):
+        serial_write_with_delay(self.ser, b'Z', self.delay)
+        self.invalidate()
+
+'''
+Host-side driver for the firmware scan sequencer. The scan type and range are sent once,
+then every cell only costs a 1-character step command (or none, if the Arduino is stepped
+by a hardware trigger). Keeps a host-side copy of the sequencer position, stepping dim2 fastest.
+Requires firmware with the scan sequencer, see SERIAL_SCAN_START in tester_hw_configs.py.
+Parameters:
+    ser: PySerial object that has been initialized to the Arduino's serial port
+    secondary: 1-character command for the secondary mux mode (e.g. b'U')
+    dim1_cmd: 1-character write mode command for dim1 (e.g. b'R')
+    start_dim1: Dim1 # to start iterating through (typically 0)
+    end_dim1: Dim1 # to end iterating through (typically 16), exclusive
+    dim2_cmd: 1-character write mode command for dim2 (e.g. b'L')
+    start_dim2: Dim2 # to start iterating through (typically 0)
+    end_dim2: Dim2 # to end iterating through (typically 16), exclusive
+    output_mode: 1-character command for the primary mux output mode (e.g. b'O')
+    delay: Amount of time to wait after each serial write
+'''
+class Tester_Scan_Sequencer:
+    def __init__(self, ser, secondary, dim1_cmd, start_dim1, end_dim1, dim2_cmd, start_dim2, end_dim2,
+                 output_mode=b'O', delay=SERIAL_DELAY_TIME):
+        self.ser = ser
+        self.secondary = secondary
+        self.dim1_cmd = dim1_cmd
+        self.dim2_cmd = dim2_cmd
+        self.start_dim1 = start_dim1
+        self.end_dim1 = end_dim1
+        self.start_dim2 = start_dim2
+        self.end_dim2 = end_dim2
+        self.output_mode = output_mode
+        self.delay = delay
+        self.position = None
+
+    '''
+    Builds the scan setup command for this scan, e.g. b'{UR0fL0fO}'
+    Returns:
+        Bytes with the scan setup command
+    '''
+    def get_setup_command(self):
+        return (SERIAL_SCAN_START + self.secondary +
+                self.dim1_cmd + bytes(hex(self.start_dim1)[2:], 'utf-8') + bytes(hex(self.end_dim1-1)[2:], 'utf-8') +
+                self.dim2_cmd + bytes(hex(self.start_dim2)[2:], 'utf-8') + bytes(hex(self.end_dim2-1)[2:], 'utf-8') +
+                self.output_mode + SERIAL_SCAN_END)
+
+    '''
+    Starts the scan (first call) or steps the tester to the next cell (later calls)
+    Parameters:
+        send_step: True to send the step command, False if the Arduino is stepped by its hardware trigger
+    Returns:
+        Tuple (dim1, dim2) the tester is now set to, or None if the scan is done
+    '''
+    def next_cell(self, send_step=True):
+        if (self.position is None):
+            serial_write_with_delay(self.ser, self.get_setup_command(), self.delay)
+            self.position = (self.start_dim1, self.start_dim2)
+            return self.position
+        if (send_step):
+            serial_write_with_delay(self.ser, SERIAL_SCAN_NEXT, self.delay)
+        (dim1, dim2) = self.position
+        if (dim2 < self.end_dim2-1):
+            self.position = (dim1, dim2+1)
+        elif (dim1 < self.end_dim1-1):
+            self.position = (dim1+1, self.start_dim2)
+        else:
+            self.position = (self.end_dim1, self.end_dim2) # sequencer turns everything off after the last cell
+            return None
+        return self.position
+
+    '''
+    Halts the scan and sets all mux enables + mux channels to OFF
+    Returns: None
+    '''
+    def stop(self):
+        serial_write_with_delay(self.ser, SERIAL_SCAN_HALT, self.delay)
+        self.position = None
+
+'''
+Visit order and serial commands of a cell-by-cell 2D scan driven by Tester_Mux_Driver, e.g. row to column.
+The planned commands are exactly what a Tester_Mux_Driver sends for the same visits,
+so get_budget() works as a dry run of the scan.
+Parameters:
+    secondary: 1-character command for the secondary mux mode (e.g. b'U')
+    dim1_cmd: 1-character write mode command for dim1 (e.g. b'R')
+    start_dim1: Dim1 # to start iterating through (typically 0)
+    end_dim1: Dim1 # to end iterating through (typically 16), exclusive
+    dim2_cmd: 1-character write mode command for dim2 (e.g. b'L')
+    start_dim2: Dim2 # to start iterating through (typically 0)
+    end_dim2: Dim2 # to end iterating through (typically 16), exclusive
+    output_modes: List of output modes measured at every cell, in order, e.g. [b'O'], or [b'I', b'P'] for test_cap
+    order: "row_major" or "serpentine", see SCAN_ORDER_DEFAULT in tester_hw_configs.py
+    alternate_output_modes: True to reverse output_modes on every other cell, see CAP_ALTERNATE_OUTPUT_MODES
+    skip_cells: Cells that are visited but not measured (e.g. from a checkpoint), nothing is sent for them
+    baseline_mode: Output mode whose measurement is shared between cells, e.g. b'I' (TFT off) for test_cap
+    baseline_key: Function (dim1, dim2) -> key of the cells sharing a baseline, or None to measure
+                  baseline_mode at every cell. It's only measured at the first measured cell of each key
+'''
+class Scan_Plan:
+    ORDERS = ["row_major", "serpentine"]
+
+    def __init__(self, secondary, dim1_cmd, start_dim1, end_dim1, dim2_cmd, start_dim2, end_dim2,
+                 output_modes=[b'O'], order=SCAN_ORDER_DEFAULT, alternate_output_modes=False, skip_cells=(),
+                 baseline_mode=None, baseline_key=None):
+        if (order not in self.ORDERS):
+            raise ValueError("Scan order " + str(order) + " not valid, must be one of " + str(self.ORDERS))
+        self.rows = []              # list of (dim1, list of dim2 in visit order)
+        self.output_modes = dict()  # (dim1, dim2): list of output modes in measurement order
+        self.row_ends = set()       # last cell visited in each row, e.g. for progress printing
+        self.commands = []          # list of command lists, one per serial write (mux settle)
+        self.order = order
+        self.num_cells = 0
+        driver = Tester_Mux_Driver(None)
+        baselines = set()           # baseline keys already measured
+        for dim1 in range(start_dim1, end_dim1):
+            dim2_list = list(range(start_dim2, end_dim2))
+            if (order == "serpentine" and (dim1 - start_dim1) % 2 == 1):
+                dim2_list.reverse()
+            self.rows.append((dim1, dim2_list))
+            for dim2 in dim2_list:
+                modes = list(output_modes)
+                if (alternate_output_modes and self.num_cells % 2 == 1):
+                    modes.reverse()
+                self.num_cells += 1
+                if ((dim1, dim2) in skip_cells):
+                    self.output_modes[(dim1, dim2)] = modes
+                    continue
+                if (baseline_key is not None):
+                    key = baseline_key(dim1, dim2)
+                    if (key in baselines):
+                        modes.remove(baseline_mode)     # reuses the baseline measured earlier in the scan
+                    baselines.add(key)
+                self.output_modes[(dim1, dim2)] = modes
+                for output_mode in modes:
+                    commands = driver.get_commands(secondary, [(dim1_cmd, dim1), (dim2_cmd, dim2)], output_mode)
+                    if (len(commands) > 0):
+                        self.commands.append(commands)
+            if (len(dim2_list) > 0):
+                self.row_ends.add((dim1, dim2_list[-1]))
+        self.commands.append([b'Z'])    # mux.reset() after the last cell
+
+    '''
+    Dry run of the scan's serial traffic
+    Parameters:
+        delay: Fixed delay after each serial write, e.g. SERIAL_DELAY_TIME
+        ack_mode: True if the tester is in acknowledged mode (no fixed delays)
+    Returns:
+        Dictionary with the number of cells, serial writes (= mux settle events),
+        bytes sent (framed writes add the 2 frame characters) and total fixed sleep time in seconds
+    '''
+    def get_budget(self, delay=SERIAL_DELAY_TIME, ack_mode=False):
+        num_writes = len(self.commands)
+        num_bytes = sum([len(commands) + (2 if len(commands) > 1 else 0) for commands in self.commands])
+        return {"cells": self.num_cells, "serial_writes": num_writes, "bytes": num_bytes,
+                "sleep_s": 0 if ack_mode else round(num_writes*delay, 3)}
+
+'''
+Plans a cell-by-cell 2D scan, see Scan_Plan for the other parameters
+Parameters:
+    order: "row_major", "serpentine", or "auto" to plan every order and pick the one with the fewest
+           serial writes (mux settle events), then fewest bytes
+Returns:
+    Scan_Plan object
+'''
+def plan_scan(secondary, dim1_cmd, start_dim1, end_dim1, dim2_cmd, start_dim2, end_dim2,
+              output_modes=[b'O'], order=SCAN_ORDER_DEFAULT, alternate_output_modes=False, skip_cells=(),
+              baseline_mode=None, baseline_key=None):
+    orders = Scan_Plan.ORDERS if (order == "auto") else [order]
+    plans = [Scan_Plan(secondary, dim1_cmd, start_dim1, end_dim1, dim2_cmd, start_dim2, end_dim2,
+                       output_modes, plan_order, alternate_output_modes, skip_cells, baseline_mode, baseline_key)
+             for plan_order in orders]
+    return min(plans, key=lambda plan: (plan.get_budget()["serial_writes"], plan.get_budget()["bytes"]))
+
+'''
+Dry run of every 2D scan (CONT_DICT_TWO_DIM and CAP_FN_DICT) in every visit order, printing the
+serial byte/write/sleep budget of each plan without touching the tester
+Parameters:
+    ack_mode: True to budget for acknowledged mode (no fixed delays)
+Returns:
+    List of dictionaries, one per plan, with the test name, order, output mode alternation,
+    off baseline (cap tests) and get_budget() values
+'''
+def dry_run_scan_plans(ack_mode=False):
+    plans = []
+    for (test_name, (secondary_cmd, dim1_cmd, dim2_cmd)) in CONT_DICT_TWO_DIM.items():
+        for order in Scan_Plan.ORDERS:
+            plan = Scan_Plan(secondary_cmd, dim1_cmd, 0, 16, dim2_cmd, 0, 16, [b'O'], order)
+            plans.append({"test": test_name, "order": order, "alternate_output_modes": False} |
+                         plan.get_budget(SERIAL_DELAY_TIME, ack_mode))
+    for (test_name, secondary_cmd) in CAP_FN_DICT.items():
+        for off_baseline in ["per_cell", "per_column", "per_row_block"]:
+            for order in Scan_Plan.ORDERS:
+                for alternate_output_modes in [False, True]:
+                    plan = Scan_Plan(secondary_cmd, b'R', 0, 16, b'L', 0, 16, [b'I', b'P'], order, alternate_output_modes,
+                                     baseline_mode=b'I', baseline_key=get_cap_off_baseline_key(off_baseline))
+                    plans.append({"test": test_name, "order": order, "alternate_output_modes": alternate_output_modes,
+                                  "off_baseline": off_baseline} | plan.get_budget(SERIAL_DELAY_TIME_CAP, ack_mode))
+    print("Scan plan budgets (" + ("acknowledged mode" if ack_mode else "fixed delays") + "):")
+    for plan in plans:
+        print("  " + plan["test"].ljust(20) + plan["order"].ljust(12) +
+              ("alternating " if plan["alternate_output_modes"] else "            ") +
+              plan.get("off_baseline", "").ljust(15) +
+              str(plan["serial_writes"]).rjust(4) + " writes, " + str(plan["bytes"]).rjust(5) + " bytes, " +
+              str(plan["sleep_s"]) + " s sleep")
+    print("'auto' order uses: " + ", ".join([test_name + " " + plan_scan(secondary_cmd, dim1_cmd, 0, 16, dim2_cmd, 0, 16).order
+                                             for (test_name, (secondary_cmd, dim1_cmd, dim2_cmd)) in CONT_DICT_TWO_DIM.items()] +
+                                            [test_name + " " + plan_scan(secondary_cmd, b'R', 0, 16, b'L', 0, 16, [b'I', b'P'],
+                                                                         "auto", CAP_ALTERNATE_OUTPUT_MODES, (), b'I',
+                                                                         get_cap_off_baseline_key(CAP_OFF_BASELINE_DEFAULT)).order
+                                             for (test_name, secondary_cmd) in CAP_FN_DICT.items()]))
+    return plans
 
 '''
 Writes (or tries) specified data to the PyVISA instrument.
@@ -381,6 +1362,7 @@ Parameters:
     delay: Amount of time to wait after writing VISA command
 Returns: None
 '''
+@traced("visa", ("writeString",))
 def inst_write_with_delay(inst, writeString, delay=DMM_DELAY_TIME):
     inst.write(writeString)
     time.sleep(delay)
@@ -393,11 +1375,306 @@ Parameters:
     delay: Amount of time to wait after writing VISA command
 Returns: None
 '''
+@traced("visa", ("queryString",))
 def inst_query_with_delay(inst, queryString, delay=DMM_DELAY_TIME):
     val = inst.query(queryString)
     time.sleep(delay)
     return val
 
+# Asynchronous instrument I/O
+'''
+Every instrument (Arduino serial port, DMM, PSU) gets its own single-thread executor, so the async
+functions below can wait on different instruments at the same time, while the commands sent to any one
+instrument still run one at a time and in the order they were submitted. File and Google Sheets I/O
+runs on asyncio's default executor. The blocking functions above stay the implementation, the async
+ones run them on the instrument's executor.
+Scan loops stay blocking: within a cell the mux must settle before the DMM integrates, and the reading
+must finish before the next address is sent, so there's nothing independent to overlap there (result
+file writes already overlap the scan through Scan_Result_Consumer).
+'''
+INSTRUMENT_EXECUTORS = dict()           # id(instrument): (instrument, executor)
+INSTRUMENT_EXECUTORS_LOCK = threading.Lock()
+TESTER_POWER_UP = None                  # future of the background power up, see start_tester_power_up()
+
+'''
+Gets the executor that runs the calls to an instrument, creating it on first use
+Parameters:
+    instrument: PySerial, PyVISA or PSU_Power_Session object
+Returns:
+    concurrent.futures.ThreadPoolExecutor with a single worker thread
+'''
+def get_instrument_executor(instrument):
+    with INSTRUMENT_EXECUTORS_LOCK:
+        if (id(instrument) not in INSTRUMENT_EXECUTORS):
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=1,
+                                                             thread_name_prefix="io_" + type(instrument).__name__)
+            INSTRUMENT_EXECUTORS[id(instrument)] = (instrument, executor)
+        return INSTRUMENT_EXECUTORS[id(instrument)][1]
+
+'''
+Starts a call on an instrument's executor without waiting for it, e.g. to turn the PSU on in the
+background while the operator enters the DUT information
+Parameters:
+    instrument: Instrument the call talks to
+    func: Function to call, followed by its arguments
+Returns:
+    concurrent.futures.Future with the function's return value
+'''
+def submit_to_instrument(instrument, func, *args, **kwargs):
+    return get_instrument_executor(instrument).submit(func, *args, **kwargs)
+
+'''
+Waits for the background power up and every call still queued on the instrument executors,
+and stops their threads
+Returns: None
+'''
+def shutdown_instrument_executors():
+    global TESTER_POWER_UP
+    if (TESTER_POWER_UP is not None):
+        concurrent.futures.wait([TESTER_POWER_UP])
+        TESTER_POWER_UP = None
+    with INSTRUMENT_EXECUTORS_LOCK:
+        executors = [executor for (instrument, executor) in INSTRUMENT_EXECUTORS.values()]
+        INSTRUMENT_EXECUTORS.clear()
+    for executor in executors:
+        executor.shutdown(wait=True)
+
+'''
+Runs a blocking call on an instrument's executor from a coroutine
+Parameters:
+    instrument: Instrument the call talks to
+    func: Function to call, followed by its arguments
+Returns:
+    The function's return value
+'''
+async def run_on_instrument(instrument, func, *args, **kwargs):
+    return await asyncio.wrap_future(submit_to_instrument(instrument, func, *args, **kwargs))
+
+'''
+Async equivalents of serial_write_with_delay, inst_write_with_delay, inst_query_with_delay,
+set_psu_on and set_psu_off, see those for the parameters and return values
+'''
+async def serial_write_with_delay_async(ser, byte, delay=SERIAL_DELAY_TIME):
+    return await run_on_instrument(ser, serial_write_with_delay, ser, byte, delay)
+
+async def inst_write_with_delay_async(inst, writeString, delay=DMM_DELAY_TIME):
+    return await run_on_instrument(inst, inst_write_with_delay, inst, writeString, delay)
+
+async def inst_query_with_delay_async(inst, queryString, delay=DMM_DELAY_TIME):
+    return await run_on_instrument(inst, inst_query_with_delay, inst, queryString, delay)
+
+async def set_psu_on_async(psu, psu_wait=PSU_DELAY_TIME):
+    return await run_on_instrument(psu, set_psu_on, psu, psu_wait)
+
+async def set_psu_off_async(psu, psu_wait=PSU_DELAY_TIME):
+    return await run_on_instrument(psu, set_psu_off, psu, psu_wait)
+
+'''
+Runs blocking file or Google Sheets I/O from a coroutine, on asyncio's default executor
+Parameters:
+    func: Function to call, followed by its arguments
+Returns:
+    The function's return value
+'''
+async def run_io_async(func, *args, **kwargs):
+    return await asyncio.to_thread(func, *args, **kwargs)
+
+'''
+Gets the tester ready to measure: turns the PSU on (holding its power session) while the DMM
+profile is applied and the muxes are reset, instead of one after the other
+Parameters:
+    ser: PySerial object that has been initialized to the Arduino's serial port
+    inst: PyVISA object that has been initialized (i.e. the DMM in this case)
+    psu: PSU_Power_Session returned by init_psu, or None
+    profile: DMM measurement profile to apply, one of DMM_PROFILES
+    using_psu: True if the USB PSU is used, False to skip PSU stuff
+Returns:
+    True if the tester is ready, None if the PSU didn't turn on
+'''
+async def power_up_tester_async(ser, inst, psu, profile=DMM_PROFILE_DEFAULT, using_psu=USING_USB_PSU):
+    tasks = [run_on_instrument(inst, set_dmm_profile, inst, profile),
+             run_on_instrument(ser, Tester_Mux_Driver(ser).reset)]
+    if (using_psu and (psu is not None)):
+        tasks.append(run_on_instrument(psu, psu.acquire))
+    results = await asyncio.gather(*tasks)
+    return results[-1] if (using_psu and (psu is not None)) else True
+
+'''
+Starts power_up_tester_async() on a background thread, so the PSU settles while the operator enters
+the DUT information and the inventory is looked up. Wait on the returned future before measuring.
+Parameters: See power_up_tester_async()
+Returns:
+    concurrent.futures.Future with the return value of power_up_tester_async()
+'''
+def start_tester_power_up(ser, inst, psu, profile=DMM_PROFILE_DEFAULT, using_psu=USING_USB_PSU):
+    global TESTER_POWER_UP
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="power_up")
+    TESTER_POWER_UP = executor.submit(asyncio.run, power_up_tester_async(ser, inst, psu, profile, using_psu))
+    executor.shutdown(wait=False)
+    return TESTER_POWER_UP
+
+'''
+Wraps up a finished run: queues the results for upload to Google Sheets (see Results_Outbox) while
+the PSU turns off and settles, then removes the run checkpoint and saves the run trace
+Parameters:
+    psu: PSU_Power_Session returned by init_psu, or None
+    creds: Google Sheets credentials (see get_creds())
+    payload_dict: Dictionary with the Sheets row, see queue_results_upload()
+    summary_filename: Full path of the run's summary file (the trace is saved next to it)
+    using_psu: True if the USB PSU is used, False to skip PSU stuff
+Returns:
+    Idempotency key of the queued results row
+'''
+async def finish_run_async(psu, creds, payload_dict, summary_filename, using_psu=USING_USB_PSU):
+    tasks = [run_io_async(queue_results_upload, creds, payload_dict)]
+    if (using_psu and (psu is not None)):
+        tasks.append(run_on_instrument(psu, psu.power_off))
+    results = await asyncio.gather(*tasks)
+    finish_run_checkpoint()     # run finished, nothing left to resume
+    await run_io_async(save_run_trace, summary_filename)
+    return results[0]
+
+'''
+Sets up the DMM6500 trigger model to take a buffered series of resistance readings and starts it.
+Readings are stored in the DMM's reading buffer and pulled with dmm_read_buffered_scan() at the end.
+Pacing (see DMM_BUFFERED_SCAN_PACING in tester_hw_configs.py):
+- "host":    each reading waits for a bus trigger (*TRG, sent by dmm_trigger_buffered_reading()),
+             then the settle delay
+- "trigger": each reading waits the settle delay, then pulses EXT TRIG OUT to step the Arduino scan sequencer,
+             so the sequencer must already be set up on the first cell when this is called
+Parameters:
+    inst: PyVISA object that has been initialized (i.e. the DMM in this case)
+    num_readings: Number of readings to take (e.g. 256 for a 16x16 scan)
+    pacing: "host" or "trigger"
+    settle_time: Time in seconds the DMM waits between the mux step and each reading
+    res_range: Multimeter resistance measurement range
+    buffer_name: Name of the DMM reading buffer to use
+Returns:
+    True if the trigger model was started, False if the pacing option is invalid
+'''
+def dmm_start_buffered_scan(inst, num_readings, pacing=DMM_BUFFERED_SCAN_PACING,
+                            settle_time=DMM_BUFFERED_SCAN_SETTLE_TIME, res_range=RES_RANGE_DEFAULT,
+                            buffer_name=DMM_BUFFER_NAME):
+    if (pacing not in ["host", "trigger"]):
+        print("ERROR: buffered scan pacing " + str(pacing) + " not valid...")
+        return False
+    inst_write_with_delay(inst, 'abor')
+    inst_write_with_delay(inst, 'sens:func "res"')
+    inst_write_with_delay(inst, 'sens:res:rang ' + res_range)
+    inst_write_with_delay(inst, 'trac:poin ' + str(max(num_readings, 10)) + ', "' + buffer_name + '"') # buffer holds min. 10 readings
+    inst_write_with_delay(inst, 'trac:cle "' + buffer_name + '"')
+    inst_write_with_delay(inst, 'trig:load "Empty"')
+    if (pacing == "host"):
+        inst_write_with_delay(inst, 'trig:bloc:wait 1, comm')                           # wait for *TRG from the host
+        inst_write_with_delay(inst, 'trig:bloc:del:const 2, ' + str(settle_time))       # let the muxes settle
+        inst_write_with_delay(inst, 'trig:bloc:meas 3, "' + buffer_name + '", 1')       # one reading into the buffer
+        inst_write_with_delay(inst, 'trig:bloc:bran:coun 4, ' + str(num_readings) + ', 1')
+    else:
+        inst_write_with_delay(inst, 'trig:ext:out:logi neg')
+        inst_write_with_delay(inst, 'trig:ext:out:stim not1')                           # EXT TRIG OUT pulses on notify 1
+        inst_write_with_delay(inst, 'trig:bloc:del:const 1, ' + str(settle_time))       # let the muxes settle
+        inst_write_with_delay(inst, 'trig:bloc:meas 2, "' + buffer_name + '", 1')       # one reading into the buffer
+        inst_write_with_delay(inst, 'trig:bloc:not 3, 1')                               # step the Arduino to the next cell
+        inst_write_with_delay(inst, 'trig:bloc:bran:coun 4, ' + str(num_readings) + ', 1')
+    inst_write_with_delay(inst, 'init')
+    return True
+
+'''
+Sends a bus trigger so the DMM takes the next buffered reading ("host" pacing only), then waits until
+the reading is in the buffer, so the muxes aren't stepped to the next cell while the DMM is still
+settling or measuring (the trigger model would also drop a *TRG that arrives before it's waiting again).
+The reading itself stays in the buffer until dmm_read_buffered_scan().
+Parameters:
+    inst: PyVISA object that has been initialized (i.e. the DMM in this case)
+    reading_num: Number of readings the buffer holds once this one is taken (1 for the first one)
+    timeout: Max time in seconds to wait for the reading
+    buffer_name: Name of the DMM reading buffer to use
+Returns:
+    True if the reading was taken, False if it timed out
+'''
+def dmm_trigger_buffered_reading(inst, reading_num, timeout=DMM_BUFFERED_READING_TIMEOUT, buffer_name=DMM_BUFFER_NAME):
+    inst_write_with_delay(inst, '*TRG')
+    start_time = time.time()
+    while (int(float(inst_query_with_delay(inst, 'trac:act? "' + buffer_name + '"'))) < reading_num):
+        if (time.time() - start_time > timeout):
+            print("ERROR: buffered reading " + str(reading_num) + " timed out...")
+            inst_write_with_delay(inst, 'abor')
+            return False
+    return True
+
+'''
+Waits for a buffered scan started with dmm_start_buffered_scan() to finish, then pulls
+all of the readings from the DMM in one bulk read.
+Parameters:
+    inst: PyVISA object that has been initialized (i.e. the DMM in this case)
+    num_readings: Number of readings the scan takes
+    timeout: Max time in seconds to wait for the scan to finish
+    buffer_name: Name of the DMM reading buffer to use
+Returns:
+    List of readings (floats) in the order they were taken, or None if the scan timed out
+'''
+def dmm_read_buffered_scan(inst, num_readings, timeout=DMM_BUFFERED_SCAN_TIMEOUT, buffer_name=DMM_BUFFER_NAME):
+    start_time = time.time()
+    while (int(float(inst_query_with_delay(inst, 'trac:act? "' + buffer_name + '"'))) < num_readings):
+        if (time.time() - start_time > timeout):
+            print("ERROR: buffered scan timed out...")
+            inst_write_with_delay(inst, 'abor')
+            return None
+        time.sleep(DMM_BUFFERED_SCAN_POLL_TIME)
+    vals_raw = inst_query_with_delay(inst, 'trac:data? 1, ' + str(num_readings) + ', "' + buffer_name + '", read')
+    inst_write_with_delay(inst, 'trig:load "Empty"')
+    return [float(val) for val in str(vals_raw).split(",")]
+
+'''
+Consumer half of the scan pipeline: the scan loop (producer) drives the Arduino and DMM and puts each
+reading in a bounded queue, and a background thread takes them off the queue and hands them to a
+handler function that does the slow work, i.e. CSV writing, threshold counting and progress printing.
+Use as a context manager; leaving the 'with' block waits until every reading has been handled.
+Parameters:
+    handler: Function called in the consumer thread with the arguments given to each put() call
+    maxsize: Max number of readings waiting in the queue before put() blocks
+'''
+class Scan_Result_Consumer:
+    def __init__(self, handler, maxsize=SCAN_QUEUE_SIZE):
+        self.handler = handler
+        self.queue = queue.Queue(maxsize)
+        self.error = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.queue.put(None)
+        self.thread.join()
+        if (exc_type is None and self.error is not None):
+            raise self.error
+        return False
+
+    '''
+    Queues one reading for the handler, returns right away unless the queue is full
+    Parameters:
+        *args: Arguments to call the handler with, e.g. (row, col, val)
+    Returns: None
+    '''
+    def put(self, *args):
+        self.queue.put(args)
+
+    # consumer thread, runs until the None sentinel is queued
+    def run(self):
+        while True:
+            args = self.queue.get()
+            if (args is None):
+                return
+            if (self.error is not None):
+                continue                        # keep draining so the producer doesn't block
+            try:
+                with trace_span("handle_reading", "csv"):
+                    self.handler(*args)
+            except Exception as e:
+                self.error = e
+
 '''
 Shuts down, safely disconnects from equipment, and exits the program if specified
 Parameters:
@@ -409,6 +1686,7 @@ Parameters:
 Returns: None
 '''
 def shutdown_equipment(ser, inst, psu, exit_program=False, using_psu=USING_USB_PSU):
+    shutdown_instrument_executors()         # lets queued/background calls (e.g. PSU power up) finish first
     if (ser is not None):
         ser.close()
         print("Disconnected tester")
@@ -420,11 +1698,14 @@ def shutdown_equipment(ser, inst, psu, exit_program=False, using_psu=USING_USB_P
     else:
         print("DMM not initialized")
     if (using_psu and (psu is not None)):
-        set_psu_off(psu)
+        psu.power_off()                     # ends the power session, however many suites still hold it
         psu.close()
         print("Disconnected PSU")
     else:
         print("PSU not initialized")
+    finish_run_checkpoint(remove=False)     # keeps the checkpoint, so an interrupted run can be resumed
+    save_run_trace()                        # the trace of an interrupted or crashed run, if not saved already
+    finish_results_outbox()
     if (exit_program):
         print("Exiting program now...")
         sys.exit(0)
@@ -529,13 +1810,12 @@ def init_equipment_with_config(rm, tester_hw_config_list_in=TESTER_HW_CONFIG_LIS
                         inst.close()
                         inst = None
                     if (psu is not None):
-                        set_psu_off(psu)
+                        psu.power_off()
                         psu.close()
                         psu = None
                     print("Could not connect with selected tester config\n")
 
         print("Using tester config: " + config_name)
-        init_helper(set_psu_on(psu, PSU_DELAY_TIME))
         # Query user for array connection type, e.g. probe card, ZIF, or something else
         array_connection_default = array_connection_list_in[0]
         valid_responses = {}
@@ -555,6 +1835,214 @@ def init_equipment_with_config(rm, tester_hw_config_list_in=TESTER_HW_CONFIG_LIS
         print("\nProgram interrupted. Exiting program...")
         shutdown_equipment(ser, inst, psu, True, using_usb_psu_in)
 
+'''
+Results of a two-dimensional test, e.g. one measurement per row/column intersection.
+Measurements are kept as floats in a (num_rows x num_cols) array, indexed [row][col] with 0 index,
+and NaN for cells that weren't measured. The row/col labels are only used when writing output.
+Parameters:
+    corner_label: Text in the top left cell of the "_alt.csv" output, e.g. "Resistance (ohm)"
+    row_name: Row label prefix, e.g. "Row" for "Row1"..."Row16"
+    col_name: Column label prefix, e.g. "Col" for "Col1"..."Col16"
+    num_rows: Number of rows in the array
+    num_cols: Number of columns in the array
+'''
+class Test_Result_Array:
+    def __init__(self, corner_label, row_name="R", col_name="C", num_rows=16, num_cols=16):
+        self.corner_label = corner_label
+        self.row_name = row_name
+        self.col_name = col_name
+        self.values = np.full((num_rows, num_cols), np.nan)
+
+    def set(self, row, col, val):
+        self.values[row, col] = val
+
+    '''
+    Returns:
+        Number of measured cells
+    '''
+    def count_measured(self):
+        return int(np.count_nonzero(~np.isnan(self.values)))
+
+    '''
+    Parameters:
+        threshold: Value to compare against, e.g. RES_SHORT_THRESHOLD_ROWCOL
+    Returns:
+        Number of measured cells below threshold
+    '''
+    def count_below(self, threshold):
+        return int(np.count_nonzero(self.values < threshold))
+
+    '''
+    Parameters:
+        threshold: Value to compare against
+    Returns:
+        Number of measured cells above threshold
+    '''
+    def count_above(self, threshold):
+        return int(np.count_nonzero(self.values > threshold))
+
+    '''
+    Builds the "_alt.csv" table: header row of "corner_label, Col1...Col16", then one row per
+    array row from the last row down to "Row1", with blank cells where nothing was measured
+    Returns:
+        2D numpy array of strings
+    '''
+    def get_alt_table(self):
+        (num_rows, num_cols) = self.values.shape
+        table = np.empty((num_rows+1, num_cols+1), dtype=object)
+        table[0, 0] = self.corner_label
+        table[0, 1:] = [self.col_name + str(col+1) for col in range(num_cols)]
+        table[1:, 0] = [self.row_name + str(row+1) for row in range(num_rows-1, -1, -1)]
+        values = self.values[::-1]
+        table[1:, 1:] = np.where(np.isnan(values), "", values.astype(str))
+        return table
+
+    '''
+    Writes the "_alt.csv" table to a file
+    Parameters:
+        filename: Full path of the file to write
+    Returns: None
+    '''
+    @traced("csv", ("filename",))
+    def save_alt_csv(self, filename):
+        np.savetxt(filename, self.get_alt_table(), delimiter=",", fmt="%s")
+
+    '''
+    Builds the ASCII map of the array, last row first, e.g. for shorts
+    (.) means above threshold (open), (X) means at or below threshold (short), (-) means not measured
+    Parameters:
+        threshold: Value to compare against, e.g. RES_SHORT_THRESHOLD_ROWCOL
+    Returns:
+        String with one line per row
+    '''
+    def get_short_map(self, threshold):
+        values = self.values[::-1]
+        chars = np.where(np.isnan(values), "-", np.where(values > threshold, ".", "X"))
+        return "".join(["".join(row) + "\n" for row in chars])
+
+'''
+Loads the most recent output CSV of a test for a DUT, e.g. to retest only the cells that failed last time
+Parameters:
+    path: Path the DUT's output files are saved to
+    dut_name: Full name of device + stage of test, as used in the output filenames
+    test_name: Test name, e.g. "CONT_ROW_TO_COL"
+    num_indices: Number of (1-indexed) index columns at the start of each CSV row,
+                 2 for 2D tests and test_cap, 1 for 1D tests
+    num_vals: Number of measurement columns after the indices to load
+Returns:
+    Tuple of (filename, dictionary {(0-indexed indices): [values]}), or (None, empty dictionary) if there's no previous CSV
+'''
+def load_previous_results(path, dut_name, test_name, num_indices, num_vals):
+    filenames = glob.glob(glob.escape(path) + "*_" + glob.escape(dut_name + "_" + test_name.lower()) + ".csv")
+    if (len(filenames) == 0):
+        return (None, dict())
+    filename = max(filenames, key=os.path.basename)     # filenames start with the timestamp
+    cells = dict()
+    with open(filename, newline='') as file:
+        reader = csv.reader(file)
+        next(reader, None)                              # header
+        for row in reader:
+            try:
+                cell = tuple([int(index)-1 for index in row[:num_indices]])
+                cells[cell] = [float(val) for val in row[num_indices:num_indices+num_vals]]
+            except (ValueError, IndexError):
+                continue
+    return (filename, cells)
+
+'''
+Picks the cells that passed in a test's most recent CSV, so a retest only measures the cells that
+failed (or weren't measured) last time and carries the passing ones over into the new results
+Parameters:
+    path, dut_name, test_name, num_indices, num_vals: See load_previous_results()
+    is_passing: Function that takes a cell's list of values and returns True if the cell passed
+Returns:
+    Tuple of (dictionary {(0-indexed indices): [values]} of passing cells, text for the summary file)
+'''
+def get_retest_cells(path, dut_name, test_name, num_indices, num_vals, is_passing):
+    (filename, prev_cells) = load_previous_results(path, dut_name, test_name, num_indices, num_vals)
+    if (filename is None):
+        out_text = "Retest: no previous " + test_name + " results found, measuring every cell"
+        print(out_text)
+        return (dict(), out_text + "\n")
+    passing_cells = {cell: vals for (cell, vals) in prev_cells.items() if is_passing(vals)}
+    out_text = ("Retest: " + str(len(passing_cells)) + " passing cell(s) carried over from " +
+                os.path.basename(filename) + ", measuring the rest")
+    print(out_text)
+    return (passing_cells, out_text + "\n")
+
+'''
+Gets the function that groups the cells of a cap test sharing a TFT off baseline
+Parameters:
+    off_baseline: One of CAP_OFF_BASELINES (tester_hw_configs.py)
+Returns:
+    Function (row, col) -> baseline key, or None if every cell measures its own baseline
+'''
+def get_cap_off_baseline_key(off_baseline):
+    if (off_baseline == "per_column"):
+        return lambda row, col: col
+    elif (off_baseline == "per_row_block"):
+        return lambda row, col: (row // CAP_OFF_BASELINE_ROW_BLOCK, col)
+    return None
+
+'''
+Quantifies the error of shared TFT off baselines against per-cell ones, from a cap test that measured
+every cell's off baseline. Each shared baseline is the off measurement of the first cell the scan
+visited in its group, i.e. what the shared baseline scan would have measured.
+Parameters:
+    plan: Scan_Plan of the per-cell scan (for the visit order)
+    cell_meas: Dictionary {(row, col): (cap off, cap on)} in F of the cells measured by the scan
+    cap_bound_vals: (lower, upper) bounds in pF of the calibrated measurement (cap on - cap off)
+Returns:
+    Text for the summary file, one line per shared baseline mode
+'''
+def validate_cap_off_baselines(plan, cell_meas, cap_bound_vals):
+    out_text = ""
+    for off_baseline in ["per_column", "per_row_block"]:
+        baseline_key = get_cap_off_baseline_key(off_baseline)
+        baselines = dict()
+        errors = []
+        num_changed = 0
+        for (row, col_list) in plan.rows:
+            for col in col_list:
+                if ((row, col) not in cell_meas):
+                    continue
+                (tft_off_meas, tft_on_meas) = cell_meas[(row, col)]
+                shared_off_meas = baselines.setdefault(baseline_key(row, col), tft_off_meas)
+                errors.append(abs(shared_off_meas - tft_off_meas)*1e12)
+                passing = cap_bound_vals[0] <= (tft_on_meas - tft_off_meas)*1e12 <= cap_bound_vals[1]
+                shared_passing = cap_bound_vals[0] <= (tft_on_meas - shared_off_meas)*1e12 <= cap_bound_vals[1]
+                if (passing != shared_passing):
+                    num_changed += 1
+        if (len(errors) == 0):
+            continue
+        out_text += ("Off baseline validation, " + off_baseline + ": " + str(len(baselines)) + " baseline(s), " +
+                     "max error " + str(round(max(errors), 4)) + "pF, mean error " +
+                     str(round(sum(errors)/len(errors), 4)) + "pF, " + str(num_changed) +
+                     " cell(s) would change pass/fail\n")
+    return out_text
+
+'''
+Checks if an adaptively averaged cap measurement needs more readings, i.e. if the calibrated value
+(on - off) is near one of the bounds or too noisy to call (see CAP_ADAPTIVE_AVERAGING_DEFAULT)
+Parameters:
+    off_samples: List of TFT off readings (F)
+    on_samples: List of TFT on readings (F)
+    cap_bound_vals: (lower, upper) bounds in pF of the calibrated measurement
+Returns:
+    True if more readings should be taken
+'''
+def cap_needs_more_samples(off_samples, on_samples, cap_bound_vals):
+    cal_meas = (np.mean(on_samples) - np.mean(off_samples))*1e12
+    variance = 0
+    for samples in (off_samples, on_samples):
+        if (len(samples) > 1):
+            variance += np.var(np.array(samples)*1e12, ddof=1)/len(samples)
+    std_error = np.sqrt(variance)
+    if (std_error > CAP_ADAPTIVE_MAX_STDERR_PF):
+        return True
+    margin = CAP_ADAPTIVE_MARGIN_PF + CAP_ADAPTIVE_SIGMAS*std_error
+    return any([abs(cal_meas - bound) < margin for bound in cap_bound_vals])
+
 # Test routines
 '''
 Two-dimensional test measures capacitance between column and one other node 
@@ -572,22 +2060,44 @@ Parameters:
     dut_stage_raw: Stage of assembly in plaintext (e.g. Post_Flex_Bond_ETest)
     test_mode_in: Test mode to use, one of the options in CAP_FN_DICT
     dut_type: If the device is a backplane, sensor array, or sensor module
-    meas_range: Multimeter capacitance measurement range
+    meas_range: Multimeter capacitance measurement range, None to use the profile's range
     start_row: Row # to start iterating through (typically 0)
     start_col: Col # to start iterating through (typically 0)
     end_row: Row # to end iterating through (typically 16)
     end_col: Col # to end iterating through (typically 16)
+    profile: DMM measurement profile to use, one of DMM_PROFILES
+    retest: True to only measure the cells that were out of bounds (or not measured) in the most recent
+            CSV of this test, carrying the rest over into the new results
+    order: Cell visit order, "row_major", "serpentine" or "auto" (see plan_scan), the CSV lists cells in this order
+    alternate_output_modes: True to measure every other cell TFT on first, see CAP_ALTERNATE_OUTPUT_MODES
+    off_baseline: How the TFT off baseline is measured, one of CAP_OFF_BASELINES (see CAP_OFF_BASELINE_DEFAULT)
+    adaptive_averaging: True to average single readings until the cell can be called in or out of bounds,
+                        instead of the profile's fixed DMM averaging (see CAP_ADAPTIVE_AVERAGING_DEFAULT)
 Returns:
     Tuple, with following parameters:
         0 for success, -1 for failure or wrong parameter specified
         Output text (to be appended to summary file)
 '''
+@traced("test", ("test_mode_in", "profile"))
 def test_cap(ser, inst, path, dut_name_raw, dut_stage_raw, test_mode_in, dut_type,
-             meas_range='1e-9', start_row=0, start_col=0, end_row=16, end_col=16):
+             meas_range=None, start_row=0, start_col=0, end_row=16, end_col=16, profile=DMM_PROFILE_CAP,
+             retest=False, order=SCAN_ORDER_DEFAULT, alternate_output_modes=CAP_ALTERNATE_OUTPUT_MODES,
+             off_baseline=CAP_OFF_BASELINE_DEFAULT, adaptive_averaging=CAP_ADAPTIVE_AVERAGING_DEFAULT):
     if (test_mode_in not in CAP_FN_DICT):
         print("ERROR: test mode not defined...")
         return (-1, "CAP TEST ERROR")
+    if (off_baseline not in CAP_OFF_BASELINES):
+        print("ERROR: off baseline mode " + str(off_baseline) + " not defined...")
+        return (-1, "CAP TEST ERROR")
+    if (set_dmm_profile(inst, profile) is None):
+        return (-1, "CAP TEST ERROR")
+    if (meas_range is None):
+        meas_range = DMM_PROFILES[profile]["cap_range"]
     test_name = test_mode_in
+    checkpoint_out = get_checkpoint_result(test_name)
+    if (checkpoint_out is not None):
+        return checkpoint_out
+    done_cells = get_checkpoint_cells(test_name)
     dut_name_full = ""
     if (dut_stage_raw == ""):
         dut_name_full = dut_name_raw
@@ -601,73 +2111,159 @@ def test_cap(ser, inst, path, dut_name_raw, dut_stage_raw, test_mode_in, dut_typ
         cap_bound_vals = CAP_THRESHOLD_VALS[dut_name_segmented[1]] # if this sensor type isn't in the array, uses default value
     if (dut_type == "Backplanes"):
         cap_bound_vals = CAP_THRESHOLD_VALS["backplane"]
-    num_below_threshold = 0
-    num_in_threshold = 0
-    num_above_threshold = 0
+    retest_text = ""
+    if (retest):
+        # [cap off, cap on] in F, passing if (on - off) is inside the bounds in pF
+        (passing_cells, retest_text) = get_retest_cells(path, dut_name_full, test_name, 2, 2,
+            lambda vals: cap_bound_vals[0] <= (vals[1] - vals[0])*1e12 <= cap_bound_vals[1])
+        done_cells = passing_cells | done_cells
 
     with open(path + datetime_now + "_" + dut_name_full + "_" + test_name.lower() + ".csv", 'w', newline='') as file:
         writer = csv.writer(file)
-        writer.writerow(["Row Index", "Column Index", "Cap Off Measurement (F)", "Cap On Measurement (F)", "Calibrated Measurement (F)"])
+        writer.writerow(["Row Index", "Column Index", "Cap Off Measurement (F)", "Cap On Measurement (F)", "Calibrated Measurement (F)",
+                         "DMM Profile", "Cap Off Baseline", "Cap Off Samples", "Cap On Samples"])
         inst_write_with_delay(inst, 'sens:cap:rang ' + meas_range, DMM_DELAY_TIME_CAP)
+        (min_samples, max_samples) = (1, 1)     # readings per measurement, each averaged by the DMM
+        dmm_aver_count = DMM_PROFILES[profile]["cap_aver_count"]
+        if (adaptive_averaging):
+            dmm_aver_count = 1
+            inst_write_with_delay(inst, 'sens:cap:aver off', DMM_DELAY_TIME_CAP)  # single readings, averaged here
+            max_samples = DMM_PROFILES[profile]["cap_aver_count"]
+            min_samples = min(CAP_ADAPTIVE_MIN_SAMPLES, max_samples)
         inst_query_with_delay(inst, 'meas:cap?', DMM_DELAY_TIME_CAP)
         print("Sensor " + test_name + " Check Running...")
         print_progress_bar(0, 16, suffix = "Row 0/16", length = 16)
-        out_array_delta = np.zeros((18, 17), dtype='U64')          # create string-typed numpy array
-        out_array_delta[1] = ["C" + str(i) for i in range(0, 17)]  # set cols of output array to be "C1"..."C16"
-        for i in range(len(out_array_delta)):
-            out_array_delta[len(out_array_delta)-1-i][0] = "R" + str(i+1)# set rows of output array to be "R1"..."R16"
-
-        out_array_on = np.zeros((18, 17), dtype='U64')          # create string-typed numpy array
-        out_array_on[1] = ["C" + str(i) for i in range(0, 17)]  # set cols of output array to be "C1"..."C16"
-        for i in range(len(out_array_on)):
-            out_array_on[len(out_array_on)-1-i][0] = "R" + str(i+1)# set rows of output array to be "R1"..."R16"
-
-        out_array_delta[1][0] = "Cap TFT On - Cap TFT Off (pF)"
-        out_array_on[1][0] = "Cap TFT On (pF)"
-
-        for row in range(start_row, end_row):
-            for col in range(start_col, end_col):
-                serial_write_with_delay(ser, b'Z', SERIAL_DELAY_TIME_CAP)                         # sets all mux switches to high-Z mode
-                serial_write_with_delay(ser, CAP_FN_DICT[test_name], SERIAL_DELAY_TIME_CAP)       # pre-sets the secondary muxes to the right state for cap measurement
-                serial_write_with_delay(ser, b'R', SERIAL_DELAY_TIME_CAP)                         # sets primary mux to row write mode
-                serial_write_with_delay(ser, bytes(hex(row)[2:], 'utf-8'), SERIAL_DELAY_TIME_CAP) # sets row address
-                serial_write_with_delay(ser, b'L', SERIAL_DELAY_TIME_CAP)                         # sets primary mux to column write mode
-                serial_write_with_delay(ser, bytes(hex(col)[2:], 'utf-8'), SERIAL_DELAY_TIME_CAP) # sets column address
-                serial_write_with_delay(ser, b'I', SERIAL_DELAY_TIME_CAP)                         # sets primary row mux to "binary counter disable mode", which sets all TFT's off (to -8V)
-
-                tft_off_meas = float(inst_query_with_delay(inst, 'meas:cap?', DMM_DELAY_TIME_CAP))
-
-                serial_write_with_delay(ser, b'Z', SERIAL_DELAY_TIME_CAP)                         # sets all mux switches to high-Z mode
-                serial_write_with_delay(ser, CAP_FN_DICT[test_name], SERIAL_DELAY_TIME_CAP)       # pre-sets the secondary muxes to the right state for cap measurement
-                serial_write_with_delay(ser, b'R', SERIAL_DELAY_TIME_CAP)                         # sets primary mux to row write mode
-                serial_write_with_delay(ser, bytes(hex(row)[2:], 'utf-8'), SERIAL_DELAY_TIME_CAP) # sets row address
-                serial_write_with_delay(ser, b'L', SERIAL_DELAY_TIME_CAP)                         # sets primary mux to column write mode
-                serial_write_with_delay(ser, bytes(hex(col)[2:], 'utf-8'), SERIAL_DELAY_TIME_CAP) # sets column address
-                serial_write_with_delay(ser, b'P', SERIAL_DELAY_TIME_CAP)                         # sets primary row mux to capacitance check mode
-
-                tft_on_meas = float(inst_query_with_delay(inst, 'meas:cap?', DMM_DELAY_TIME_CAP))
-                tft_cal_meas = tft_on_meas - tft_off_meas
-                if (tft_cal_meas*1e12 < cap_bound_vals[0]):
-                    num_below_threshold += 1
-                elif (tft_cal_meas*1e12 > cap_bound_vals[1]):
-                    num_above_threshold += 1
-                else:
-                    num_in_threshold += 1
-                out_array_delta[(16-row)+1][col+1] = tft_cal_meas*1e12
-                out_array_on[(16-row)+1][col+1] = tft_on_meas*1e12
-                writer.writerow([str(row+1), str(col+1), tft_off_meas, tft_on_meas, tft_cal_meas]) # appends to CSV with 1 index
-            print_progress_bar(row+1, 16, suffix = "Row " + str(row+1) + "/16", length = 16)
-    serial_write_with_delay(ser, b'Z', SERIAL_DELAY_TIME_CAP)
-    out_array_delta = np.delete(out_array_delta, (0), axis=0)
-    np.savetxt(path + datetime_now + "_" + dut_name_full + "_" + test_name.lower() + "_alt_delta.csv", out_array_delta, delimiter=",", fmt="%s")
-    out_array_on = np.delete(out_array_on, (0), axis=0)
-    np.savetxt(path + datetime_now + "_" + dut_name_full + "_" + test_name.lower() + "_alt_on.csv", out_array_on, delimiter=",", fmt="%s")
-    out_text = "Ran " + test_name + " test w/ " + str(meas_range) + " F range"
+        out_array_delta = Test_Result_Array("Cap TFT On - Cap TFT Off (pF) [" + profile + "]", "R", "C")
+        out_array_on = Test_Result_Array("Cap TFT On (pF) [" + profile + "]", "R", "C")
+
+        # runs in the consumer thread, so the scan loop doesn't wait on disk or terminal output
+        def handle_reading(row, col, tft_off_meas, tft_on_meas, off_source, num_off_samples, num_on_samples):
+            tft_cal_meas = tft_on_meas - tft_off_meas
+            out_array_delta.set(row, col, tft_cal_meas*1e12)
+            out_array_on.set(row, col, tft_on_meas*1e12)
+            writer.writerow([str(row+1), str(col+1), tft_off_meas, tft_on_meas, tft_cal_meas, profile, off_source,
+                             num_off_samples, num_on_samples]) # appends to CSV with 1 index
+            if ((row, col) not in done_cells):
+                add_checkpoint_cell(test_name, (row, col), [tft_off_meas, tft_on_meas])
+                cell_meas[(row, col)] = (tft_off_meas, tft_on_meas)
+            if ((row, col) in plan.row_ends):
+                print_progress_bar(row+1, 16, suffix = "Row " + str(row+1) + "/16", length = 16)
+
+        mux = Tester_Mux_Driver(ser, SERIAL_DELAY_TIME_CAP)
+        baseline_key = get_cap_off_baseline_key(off_baseline)
+        plan = plan_scan(CAP_FN_DICT[test_name], b'R', start_row, end_row, b'L', start_col, end_col,
+                         [b'I', b'P'], order, alternate_output_modes, done_cells, b'I', baseline_key)
+        baselines = dict()      # baseline key: shared TFT off readings
+        cell_meas = dict()      # (row, col): (cap off, cap on) of the cells measured in this run, for validation
+        with Scan_Result_Consumer(handle_reading) as consumer:
+            for (row, col_list) in plan.rows:
+                with trace_span("row", row=row):
+                    for col in col_list:
+                        off_source = off_baseline
+                        if ((row, col) in done_cells):
+                            (tft_off_meas, tft_on_meas) = done_cells[(row, col)]    # measured before the interruption
+                            (off_source, off_samples, on_samples) = ("carried over", [], [])
+                        else:
+                            with trace_span("cell", row=row, col=col):
+                                samples = dict()
+                                for output_mode in plan.output_modes[(row, col)]:
+                                    # secondary muxes in cap measurement state, row/col addressed, primary row mux in
+                                    # 'I' "binary counter disable mode", which sets all TFT's off (to -8V), or
+                                    # 'P' capacitance check mode, which turns the addressed row's TFT's on
+                                    mux.set_state(CAP_FN_DICT[test_name], [(b'R', row), (b'L', col)], output_mode)
+                                    samples[output_mode] = [float(inst_query_with_delay(inst, 'meas:cap?', DMM_DELAY_TIME_CAP))
+                                                            for i in range(min_samples)]
+                                if (baseline_key is None):
+                                    off_samples = samples[b'I']
+                                else:
+                                    # first cell of the group measures the baseline, the rest reuse it
+                                    off_samples = baselines.setdefault(baseline_key(row, col), samples.get(b'I'))
+                                on_samples = samples[b'P']
+                                # more readings in the last output mode (no mux change) until the cell can be called
+                                last_samples = samples[plan.output_modes[(row, col)][-1]]
+                                while (len(last_samples) < max_samples and
+                                       cap_needs_more_samples(off_samples, on_samples, cap_bound_vals)):
+                                    last_samples.append(float(inst_query_with_delay(inst, 'meas:cap?', DMM_DELAY_TIME_CAP)))
+                                (tft_off_meas, tft_on_meas) = (float(np.mean(off_samples)), float(np.mean(on_samples)))
+                        consumer.put(row, col, tft_off_meas, tft_on_meas, off_source,
+                                     len(off_samples)*dmm_aver_count, len(on_samples)*dmm_aver_count)
+            mux.reset()
+    out_array_delta.save_alt_csv(path + datetime_now + "_" + dut_name_full + "_" + test_name.lower() + "_alt_delta.csv")
+    out_array_on.save_alt_csv(path + datetime_now + "_" + dut_name_full + "_" + test_name.lower() + "_alt_on.csv")
+    num_below_threshold = out_array_delta.count_below(cap_bound_vals[0])
+    num_above_threshold = out_array_delta.count_above(cap_bound_vals[1])
+    num_in_threshold = out_array_delta.count_measured() - num_below_threshold - num_above_threshold
+    out_text = (retest_text + "Ran " + test_name + " test w/ " + str(meas_range) + " F range, " + profile + " DMM profile, " +
+                off_baseline + " off baseline" + (", adaptive averaging" if adaptive_averaging else ""))
     out_text += "\nNo. of sensors inside bounds: " + str(num_in_threshold)
     out_text += "\nNo. of sensors below lower threshold of " + str(cap_bound_vals[0]) + "pF: " + str(num_below_threshold)
     out_text += "\nNo. of sensors above upper threshold of " + str(cap_bound_vals[1]) + "pF: " + str(num_above_threshold) + "\n"
+    if (off_baseline == "validate"):
+        out_text += validate_cap_off_baselines(plan, cell_meas, cap_bound_vals)
     print("\n" + out_text)
-    return(num_in_threshold, out_text + "\n")
+    return set_checkpoint_result(test_name, (num_in_threshold, out_text + "\n"))
+
+'''
+Takes every reading of a two-dimensional continuity test into the DMM's reading buffer, then pulls
+them all from the DMM in one bulk read, instead of one blocking query per cell.
+***PREREQUISITE: Power supply to tester boards MUST be on!
+Parameters:
+    ser: PySerial object that has been initialized to the Arduino's serial port
+    inst: PyVISA object that has been initialized (i.e. the DMM in this case)
+    test_name: Test mode to run, one of the ones specified in CONT_DICT_TWO_DIM
+    start_dim1: Dim1 (e.g. row) # to start iterating through (typically 0)
+    end_dim1: Dim1 (e.g. row) # to end iterating through (typically 16)
+    start_dim2: Dim2 (e.g. col) # to start iterating through (typically 0)
+    end_dim2: Dim2 (e.g. col) # to end iterating through (typically 16)
+    pacing: "host" or "trigger", see DMM_BUFFERED_SCAN_PACING in tester_hw_configs.py
+            ("trigger" always uses the firmware scan sequencer)
+    use_scan_sequencer: True to step through the cells with the firmware scan sequencer
+    order: Visit order when the host steps the muxes, "row_major", "serpentine" or "auto" (see plan_scan)
+Returns:
+    List of readings (floats) in the order of plan_scan(..., order).rows (row major with the scan sequencer),
+    or None if the buffered scan failed
+'''
+@traced("test", ("test_name", "pacing"))
+def acquire_two_dim_buffered(ser, inst, test_name, start_dim1, end_dim1, start_dim2, end_dim2,
+                             pacing=DMM_BUFFERED_SCAN_PACING, use_scan_sequencer=USE_FIRMWARE_SCAN_DEFAULT,
+                             order=SCAN_ORDER_DEFAULT):
+    (secondary_cmd, dim1_cmd, dim2_cmd) = CONT_DICT_TWO_DIM[test_name]
+    num_readings = (end_dim1-start_dim1)*(end_dim2-start_dim2)
+    mux = Tester_Mux_Driver(ser)
+    scan = None
+    if (use_scan_sequencer or pacing == "trigger"):
+        scan = Tester_Scan_Sequencer(ser, secondary_cmd, dim1_cmd, start_dim1, end_dim1,
+                                     dim2_cmd, start_dim2, end_dim2, b'O')
+        order = "row_major"                                         # the sequencer steps dim2 fastest
+    plan = plan_scan(secondary_cmd, dim1_cmd, start_dim1, end_dim1, dim2_cmd, start_dim2, end_dim2, [b'O'], order)
+    print("Taking " + str(num_readings) + " buffered readings (" + pacing + " pacing)...")
+    if (pacing == "trigger"):
+        scan.next_cell()                                            # sequencer on the first cell before the DMM starts,
+    if (not dmm_start_buffered_scan(inst, num_readings, pacing)):   # the DMM steps it after that
+        return None
+    timed_out = False
+    if (pacing == "host"):
+        reading_num = 0
+        for (dim1_cnt, dim2_list) in plan.rows:
+            with trace_span("row", row=dim1_cnt):
+                for dim2_cnt in dim2_list:
+                    with trace_span("cell", row=dim1_cnt, col=dim2_cnt):
+                        if (scan is not None):
+                            scan.next_cell()                        # sequencer steps to (dim1_cnt, dim2_cnt)
+                        else:
+                            mux.set_state(secondary_cmd, [(dim1_cmd, dim1_cnt), (dim2_cmd, dim2_cnt)], b'O')
+                        reading_num += 1
+                        timed_out = not dmm_trigger_buffered_reading(inst, reading_num)  # waits for the reading
+                    if (timed_out):
+                        break
+            if (timed_out):
+                break
+    vals = None if timed_out else dmm_read_buffered_scan(inst, num_readings)
+    if (scan is not None):
+        scan.stop()                                                 # halt sequencer, set all mux enables + mux channels to OFF
+    else:
+        mux.reset()                                                 # set all mux enables + mux channels to OFF
+    return vals
 
 '''
 Two-dimensional test that measures continuity at every intersection, e.g. row to column.
@@ -683,76 +2279,142 @@ Parameters:
     end_dim1: Dim1 (e.g. row) # to end iterating through (typically 16)
     end_dim2: Dim2 (e.g. col) # to end iterating through (typically 16)
     res_threshold: Threshold below which a measurement is considered a short
+    use_scan_sequencer: True to step through the cells with the firmware scan sequencer
+                        (one setup command, then one step command per cell), False to address every cell
+    dmm_buffered: True to take all readings into the DMM's buffer and read them back at once,
+                  False to query the DMM once per cell
+    pacing: Buffered scan pacing, "host" or "trigger", see DMM_BUFFERED_SCAN_PACING in tester_hw_configs.py
+    profile: DMM measurement profile to use, one of DMM_PROFILES
+    adaptive: True to measure each dim1 (e.g. row) against all columns at once first, and only measure
+              the cells of rows that read below res_threshold (see TESTER_CAN_GANG_COLUMNS);
+              cells of clean rows are recorded with the ganged reading. Overrides dmm_buffered/use_scan_sequencer.
+    retest: True to only measure the cells that were shorted (or not measured) in the most recent CSV
+            of this test, carrying the rest over into the new results
+    order: Cell visit order, "row_major", "serpentine" or "auto" (see plan_scan), the CSV lists cells in this order
 Returns:
     Tuple, with following parameters:
         Total number of shorts detected
         Output text (to be appended to summary file)
 '''
+@traced("test", ("test_id", "profile"))
 def test_cont_two_dim(ser, inst, path, dut_name, test_id, start_dim1=0, start_dim2=0,
-                      end_dim1=16, end_dim2=16, res_threshold = RES_SHORT_THRESHOLD_ROWCOL):
+                      end_dim1=16, end_dim2=16, res_threshold = RES_SHORT_THRESHOLD_ROWCOL,
+                      use_scan_sequencer=USE_FIRMWARE_SCAN_DEFAULT, dmm_buffered=DMM_BUFFERED_SCAN_DEFAULT,
+                      pacing=DMM_BUFFERED_SCAN_PACING, profile=DMM_PROFILE_CONT, adaptive=ADAPTIVE_SCAN_DEFAULT,
+                      retest=False, order=SCAN_ORDER_DEFAULT):
     test_name = test_id.upper()
     if (test_name not in CONT_DICT_TWO_DIM):
         out_text = "ERROR: 2D node resistance check " + test_name + " not valid...\n"
         print(out_text)
         return (-1, out_text)
+    if (set_dmm_profile(inst, profile) is None):
+        return (-1, "ERROR: DMM measurement profile " + str(profile) + " not valid...\n")
+    checkpoint_out = get_checkpoint_result(test_name)
+    if (checkpoint_out is not None):
+        return checkpoint_out
+    done_cells = get_checkpoint_cells(test_name)
+    retest_text = ""
+    if (retest):
+        (passing_cells, retest_text) = get_retest_cells(path, dut_name, test_name, 2, 1,
+                                                        lambda vals: vals[0] >= res_threshold)
+        done_cells = passing_cells | done_cells
+    if (len(done_cells) > 0):
+        # the buffered scan and the firmware scan sequencer can't skip cells, so the rest is measured cell by cell
+        (dmm_buffered, use_scan_sequencer, adaptive) = (False, False, False)
+    if (adaptive and not (TESTER_CAN_GANG_COLUMNS and CONT_DICT_TWO_DIM[test_name][2] == b'L')):
+        print("Tester can't connect all columns at once (TESTER_CAN_GANG_COLUMNS), measuring every cell...")
+        adaptive = False
+    if (adaptive):
+        (dmm_buffered, use_scan_sequencer) = (False, False)
     dim1_name = test_name.split('_')[1].capitalize()
     dim2_name = test_name.split('_')[3].capitalize()
     datetime_now = dt.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
 
-    out_array = np.zeros((18, 17), dtype='U64')              # create string-typed numpy array
-    out_array[1] = [dim2_name + str(i) for i in range(0, 17)]  # set cols of output array to be "dim2_1...dim2_16"
-    for i in range(len(out_array)):
-        out_array[len(out_array)-1-i][0] = dim1_name + str(i+1)# set rows of output array to be "dim1_1...dim1_16"
-    out_array[1][0] = "Resistance (ohm)"
-    num_shorts = 0
+    out_array = Test_Result_Array("Resistance (ohm) [" + profile + "]", dim1_name, dim2_name)
     out_text = ""
     inst.query('meas:res?')
     time.sleep(SERIAL_DELAY_TIME)
-    out_text += "Sensor " + test_name + " Detection Running..."
+    out_text += "Sensor " + test_name + " Detection Running (" + profile + " DMM profile)..."
     print(out_text)
-    out_text += "\n"
+    out_text += "\n" + retest_text
+
+    buffered_vals = None
+    if (dmm_buffered):
+        buffered_vals = acquire_two_dim_buffered(ser, inst, test_name, start_dim1, end_dim1, start_dim2, end_dim2,
+                                                 pacing, use_scan_sequencer, order)
+        if (buffered_vals is None):
+            print("Buffered scan failed, measuring cell by cell instead...")
 
     with open(path + datetime_now + "_" + dut_name + "_" + test_name.lower() + ".csv", 'w', newline='') as file:
         writer = csv.writer(file)
-        writer.writerow([dim1_name + " Index", dim2_name + " Index", dim1_name + " Res. to " + dim2_name + " (ohm)"])
+        writer.writerow([dim1_name + " Index", dim2_name + " Index", dim1_name + " Res. to " + dim2_name + " (ohm)", "DMM Profile"])
         print_progress_bar(0, 16, suffix = dim1_name + " 0/16", length = 16)
         time.sleep(SERIAL_DELAY_TIME)
-        for dim1_cnt in range(start_dim1, end_dim1):
-            for dim2_cnt in range(start_dim2, end_dim2):
-                serial_write_with_delay(ser, b'Z')                              # set row switches to high-Z and disable muxes
-                serial_write_with_delay(ser, CONT_DICT_TWO_DIM[test_name][0])   # set secondary mux to specified input mode
-                serial_write_with_delay(ser, CONT_DICT_TWO_DIM[test_name][1])   # set mode to dim1 write mode
-                serial_write_with_delay(ser, bytes(hex(dim1_cnt)[2:], 'utf-8')) # write dim1 index
-                serial_write_with_delay(ser, CONT_DICT_TWO_DIM[test_name][2])   # set mode to dim2 write mode
-                serial_write_with_delay(ser, bytes(hex(dim2_cnt)[2:], 'utf-8')) # write dim2 index
-                serial_write_with_delay(ser, b'O')                              # set mode to continuity check
-                val = float(inst_query_with_delay(inst, 'meas:res?'))           # read resistance measurement
-                out_array[(16-dim1_cnt)+1][dim2_cnt+1] = val
-                if (val < res_threshold):
-                    num_shorts += 1
-                writer.writerow([str(dim1_cnt+1), str(dim2_cnt+1), val])
-            print_progress_bar(dim1_cnt+1, 16, suffix = dim1_name + " " + str(dim1_cnt+1) + "/16", length = 16)
-    serial_write_with_delay(ser, b'Z')                                          # set all mux enables + mux channels to OFF
-    out_array = np.delete(out_array, (0), axis=0)
-    np.savetxt(path + datetime_now + "_" + dut_name + "_" + test_name.lower() + "_alt.csv", out_array, delimiter=",", fmt="%s")
+        mux = Tester_Mux_Driver(ser)
+        (secondary_cmd, dim1_cmd, dim2_cmd) = CONT_DICT_TWO_DIM[test_name]
+        scan = None
+        if (use_scan_sequencer and buffered_vals is None):
+            scan = Tester_Scan_Sequencer(ser, secondary_cmd, dim1_cmd, start_dim1, end_dim1,
+                                         dim2_cmd, start_dim2, end_dim2, b'O')
+        if (scan is not None or (buffered_vals is not None and (use_scan_sequencer or pacing == "trigger"))):
+            order = "row_major"                                 # the sequencer steps dim2 fastest
+        plan = plan_scan(secondary_cmd, dim1_cmd, start_dim1, end_dim1, dim2_cmd, start_dim2, end_dim2,
+                         [b'O'], order, skip_cells=done_cells)
+
+        # runs in the consumer thread, so the scan loop doesn't wait on disk or terminal output
+        def handle_reading(dim1_cnt, dim2_cnt, val):
+            out_array.set(dim1_cnt, dim2_cnt, val)
+            writer.writerow([str(dim1_cnt+1), str(dim2_cnt+1), val, profile])
+            if ((dim1_cnt, dim2_cnt) not in done_cells):
+                add_checkpoint_cell(test_name, (dim1_cnt, dim2_cnt), [val])
+            if ((dim1_cnt, dim2_cnt) in plan.row_ends):
+                print_progress_bar(dim1_cnt+1, 16, suffix = dim1_name + " " + str(dim1_cnt+1) + "/16", length = 16)
+
+        buffered_index = 0
+        with Scan_Result_Consumer(handle_reading) as consumer:
+            for (dim1_cnt, dim2_list) in plan.rows:
+                with trace_span("row", row=dim1_cnt):
+                    ganged_val = None
+                    if (adaptive):
+                        with trace_span("ganged_cols", row=dim1_cnt):
+                            mux.set_state(secondary_cmd, [(dim1_cmd, dim1_cnt)], b'O')
+                            serial_write_with_delay(ser, SERIAL_GANG_COLS)      # every column connected at once
+                            mux.invalidate()                                    # next column address clears it
+                            ganged_val = float(inst_query_with_delay(inst, 'meas:res?'))
+                        if (ganged_val < res_threshold):
+                            ganged_val = None                                   # short(s) in this row, find the column(s)
+                    for dim2_cnt in dim2_list:
+                        if (buffered_vals is not None):
+                            val = buffered_vals[buffered_index]                 # already measured by the buffered scan
+                            buffered_index += 1
+                        elif ((dim1_cnt, dim2_cnt) in done_cells):
+                            val = done_cells[(dim1_cnt, dim2_cnt)][0]           # measured before the interruption
+                        elif (ganged_val is not None):
+                            val = ganged_val                                    # every column in the row is open
+                        else:
+                            with trace_span("cell", row=dim1_cnt, col=dim2_cnt):
+                                if (scan is not None):
+                                    scan.next_cell()                            # sequencer steps to (dim1_cnt, dim2_cnt)
+                                else:
+                                    # secondary mux in specified input mode, dim1 + dim2 addressed, continuity check mode
+                                    mux.set_state(secondary_cmd, [(dim1_cmd, dim1_cnt), (dim2_cmd, dim2_cnt)], b'O')
+                                val = float(inst_query_with_delay(inst, 'meas:res?')) # read resistance measurement
+                        consumer.put(dim1_cnt, dim2_cnt, val)
+            if (scan is not None):
+                scan.stop()                                                     # halt sequencer, set all mux enables + mux channels to OFF
+            elif (buffered_vals is None):
+                mux.reset()                                                     # set all mux enables + mux channels to OFF
+    out_array.save_alt_csv(path + datetime_now + "_" + dut_name + "_" + test_name.lower() + "_alt.csv")
+    num_shorts = out_array.count_below(res_threshold)
     num_shorts_text = test_name + " yielded " + str(num_shorts) + " short(s)"
     print(num_shorts_text)
     out_text += num_shorts_text + "\n"
-    out_array = np.delete(out_array, (0), axis=1)
-    out_array = out_array[1:]
     if (num_shorts > 0):
-        for dim1_cnt in range(out_array.shape[0]):
-            for dim2_cnt in range(out_array.shape[1]):
-                if (float(out_array[dim1_cnt][dim2_cnt]) > res_threshold):
-                    print(".", end="")
-                    out_text += "."
-                else:
-                    print("X", end="")
-                    out_text += "X"
-            print("")
-            out_text += "\n"
+        short_map = out_array.get_short_map(res_threshold)
+        print(short_map, end="")
+        out_text += short_map
     print("")
-    return(num_shorts, out_text)
+    return set_checkpoint_result(test_name, (num_shorts, out_text))
 
 '''
 One-dimensional test that measures continuity at intersections to a node, e.g. column to PZBIAS
@@ -766,19 +2428,35 @@ Parameters:
     start_ind: Dim1 (e.g. col) # to start iterating through (typically 0)
     end_ind: Dim1 (e.g. col) # to end iterating through (typically 16)
     res_threshold: Threshold below which a measurement is considered a short
+    profile: DMM measurement profile to use, one of DMM_PROFILES
+    retest: True to only measure the lines that were shorted (or not measured) in the most recent CSV
+            of this test, carrying the rest over into the new results
 Returns:
     Tuple, with following parameters:
         Total number of shorts detected
         Output text (to be appended to summary file)
 '''
+@traced("test", ("test_id", "profile"))
 def test_cont_one_dim(ser, inst, path, dut_name, test_id, start_ind=0,
-                      end_ind=16, res_threshold=RES_SHORT_THRESHOLD_RC_TO_PZBIAS):
+                      end_ind=16, res_threshold=RES_SHORT_THRESHOLD_RC_TO_PZBIAS, profile=DMM_PROFILE_CONT,
+                      retest=False):
     test_name = test_id.upper()
     primary_mux_state = test_name.split("_")[1].capitalize()
     if (test_name not in CONT_DICT_ONE_DIM):
         out_text = "ERROR: 1D intersection resistance check " + test_name + " not valid...\n"
         print(out_text)
         return (-1, out_text)
+    if (set_dmm_profile(inst, profile) is None):
+        return (-1, "ERROR: DMM measurement profile " + str(profile) + " not valid...\n")
+    checkpoint_out = get_checkpoint_result(test_name)
+    if (checkpoint_out is not None):
+        return checkpoint_out
+    done_cells = get_checkpoint_cells(test_name)
+    retest_text = ""
+    if (retest):
+        (passing_cells, retest_text) = get_retest_cells(path, dut_name, test_name, 1, 1,
+                                                        lambda vals: vals[0] >= res_threshold)
+        done_cells = passing_cells | done_cells
     datetime_now = dt.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
     num_shorts = 0
     summary_text = ""
@@ -786,27 +2464,40 @@ def test_cont_one_dim(ser, inst, path, dut_name, test_id, start_ind=0,
 
     inst.query('meas:res?')                              # set Keithley mode to resistance measurement
     time.sleep(SERIAL_DELAY_TIME)
-    out_text += "Sensor " + test_name + " Detection Running..."
+    out_text += "Sensor " + test_name + " Detection Running (" + profile + " DMM profile)..."
     print(out_text)
-    out_text += "\n"
+    out_text += "\n" + retest_text
     with open(path + datetime_now + "_" + dut_name + "_" + test_name.lower() + ".csv", 'w', newline='') as file:
         writer = csv.writer(file)
-        writer.writerow([primary_mux_state + " Index", test_name + " (ohm)"])
+        writer.writerow([primary_mux_state + " Index", test_name + " (ohm)", "DMM Profile"])
         print_progress_bar(0, 16, suffix = primary_mux_state + " 0/16", length = 16)
-        for ind in range(start_ind, end_ind):
-            serial_write_with_delay(ser, b'Z')                     # set row switches to high-Z and disable muxes
-            serial_write_with_delay(ser, CONT_DICT_ONE_DIM[test_name][0]) # set secondary mux to appropriate mode
-            serial_write_with_delay(ser, CONT_DICT_ONE_DIM[test_name][1]) # set write mode to appropriate
-            serial_write_with_delay(ser, bytes(hex(ind)[2:], 'utf-8'))    # write the row address to the tester
-            serial_write_with_delay(ser, b'O')                     # set mode to continuity check mode
-            val = float(inst_query_with_delay(inst, 'meas:res?'))  # read resistance from the meter
-            writer.writerow([str(ind+1), val])                  # write value to CSV
+
+        # runs in the consumer thread, so the scan loop doesn't wait on disk or terminal output
+        def handle_reading(ind, val):
+            nonlocal num_shorts, summary_text
+            writer.writerow([str(ind+1), val, profile])         # write value to CSV
+            if ((ind,) not in done_cells):
+                add_checkpoint_cell(test_name, (ind,), [val])
             if (val < res_threshold):
                 num_shorts += 1
                 summary_text += "X"
             else:
                 summary_text += "."
             print_progress_bar(ind+1, 16, suffix = primary_mux_state + " " + str(ind+1) + "/16", length = 16)
+
+        with Scan_Result_Consumer(handle_reading) as consumer:
+            for ind in range(start_ind, end_ind):
+                if ((ind,) in done_cells):
+                    val = done_cells[(ind,)][0]                            # measured before the interruption
+                else:
+                    with trace_span("cell", ind=ind):
+                        serial_write_with_delay(ser, b'Z')                 # set row switches to high-Z and disable muxes
+                        serial_write_with_delay(ser, CONT_DICT_ONE_DIM[test_name][0]) # set secondary mux to appropriate mode
+                        serial_write_with_delay(ser, CONT_DICT_ONE_DIM[test_name][1]) # set write mode to appropriate
+                        serial_write_with_delay(ser, bytes(hex(ind)[2:], 'utf-8'))    # write the row address to the tester
+                        serial_write_with_delay(ser, b'O')                 # set mode to continuity check mode
+                        val = float(inst_query_with_delay(inst, 'meas:res?')) # read resistance from the meter
+                consumer.put(ind, val)
     serial_write_with_delay(ser, b'Z')                             # set all mux enables + mux channels to OFF
     num_shorts_text = test_name + " yielded " + str(num_shorts) + " short(s)"
     print(num_shorts_text)
@@ -815,7 +2506,7 @@ def test_cont_one_dim(ser, inst, path, dut_name, test_id, start_ind=0,
         print(summary_text)
         out_text += summary_text + "\n"
     print("")
-    return(num_shorts, out_text)
+    return set_checkpoint_result(test_name, (num_shorts, out_text))
 
 '''
 Measures continuity across two nodes, e.g. PZBIAS to SHIELD
@@ -827,29 +2518,37 @@ Parameters:
     dut_name: Full name of device + stage of test
     test_id: Test mode to run, one of the ones specified in CONT_DICT_NODE
     res_threshold: Threshold below which a measurement is considered a short
+    profile: DMM measurement profile to use, one of DMM_PROFILES
 Returns:
     Tuple, with following parameters:
         Resistance across two nodes
         Output text (to be appended to summary file)
 '''
-def test_cont_node(ser, inst, path, dut_name, test_id, res_threshold=RES_SHORT_THRESHOLD_RC_TO_PZBIAS):
+@traced("test", ("test_id", "profile"))
+def test_cont_node(ser, inst, path, dut_name, test_id, res_threshold=RES_SHORT_THRESHOLD_RC_TO_PZBIAS,
+                   profile=DMM_PROFILE_CONT):
     test_name = test_id.upper()
     if (test_name not in CONT_DICT_NODE):
         out_text = "ERROR: 1D Node resistance check " + test_name + " not valid...\n"
         print(out_text)
         return (-1, out_text)
+    if (set_dmm_profile(inst, profile) is None):
+        return (-1, "ERROR: DMM measurement profile " + str(profile) + " not valid...\n")
+    checkpoint_out = get_checkpoint_result(test_name)
+    if (checkpoint_out is not None):
+        return checkpoint_out
     datetime_now = dt.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
     out_text = "Sensor " + test_name + " Detection Running..."
     out_text += "\n"
     val = 0
 
     with open(path + datetime_now + "_" + dut_name + "_" + test_name.lower() + ".csv", 'w', newline='') as file:
-        file.write(test_name.lower() + " (ohms)\n")
+        file.write(test_name.lower() + " (ohms),DMM Profile\n")
         serial_write_with_delay(ser, b'Z')                      # set rst switches to high-Z and disable muxes
         serial_write_with_delay(ser, CONT_DICT_NODE[test_id])   # set secondary mux to mode specified in input
         serial_write_with_delay(ser, b'O')                      # enable tester outputs
         val = float(inst_query_with_delay(inst, 'meas:res?'))   # read resistance from the meter
-        file.write(str(val))
+        file.write(str(val) + "," + profile)
         out_text += f"{val:,}"  + " ohms"
         time.sleep(DMM_DELAY_TIME)
         file.close()
@@ -859,7 +2558,7 @@ def test_cont_node(ser, inst, path, dut_name, test_id, res_threshold=RES_SHORT_T
     else:
         out_text += "\n" + test_name + " is shorted\n"
     print(out_text)
-    return (val, out_text)
+    return set_checkpoint_result(test_name, (val, out_text))
 
 '''
 Measures continuity between column and PZBIAS while toggling the row TFT's on and off (to +15V and -8V)
@@ -874,74 +2573,74 @@ Parameters:
     end_row: Row # to end iterating through (typically 16)
     end_col: Col # to end iterating through (typically 16)
     res_threshold: Threshold below which a measurement is considered a short
+    profile: DMM measurement profile to use, one of DMM_PROFILES
 Returns:
     Tuple, with following parameters:
         Total number of shorts detected
         Output text (to be appended to summary file)
 '''
+@traced("test", ("profile",))
 def test_cont_col_to_pzbias_tfts_on(ser, inst, path, dut_name, start_row=0, end_row=16,
-                                    start_col=0, end_col=16, res_threshold=RES_SHORT_THRESHOLD_RC_TO_PZBIAS):
+                                    start_col=0, end_col=16, res_threshold=RES_SHORT_THRESHOLD_RC_TO_PZBIAS,
+                                    profile=DMM_PROFILE_CONT):
     test_name = "CONT_COL_TO_PZBIAS_TFTS_ON"
+    if (set_dmm_profile(inst, profile) is None):
+        return (-1, "ERROR: DMM measurement profile " + str(profile) + " not valid...\n")
+    checkpoint_out = get_checkpoint_result(test_name)
+    if (checkpoint_out is not None):
+        return checkpoint_out
+    done_cells = get_checkpoint_cells(test_name)
     datetime_now = dt.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-    num_shorts = 0
     out_text = ""
 
     inst.query('meas:res?')                                  # set Keithley mode to resistance measurement
     time.sleep(SERIAL_DELAY_TIME)
-    out_array = np.zeros((18, 17), dtype='U64')             # create string-typed numpy array
-    out_array[1] = ["C" + str(i) for i in range(0, 17)]     # set cols of output array to be "C1"..."C16"
-    for i in range(len(out_array)):
-        out_array[len(out_array)-1-i][0] = "R" + str(i+1)   # set rows of output array to be "R1"..."R16"
-    #out_array[0][0] = "Resistance Test Column to PZBIAS w/ TFTs ON"
-    #out_array[0][1] = dut_name
-    #out_array[0][2] = dt.datetime.now()
-    out_array[1][0] = "Resistance (ohm)"
-    out_text += "Sensor Col to PZBIAS Continuity Detection with TFT's ON Running..."
+    out_array = Test_Result_Array("Resistance (ohm) [" + profile + "]", "R", "C")
+    out_text += "Sensor Col to PZBIAS Continuity Detection with TFT's ON Running (" + profile + " DMM profile)..."
     print(out_text)
     out_text += "\n"
 
     with open(path + datetime_now + "_" + dut_name + "_" + test_name.lower() + ".csv", 'w', newline="") as file: 
         writer = csv.writer(file)
-        writer.writerow(["Row Index", "Column Index", "Col. Res. to PZBIAS w/ TFTs ON (ohm)"])
+        writer.writerow(["Row Index", "Column Index", "Col. Res. to PZBIAS w/ TFTs ON (ohm)", "DMM Profile"])
         print_progress_bar(0, 16, suffix = "Row 0/16", length = 16)
-        for row in range(start_row, end_row):
-            for col in range(start_col, end_col):
-                serial_write_with_delay(ser, b'Z')                 # set row switches to high-Z and disable muxes
-                serial_write_with_delay(ser, b'W')                 # set secondary mux to col/PZBIAS mode
-                serial_write_with_delay(ser, b'R')                 # set mode to row write mode
-                serial_write_with_delay(ser, bytes(hex(row)[2:], 'utf-8'))         # write row index
-                serial_write_with_delay(ser, b'L')                 # set mode to column write mode
-                serial_write_with_delay(ser, bytes(hex(col)[2:], 'utf-8'))         # write column index
-                serial_write_with_delay(ser, b'P')                 # "ON" measurement - cap. check mode puts row switches in +15/-8V mode
-                tft_on_meas = float(inst_query_with_delay(inst, 'meas:res?'))      # read mux on measurement
-                if (tft_on_meas < res_threshold):
-                    num_shorts += 1
-                out_array[(16-row)+1][col+1] = tft_on_meas
-                writer.writerow([str(row+1), str(col+1), tft_on_meas]) # appends to CSV with 1 index
-                time.sleep(SERIAL_DELAY_TIME)
-            print_progress_bar(row + 1, 16, suffix = "Row " + str(row+1) + "/16", length = 16)
-    serial_write_with_delay(ser, b'Z')                             # set all mux enables + mux channels to OFF
+
+        # runs in the consumer thread, so the scan loop doesn't wait on disk or terminal output
+        def handle_reading(row, col, tft_on_meas):
+            out_array.set(row, col, tft_on_meas)
+            writer.writerow([str(row+1), str(col+1), tft_on_meas, profile]) # appends to CSV with 1 index
+            if ((row, col) not in done_cells):
+                add_checkpoint_cell(test_name, (row, col), [tft_on_meas])
+            if (col == end_col-1):
+                print_progress_bar(row + 1, 16, suffix = "Row " + str(row+1) + "/16", length = 16)
+
+        mux = Tester_Mux_Driver(ser)
+        with Scan_Result_Consumer(handle_reading) as consumer:
+            for row in range(start_row, end_row):
+                with trace_span("row", row=row):
+                    for col in range(start_col, end_col):
+                        if ((row, col) in done_cells):
+                            consumer.put(row, col, done_cells[(row, col)][0])           # measured before the interruption
+                            continue
+                        with trace_span("cell", row=row, col=col):
+                            # secondary mux in col/PZBIAS mode, row + col addressed,
+                            # "ON" measurement - cap. check mode puts row switches in +15/-8V mode
+                            mux.set_state(b'W', [(b'R', row), (b'L', col)], b'P')
+                            tft_on_meas = float(inst_query_with_delay(inst, 'meas:res?'))  # read mux on measurement
+                            consumer.put(row, col, tft_on_meas)
+                            time.sleep(SERIAL_DELAY_TIME)
+            mux.reset()                                            # set all mux enables + mux channels to OFF
+    num_shorts = out_array.count_below(res_threshold)
     num_shorts_text = "There were " + str(num_shorts) + " col/PZBIAS with TFT's ON short(s)"
     print(num_shorts_text)
     out_text += num_shorts_text + "\n"
-    out_array = np.delete(out_array, (0), axis=0)
-    np.savetxt(path + datetime_now + "_" + dut_name + "_" + test_name.lower() + "_alt.csv", out_array, delimiter=",", fmt="%s")
-    out_array = np.delete(out_array, (0), axis=1)
-    out_array = out_array[1:]
+    out_array.save_alt_csv(path + datetime_now + "_" + dut_name + "_" + test_name.lower() + "_alt.csv")
     if (num_shorts > 0):
-        for row in range(out_array.shape[0]):
-            for col in range(out_array.shape[1]):
-                if (float(out_array[row][col]) > res_threshold):
-                    print(".", end="")
-                    out_text += "."
-                else:
-                    print("X", end="")
-                    out_text += "X"
-            print("")
-            out_text += "\n"
-        out_text += "\n"
+        short_map = out_array.get_short_map(res_threshold)
+        print(short_map, end="")
+        out_text += short_map + "\n"
     print("")
-    return(num_shorts, out_text)
+    return set_checkpoint_result(test_name, (num_shorts, out_text))
 
 '''
 Placeholder function that sweeps through the reset lines on the primary mux board
@@ -980,6 +2679,7 @@ Parameters:
     loop2_name: Name of file to play when Loopback B makes contact
     both_loops_name: Name of file to play when both loopbacks make contact
     silent: if True, do not play audio
+    profile: DMM measurement profile to use, one of DMM_PROFILES (range is set to RES_RANGE_LOOPBACKS)
 Returns:
     Tuple, with following parameters:
         Loopback A resistance
@@ -988,12 +2688,12 @@ Returns:
 def test_loopback_resistance(ser, inst, num_counts=10, loop1_name=LOOP1_SOUND_FILE_DEFAULT,
                              loop2_name=LOOP2_SOUND_FILE_DEFAULT,
                              both_loops_name=BOTH_LOOPS_SOUND_FILE_DEFAULT, silent=SILENT_MODE_DEFAULT,
-                             res_threshold=RES_SHORT_THRESHOLD_ROWCOL):
+                             res_threshold=RES_SHORT_THRESHOLD_ROWCOL, profile=DMM_PROFILE_LOOPBACKS):
     mixer.init()
     loop1 = mixer.Sound(loop1_name)
     loop2 = mixer.Sound(loop2_name)
     both_loops = mixer.Sound(both_loops_name)
-    inst.write('sens:res:rang 10E3')# set resistance measurement range to 10kOhm
+    set_dmm_profile(inst, profile, RES_RANGE_LOOPBACKS)  # set resistance measurement range to 10kOhm
     is_pressed = False
     count = 0
     print("")
@@ -1035,22 +2735,23 @@ Measures Loopback 1 resistance
 Parameters:
     ser: PySerial object that has been initialized to the Arduino's serial port
     inst: PyVISA object that has been initialized (i.e. the DMM in this case)
+    profile: DMM measurement profile to use, one of DMM_PROFILES (range is set to RES_RANGE_LOOPBACKS)
 Returns:
     Tuple containing:
         Loopback 1 resistance (float)
         String text output
 '''
-def test_cont_loopback_one(ser, inst):
+@traced("test")
+def test_cont_loopback_one(ser, inst, profile=DMM_PROFILE_LOOPBACKS):
     val = 0
     out_text = "Loopback 1 resistance: "
-    inst.write('sens:res:rang 10E3')                 # set resistance measurement range to 10Kohm
-    time.sleep(DMM_DELAY_TIME)
+    set_dmm_profile(inst, profile, RES_RANGE_LOOPBACKS) # set resistance measurement range to 10Kohm
     ser.write(b'Z')                                  # set rst switches to high-Z and disable muxes
     time.sleep(SERIAL_DELAY_TIME)
     ser.write(b'&')                                  # set secondary mux to Loopback 1 mode
     time.sleep(SERIAL_DELAY_TIME)
     val = float(inst.query('meas:res?'))             # read resistance from the meter
-    out_text += f"{val:,}" + " ohms"
+    out_text += f"{val:,}" + " ohms (" + profile + " DMM profile)"
     time.sleep(DMM_DELAY_TIME)
     ser.write(b'Z')                                  # set rst switches to high-Z and disable muxes
     time.sleep(SERIAL_DELAY_TIME)
@@ -1065,22 +2766,23 @@ Measures Loopback 2 resistance
 Parameters:
     ser: PySerial object that has been initialized to the Arduino's serial port
     inst: PyVISA object that has been initialized (i.e. the DMM in this case)
+    profile: DMM measurement profile to use, one of DMM_PROFILES (range is set to RES_RANGE_LOOPBACKS)
 Returns:
     Tuple containing:
         Loopback 2 resistance (float)
         String text output
 '''
-def test_cont_loopback_two(ser, inst):
+@traced("test")
+def test_cont_loopback_two(ser, inst, profile=DMM_PROFILE_LOOPBACKS):
     val = 0
     out_text = "Loopback 2 resistance: "
-    inst.write('sens:res:rang 10E3')                 # set resistance measurement range to 10Kohm
-    time.sleep(DMM_DELAY_TIME)
+    set_dmm_profile(inst, profile, RES_RANGE_LOOPBACKS) # set resistance measurement range to 10Kohm
     ser.write(b'Z')                                  # set rst switches to high-Z and disable muxes
     time.sleep(SERIAL_DELAY_TIME)
     ser.write(b'*')                                  # set secondary mux to Loopback 2 mode
     time.sleep(SERIAL_DELAY_TIME)
     val = float(inst.query('meas:res?'))             # read resistance from the meter
-    out_text += f"{val:,}" + " ohms"
+    out_text += f"{val:,}" + " ohms (" + profile + " DMM profile)"
     time.sleep(DMM_DELAY_TIME)
     ser.write(b'Z')                                  # set rst switches to high-Z and disable muxes
     time.sleep(SERIAL_DELAY_TIME)
@@ -1094,24 +2796,26 @@ def test_cont_loopback_two(ser, inst):
 # 3T only has continuity check.
 '''
 Run capacitance and TFT tests for 1T arrays
-Will turn on the power supply if not already on, and turn it off when done.
+Holds the PSU power session while running, so the power supply is turned on if not already on,
+and turned off when done unless an outer flow (e.g. automated.py) still holds the session.
 Parameters:
     ser:  PySerial object that has been initialized to the Arduino's serial port
     inst: PyVISA object that has been initialized (i.e. the DMM in this case)
-    psu:  PyVISA object that has been initialized (i.e. the PSU in this case)
+    psu:  PSU_Power_Session returned by init_psu (i.e. the PSU in this case)
     path: Path to save the output files for each test
     dut_name_raw: Raw name of the DUT (e.g. E2412-001-007-D2_T1)
     dut_stage_raw: Stage of assembly in plaintext (e.g. Post_Flex_Bond_ETest)
     dut_type: If the device is a backplane, sensor array, or sensor module    
     using_usb_psu_in: True if USB PSU should be set up, False if PSU shouldn't be setup
+    retest: True to only measure the cells that failed in each test's most recent CSV, see test_cont_two_dim()
 Returns: a tuple with the following:
     output_payload_dict: A dictionary with key/value pairs for each test output,
                                  intended to update a database like the GSheets
     out_string: A string with each test output summary on its own line, intended for summary text file
 '''
+@traced("suite", ("dut_name_raw",))
 def test_cap_tft_array_1t(ser, inst, psu, path, dut_name_raw, dut_stage_raw, dut_type,
-                          using_usb_psu_in=USING_USB_PSU):
-    global PSU_IS_ON_NOW
+                          using_usb_psu_in=USING_USB_PSU, retest=False):
     output_payload_dict = dict()
     for field in OUT_COLUMN_FIELDS:
         output_payload_dict[field]=None
@@ -1119,60 +2823,58 @@ def test_cap_tft_array_1t(ser, inst, psu, path, dut_name_raw, dut_stage_raw, dut
     dut_name_full = dut_name_raw + "_" + dut_stage_raw
     print("Running cap and TFT ON continuity tests...")
     print("Tests starting at " + start_time_str + "\n")
-    if (using_usb_psu_in and PSU_IS_ON_NOW != 1):
-        set_psu_on(psu)
-    valid_responses = {'': "run cap test with default 1nF range", 1: "run cap test with 10nF range"}
-    test_selection_raw = query_valid_response(valid_responses)
-    meas_range_input = '1e-9'
-    if (test_selection_raw == "1"):
-        meas_range_input = '1e-8'
-        print("Running cap test with new 10nF range...\n")
-    else:
+    with psu_power_session(psu, using_usb_psu_in):
+        valid_responses = {'': "run cap test with default 1nF range", 1: "run cap test with 10nF range"}
+        test_selection_raw = query_valid_response(valid_responses)
         meas_range_input = '1e-9'
-        print("Running cap test with default 1nF range...\n")
-    test_cap_out = test_cap(ser, inst, path, dut_name_raw, dut_stage_raw,
-                            "CAP_COL_TO_PZBIAS", dut_type, meas_range_input)
-    test_cont_col_to_pzbias_tfts_on_out = test_cont_col_to_pzbias_tfts_on(ser, inst, path, dut_name_full)
+        if (test_selection_raw == "1"):
+            meas_range_input = '1e-8'
+            print("Running cap test with new 10nF range...\n")
+        else:
+            meas_range_input = '1e-9'
+            print("Running cap test with default 1nF range...\n")
+        test_cap_out = test_cap(ser, inst, path, dut_name_raw, dut_stage_raw,
+                                "CAP_COL_TO_PZBIAS", dut_type, meas_range_input, retest=retest)
+        test_cont_col_to_pzbias_tfts_on_out = test_cont_col_to_pzbias_tfts_on(ser, inst, path, dut_name_full)
 
     out_string = test_cap_out[1]
     out_string += test_cont_col_to_pzbias_tfts_on_out[1]
     output_payload_dict["Cap Col to PZBIAS (# pass)"] = test_cap_out[0]
     output_payload_dict["Col to PZBIAS with TFT's ON (# shorts)"] = test_cont_col_to_pzbias_tfts_on_out[0]
-    if (using_usb_psu_in):
-        set_psu_off(psu)
     return (output_payload_dict, out_string)
 
 '''
 Run full panel of continuity tests for 1T arrays
-Will turn on the power supply if not already on, and turn it off when done.
+Holds the PSU power session while running, so the power supply is turned on if not already on,
+and turned off when done unless an outer flow (e.g. automated.py) still holds the session.
 Parameters:
     ser:  PySerial object that has been initialized to the Arduino's serial port
     inst: PyVISA object that has been initialized (i.e. the DMM in this case)
-    psu:  PyVISA object that has been initialized (i.e. the PSU in this case)
+    psu:  PSU_Power_Session returned by init_psu (i.e. the PSU in this case)
     path: Path to save the output files for each test
     dut_name_full: name of the device under test
     using_usb_psu_in: True if USB PSU should be set up, False if PSU shouldn't be setup
+    retest: True to only measure the cells that failed in each test's most recent CSV, see test_cont_two_dim()
 Returns: a tuple with the following:
     output_payload_dict: A dictionary with key/value pairs for each test output,
                                  intended to update a database like the GSheets
     out_string: A string with each test output summary on its own line, intended for summary text file
     has_shorts: Boolean, true if any of the tests yield shorts with resistance below threshold
 '''
-def test_cont_array_1t(ser, inst, psu, path, dut_name_full, using_usb_psu_in=USING_USB_PSU):
-    global PSU_IS_ON_NOW
+@traced("suite", ("dut_name_full",))
+def test_cont_array_1t(ser, inst, psu, path, dut_name_full, using_usb_psu_in=USING_USB_PSU, retest=False):
     output_payload_dict = dict()
     for field in OUT_COLUMN_FIELDS:
         output_payload_dict[field]=None
-    if (using_usb_psu_in and PSU_IS_ON_NOW != 1):
-        set_psu_on(psu)
     start_time_str = dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     print("\nTests starting at " + start_time_str + "\n")
-    cont_row_to_column = test_cont_two_dim(ser, inst, path, dut_name_full, "CONT_ROW_TO_COL")
-    cont_row_to_pzbias = test_cont_one_dim(ser, inst, path, dut_name_full, "CONT_ROW_TO_PZBIAS")
-    cont_row_to_shield = test_cont_one_dim(ser, inst, path, dut_name_full, "CONT_ROW_TO_SHIELD")
-    cont_col_to_pzbias = test_cont_one_dim(ser, inst, path, dut_name_full, "CONT_COL_TO_PZBIAS")
-    cont_col_to_shield = test_cont_one_dim(ser, inst, path, dut_name_full, "CONT_COL_TO_SHIELD")
-    cont_shield_to_pzbias = test_cont_node(ser, inst, path, dut_name_full, "CONT_SHIELD_TO_PZBIAS")
+    with psu_power_session(psu, using_usb_psu_in):
+        cont_row_to_column = test_cont_two_dim(ser, inst, path, dut_name_full, "CONT_ROW_TO_COL", retest=retest)
+        cont_row_to_pzbias = test_cont_one_dim(ser, inst, path, dut_name_full, "CONT_ROW_TO_PZBIAS", retest=retest)
+        cont_row_to_shield = test_cont_one_dim(ser, inst, path, dut_name_full, "CONT_ROW_TO_SHIELD", retest=retest)
+        cont_col_to_pzbias = test_cont_one_dim(ser, inst, path, dut_name_full, "CONT_COL_TO_PZBIAS", retest=retest)
+        cont_col_to_shield = test_cont_one_dim(ser, inst, path, dut_name_full, "CONT_COL_TO_SHIELD", retest=retest)
+        cont_shield_to_pzbias = test_cont_node(ser, inst, path, dut_name_full, "CONT_SHIELD_TO_PZBIAS")
 
     out_string = cont_row_to_column[1] + "\n"
     out_string += cont_row_to_pzbias[1] + "\n"
@@ -1188,49 +2890,48 @@ def test_cont_array_1t(ser, inst, psu, path, dut_name_full, using_usb_psu_in=USI
     output_payload_dict["Col to SHIELD (# shorts)"] = cont_col_to_shield[0]
     output_payload_dict["SHIELD to PZBIAS (ohm)"]   = cont_shield_to_pzbias[0]
     has_shorts = cont_row_to_column[0]>0 or cont_row_to_pzbias[0]>0 or cont_col_to_pzbias[0]>0 or cont_row_to_shield[0]>0 or cont_col_to_shield[0]>0 or cont_shield_to_pzbias[0]=="FAIL"
-    if (using_usb_psu_in):
-        set_psu_off(psu)
     return (output_payload_dict, out_string, has_shorts)
 
 '''
 Run full panel of continuity tests for 3T arrays
-Will turn on the power supply if not already on, and turn it off when done.
+Holds the PSU power session while running, so the power supply is turned on if not already on,
+and turned off when done unless an outer flow (e.g. automated.py) still holds the session.
 Parameters:
     ser:  PySerial object that has been initialized to the Arduino's serial port
     inst: PyVISA object that has been initialized (i.e. the DMM in this case)
-    psu:  PyVISA object that has been initialized (i.e. the PSU in this case)
+    psu:  PSU_Power_Session returned by init_psu (i.e. the PSU in this case)
     path: Path to save the output files for each test
     dut_name_full: name of the device under test
     using_usb_psu_in: True if USB PSU should be set up, False if PSU shouldn't be setup
+    retest: True to only measure the cells that failed in each test's most recent CSV, see test_cont_two_dim()
 Returns: a tuple with the following:
     output_payload_dict: A dictionary with key/value pairs for each test output,
                                  intended to update a database like the GSheets
     out_string: A string with each test output summary on its own line, intended for summary text file
 '''
-def test_cont_array_3t(ser, inst, psu, path, dut_name_full, using_usb_psu_in=USING_USB_PSU):
-    global PSU_IS_ON_NOW
+@traced("suite", ("dut_name_full",))
+def test_cont_array_3t(ser, inst, psu, path, dut_name_full, using_usb_psu_in=USING_USB_PSU, retest=False):
     output_payload_dict = dict()
     for field in OUT_COLUMN_FIELDS:
         output_payload_dict[field]=None
-    if (using_usb_psu_in and PSU_IS_ON_NOW != 1):
-        set_psu_on(psu)
     start_time_str = dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     print("\nTests starting at " + start_time_str + "\n")
-    cont_row_to_column    = test_cont_two_dim(ser, inst, path, dut_name_full, "CONT_ROW_TO_COL")
-    cont_row_to_pzbias    = test_cont_one_dim(ser, inst, path, dut_name_full, "CONT_ROW_TO_PZBIAS")
-    cont_row_to_shield    = test_cont_one_dim(ser, inst, path, dut_name_full, "CONT_ROW_TO_SHIELD")
-    cont_col_to_pzbias    = test_cont_one_dim(ser, inst, path, dut_name_full, "CONT_COL_TO_PZBIAS")
-    cont_col_to_shield    = test_cont_one_dim(ser, inst, path, dut_name_full, "CONT_COL_TO_SHIELD")
-    cont_col_to_vdd       = test_cont_one_dim(ser, inst, path, dut_name_full, "CONT_COL_TO_VDD")
-    cont_col_to_vrst      = test_cont_one_dim(ser, inst, path, dut_name_full, "CONT_COL_TO_VRST")
-    cont_rst_to_column    = test_cont_two_dim(ser, inst, path, dut_name_full, "CONT_RST_TO_COL")
-    cont_rst_to_shield    = test_cont_one_dim(ser, inst, path, dut_name_full, "CONT_RST_TO_SHIELD")
-    cont_rst_to_pzbias    = test_cont_one_dim(ser, inst, path, dut_name_full, "CONT_RST_TO_PZBIAS")
-    cont_vdd_to_shield    = test_cont_node(ser, inst, path, dut_name_full, "CONT_VDD_TO_SHIELD")
-    cont_vdd_to_pzbias    = test_cont_node(ser, inst, path, dut_name_full, "CONT_VDD_TO_PZBIAS")
-    cont_vrst_to_shield   = test_cont_node(ser, inst, path, dut_name_full, "CONT_VRST_TO_SHIELD")
-    cont_vrst_to_pzbias   = test_cont_node(ser, inst, path, dut_name_full, "CONT_VRST_TO_PZBIAS")
-    cont_shield_to_pzbias = test_cont_node(ser, inst, path, dut_name_full, "CONT_SHIELD_TO_PZBIAS")
+    with psu_power_session(psu, using_usb_psu_in):
+        cont_row_to_column    = test_cont_two_dim(ser, inst, path, dut_name_full, "CONT_ROW_TO_COL", retest=retest)
+        cont_row_to_pzbias    = test_cont_one_dim(ser, inst, path, dut_name_full, "CONT_ROW_TO_PZBIAS", retest=retest)
+        cont_row_to_shield    = test_cont_one_dim(ser, inst, path, dut_name_full, "CONT_ROW_TO_SHIELD", retest=retest)
+        cont_col_to_pzbias    = test_cont_one_dim(ser, inst, path, dut_name_full, "CONT_COL_TO_PZBIAS", retest=retest)
+        cont_col_to_shield    = test_cont_one_dim(ser, inst, path, dut_name_full, "CONT_COL_TO_SHIELD", retest=retest)
+        cont_col_to_vdd       = test_cont_one_dim(ser, inst, path, dut_name_full, "CONT_COL_TO_VDD", retest=retest)
+        cont_col_to_vrst      = test_cont_one_dim(ser, inst, path, dut_name_full, "CONT_COL_TO_VRST", retest=retest)
+        cont_rst_to_column    = test_cont_two_dim(ser, inst, path, dut_name_full, "CONT_RST_TO_COL", retest=retest)
+        cont_rst_to_shield    = test_cont_one_dim(ser, inst, path, dut_name_full, "CONT_RST_TO_SHIELD", retest=retest)
+        cont_rst_to_pzbias    = test_cont_one_dim(ser, inst, path, dut_name_full, "CONT_RST_TO_PZBIAS", retest=retest)
+        cont_vdd_to_shield    = test_cont_node(ser, inst, path, dut_name_full, "CONT_VDD_TO_SHIELD")
+        cont_vdd_to_pzbias    = test_cont_node(ser, inst, path, dut_name_full, "CONT_VDD_TO_PZBIAS")
+        cont_vrst_to_shield   = test_cont_node(ser, inst, path, dut_name_full, "CONT_VRST_TO_SHIELD")
+        cont_vrst_to_pzbias   = test_cont_node(ser, inst, path, dut_name_full, "CONT_VRST_TO_PZBIAS")
+        cont_shield_to_pzbias = test_cont_node(ser, inst, path, dut_name_full, "CONT_SHIELD_TO_PZBIAS")
 
     out_string = cont_row_to_column[1] + "\n"
     out_string += cont_row_to_pzbias[1] + "\n"
@@ -1263,8 +2964,6 @@ def test_cont_array_3t(ser, inst, psu, path, dut_name_full, using_usb_psu_in=USI
     output_payload_dict["Vrst to SHIELD (ohm)"]     = cont_vrst_to_shield[0]
     output_payload_dict["Vrst to PZBIAS (ohm)"]     = cont_vrst_to_pzbias[0]
     output_payload_dict["SHIELD to PZBIAS (ohm)"]   = cont_shield_to_pzbias[0]
-    if (using_usb_psu_in):
-        set_psu_off(psu)
     return (output_payload_dict, out_string)
 
 # helper functions for file compare/diff
@@ -1456,7 +3155,12 @@ def get_creds(token_filename=TOKEN_FILE_DEFAULT, cred_filename=CRED_FILE_DEFAULT
         # If there are no (valid) credentials available, let the user log in.
         if not creds or not creds.valid:
             if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
+                try:
+                    creds.refresh(Request())
+                except TransportError as err:
+                    # offline: inventory lookups still work from the local mirror (see Sheets_Inventory)
+                    print("WARNING: couldn't reach Google to refresh the credentials, working offline (" + str(err) + ")")
+                    return creds
             else:
                 flow = InstalledAppFlow.from_client_secrets_file(
                     cred_filename, scopes
@@ -1470,6 +3174,348 @@ def get_creds(token_filename=TOKEN_FILE_DEFAULT, cred_filename=CRED_FILE_DEFAULT
         print(err)
         return None
 
+# (creds, service) built by get_sheets_service()
+SHEETS_SERVICE = None
+
+'''
+Returns the Google Sheets API service for the given credentials, building it on first use
+instead of on every call (the service isn't thread-safe, use it from one thread at a time)
+Parameters:
+    creds: Initialized Google Apps credential (see get_creds())
+Returns:
+    Google Sheets API service object
+'''
+def get_sheets_service(creds):
+    global SHEETS_SERVICE
+    if ((SHEETS_SERVICE is None) or (SHEETS_SERVICE[0] is not creds)):
+        SHEETS_SERVICE = (creds, build("sheets", "v4", credentials=creds))
+    return SHEETS_SERVICE[1]
+
+'''
+In-memory snapshot of the inventory sheet ('Sensing Inventory'/'Sensor Modules'), so inventory lookups
+are dictionary hits instead of downloading whole columns for every lookup (e.g. for every die of a wafer).
+All columns are read with one values().batchGet request. Indexes are built once per snapshot, on first
+use: exact match indexes map a (normalized) value to the first row it appears in, like the original
+column scans, and n-gram indexes map every NGRAM_LENGTH-character substring to the rows containing it,
+for wildcard searches.
+The snapshot is mirrored to a local SQLite file, which answers the first lookups at startup. Once the
+snapshot is older than the TTL it's re-read on a background thread, and lookups keep answering from the
+stale snapshot with a warning instead of waiting on the network (or failing when it's down).
+Parameters:
+    creds: Initialized Google Apps credential (see get_creds())
+    spreadsheet_id: The Google Sheets spreadsheet ID, extracted from the URL (docs.google.com/spreadsheets/d/***)
+    id_sheet_name: The name of the inventory sheet
+    columns: List of column letters to read, more are added when a lookup asks for them
+    ttl: Max age of the snapshot in seconds before it's re-read
+    cache_filename: SQLite file to mirror the snapshot to, or None to keep it in memory only
+'''
+class Sheets_Inventory:
+    NGRAM_LENGTH = 3
+    RETRY_INTERVAL = 30             # seconds before retrying a failed background refresh
+
+    def __init__(self, creds, spreadsheet_id=SPREADSHEET_ID, id_sheet_name=ID_SHEET_NAME,
+                 columns=INVENTORY_COLUMNS, ttl=INVENTORY_SNAPSHOT_TTL, cache_filename=INVENTORY_CACHE_FILENAME):
+        self.creds = creds
+        self.spreadsheet_id = spreadsheet_id
+        self.id_sheet_name = id_sheet_name
+        self.sheet_key = spreadsheet_id + "!" + id_sheet_name
+        self.columns = list(columns)
+        self.ttl = ttl
+        self.cache_filename = cache_filename
+        self.lock = threading.Lock()
+        # (values, indexes), replaced as a whole so a lookup never sees half of a refresh:
+        # values: {column letter: list of cell values (strings, "" if empty), one per sheet row}
+        # indexes: {(column letter, index kind): index}, built on first use
+        self.snapshot = None
+        self.fetched_at = None          # time.time() when the snapshot was read from the sheet
+        self.refresh_thread = None
+        self.refresh_failed_at = None   # time.time() of the last failed background refresh
+        self.stale_warned = False
+
+    '''
+    Reads every column of the snapshot with one batchGet request
+    Parameters:
+        service: Google Sheets API service to use (one per thread)
+    Returns:
+        Dictionary {column letter: list of cell values (strings, "" if empty), one per sheet row}
+    '''
+    def fetch(self, service):
+        columns = list(self.columns)
+        ranges = [self.id_sheet_name + "!" + column + ":" + column for column in columns]
+        result = (
+            service.spreadsheets().values()
+            .batchGet(spreadsheetId=self.spreadsheet_id, ranges=ranges)
+            .execute()
+        )
+        values = dict()
+        for (column, value_range) in zip(columns, result.get("valueRanges", [])):
+            values[column] = [(row[0] if (len(row) > 0) else "") for row in value_range.get("values", [])]
+        return values
+
+    '''
+    Re-reads the sheet, waiting for it, and updates the snapshot and its local mirror
+    Returns: None
+    '''
+    @traced("sheets")
+    def refresh(self):
+        values = self.fetch(get_sheets_service(self.creds))
+        self.load_snapshot(values)
+        self.save_cache(values, self.fetched_at)
+
+    '''
+    Re-reads the sheet on a background thread, if it isn't already being re-read
+    Returns: None
+    '''
+    def start_background_refresh(self):
+        with self.lock:
+            if ((self.refresh_thread is not None) and self.refresh_thread.is_alive()):
+                return
+            if ((self.refresh_failed_at is not None) and (time.time() - self.refresh_failed_at < self.RETRY_INTERVAL)):
+                return                  # e.g. offline, don't retry on every lookup
+            self.refresh_thread = threading.Thread(target=self.background_refresh, name="inventory_refresh", daemon=True)
+            self.refresh_thread.start()
+
+    @traced("sheets")
+    def background_refresh(self):
+        try:
+            # own service, the shared one from get_sheets_service() isn't thread-safe
+            values = self.fetch(build("sheets", "v4", credentials=self.creds))
+            self.load_snapshot(values)
+            self.save_cache(values, self.fetched_at)
+            self.refresh_failed_at = None
+        except Exception as err:
+            self.refresh_failed_at = time.time()
+            print("WARNING: couldn't refresh the inventory, still using the copy from " +
+                  self.get_snapshot_time() + " (" + str(err) + ")")
+
+    '''
+    Waits for a running background refresh
+    Parameters:
+        timeout: Max time to wait in seconds
+    Returns:
+        True if the snapshot is up to date afterwards
+    '''
+    def wait_for_refresh(self, timeout=INVENTORY_REFRESH_WAIT):
+        refresh_thread = self.refresh_thread
+        if (refresh_thread is not None):
+            refresh_thread.join(timeout)
+        return not self.is_stale()
+
+    '''
+    Replaces the snapshot with already read column values and drops the indexes
+    Parameters:
+        values: Dictionary {column letter: list of cell values (strings, "" if empty), one per sheet row}
+        fetched_at: time.time() when the values were read from the sheet, None for now
+    Returns: None
+    '''
+    def load_snapshot(self, values, fetched_at=None):
+        with self.lock:
+            for column in values:
+                if (column not in self.columns):
+                    self.columns.append(column)
+            self.snapshot = (values, dict())
+            self.fetched_at = time.time() if (fetched_at is None) else fetched_at
+            self.stale_warned = False
+
+    '''
+    Writes the snapshot to the local SQLite mirror, only inserting/updating/deleting the cells
+    that changed since the last write
+    Parameters:
+        values: Dictionary {column letter: list of cell values}, as from fetch()
+        fetched_at: time.time() when the values were read from the sheet
+    Returns: None
+    '''
+    def save_cache(self, values, fetched_at):
+        if (self.cache_filename is None):
+            return
+        try:
+            db = sqlite3.connect(self.cache_filename)
+            with db:
+                db.execute("CREATE TABLE IF NOT EXISTS cells (sheet TEXT, col TEXT, row INTEGER, value TEXT, "
+                           "PRIMARY KEY (sheet, col, row))")
+                db.execute("CREATE TABLE IF NOT EXISTS snapshots (sheet TEXT PRIMARY KEY, fetched_at REAL)")
+                old_values = {(col, row): value for (col, row, value) in
+                              db.execute("SELECT col, row, value FROM cells WHERE sheet = ?", (self.sheet_key,))}
+                new_values = {(col, row): value for (col, col_values) in values.items()
+                              for (row, value) in enumerate(col_values)}
+                db.executemany("INSERT OR REPLACE INTO cells VALUES (?, ?, ?, ?)",
+                               [(self.sheet_key, col, row, value) for ((col, row), value) in new_values.items()
+                                if (old_values.get((col, row)) != value)])
+                db.executemany("DELETE FROM cells WHERE sheet = ? AND col = ? AND row = ?",
+                               [(self.sheet_key, col, row) for (col, row) in old_values if ((col, row) not in new_values)])
+                db.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?)", (self.sheet_key, fetched_at))
+            db.close()
+        except sqlite3.Error as err:
+            print("WARNING: couldn't save the inventory cache " + str(self.cache_filename) + " (" + str(err) + ")")
+
+    '''
+    Loads the snapshot from the local SQLite mirror, if there is one
+    Returns:
+        True if a snapshot was loaded
+    '''
+    def load_cache(self):
+        if ((self.cache_filename is None) or (not os.path.exists(self.cache_filename))):
+            return False
+        try:
+            db = sqlite3.connect(self.cache_filename)
+            snapshot_row = db.execute("SELECT fetched_at FROM snapshots WHERE sheet = ?", (self.sheet_key,)).fetchone()
+            values = dict()
+            if (snapshot_row is not None):
+                for (col, row, value) in db.execute("SELECT col, row, value FROM cells WHERE sheet = ? ORDER BY col, row",
+                                                    (self.sheet_key,)):
+                    values.setdefault(col, []).append(value)
+            db.close()
+        except sqlite3.Error as err:
+            print("WARNING: couldn't load the inventory cache " + str(self.cache_filename) + " (" + str(err) + ")")
+            return False
+        if (snapshot_row is None):
+            return False
+        self.load_snapshot(values, snapshot_row[0])
+        print("Loaded inventory cache from " + self.get_snapshot_time())
+        return True
+
+    '''
+    Forces the next lookup to re-read the sheet, e.g. after the inventory was edited
+    Returns: None
+    '''
+    def invalidate(self):
+        self.fetched_at = None
+
+    def is_stale(self):
+        return (self.fetched_at is None) or (time.time() - self.fetched_at > self.ttl)
+
+    def get_snapshot_time(self):
+        if (self.fetched_at is None):
+            return "never"
+        return dt.datetime.fromtimestamp(self.fetched_at).strftime('%Y-%m-%d %H:%M:%S')
+
+    '''
+    Returns the current snapshot, making sure it has the given columns. Only waits on the sheet if there's
+    no snapshot yet (nor a local mirror) or a column is missing; a stale snapshot is returned right away
+    and refreshed in the background.
+    Parameters:
+        columns: Column letters the caller needs, e.g. ['A', 'R']
+    Returns:
+        Tuple (values, indexes), see __init__()
+    '''
+    def get_snapshot(self, columns):
+        if (self.snapshot is None):
+            self.load_cache()
+        if ((self.snapshot is None) or any([(column not in self.snapshot[0]) for column in columns])):
+            for column in columns:
+                if (column not in self.columns):
+                    self.columns.append(column)
+            self.refresh()
+        elif (self.is_stale()):
+            self.start_background_refresh()
+            if (not self.stale_warned):
+                self.stale_warned = True
+                print("WARNING: using inventory data from " + self.get_snapshot_time() + ", refreshing in the background")
+        return self.snapshot
+
+    '''
+    Returns a column of the snapshot
+    Parameters:
+        column: Column letter, e.g. 'A'
+    Returns:
+        List of cell values (strings, "" if empty), one per sheet row
+    '''
+    def get_column(self, column):
+        return self.get_snapshot([column])[0][column]
+
+    '''
+    Looks up the first row whose value in a column matches, using an index of the column built on first use,
+    and returns that row's value in another column. A miss on stale data waits for the background refresh
+    (up to INVENTORY_REFRESH_WAIT) and tries again, in case the key was only just added to the sheet.
+    Parameters:
+        column: Column letter to search, e.g. 'A'
+        key: Value to look up, after applying key_func
+        value_column: Column letter of the value to return, e.g. 'R'
+        key_func: Function that normalizes the cell values (and is applied to key), e.g. to compare die IDs
+    Returns:
+        Cell value (string, "" if empty), or None if not found
+    '''
+    def lookup(self, column, key, value_column, key_func=None):
+        (values, indexes) = self.get_snapshot([column, value_column])
+        index_name = (column, None if (key_func is None) else key_func.__name__)
+        if (index_name not in indexes):
+            index = dict()
+            for (i, value) in enumerate(values[column]):
+                if (len(value) > 0):
+                    index.setdefault(value if (key_func is None) else key_func(value), i)
+            indexes[index_name] = index
+        row_index = indexes[index_name].get(key if (key_func is None) else key_func(key))
+        if (row_index is None):
+            if (self.is_stale() and self.wait_for_refresh()):
+                return self.lookup(column, key, value_column, key_func)
+            return None
+        return values[value_column][row_index] if (row_index < len(values[value_column])) else ""
+
+    '''
+    Finds the values in a column that contain a substring (case insensitive), e.g. a flex serial number.
+    Only the rows holding the substring's rarest n-gram are checked, using an n-gram index of the column
+    built on first use; substrings shorter than NGRAM_LENGTH scan the column. Like lookup(), no match on
+    stale data waits for the background refresh and tries again.
+    Parameters:
+        column: Column letter to search, e.g. 'A'
+        substring: Substring to search for
+    Returns:
+        List of matching cell values, in sheet order
+    '''
+    def find_values_containing(self, column, substring):
+        (values, indexes) = self.get_snapshot([column])
+        column_values = values[column]
+        substring = substring.upper()
+        n = self.NGRAM_LENGTH
+        if (len(substring) < n):
+            matches = [value for value in column_values if (len(value) > 0 and substring in value.upper())]
+        else:
+            index_name = (column, "ngrams")
+            if (index_name not in indexes):
+                index = dict()
+                for (i, value) in enumerate(column_values):
+                    value = value.upper()
+                    for j in range(len(value)-n+1):
+                        rows = index.setdefault(value[j:j+n], [])
+                        if (len(rows) == 0 or rows[-1] != i):   # each row once, rows stay sorted
+                            rows.append(i)
+                indexes[index_name] = index
+            index = indexes[index_name]
+            candidates = min([index.get(substring[j:j+n], []) for j in range(len(substring)-n+1)], key=len)
+            matches = [column_values[i] for i in candidates if (substring in column_values[i].upper())]
+        if (len(matches) == 0 and self.is_stale() and self.wait_for_refresh()):
+            return self.find_values_containing(column, substring)
+        return matches
+
+# (id of creds, spreadsheet ID, sheet name): Sheets_Inventory, see get_sheets_inventory()
+SHEETS_INVENTORIES = dict()
+
+'''
+Returns the shared inventory snapshot for the given credentials and sheet, creating it on first use
+Parameters:
+    creds: Initialized Google Apps credential (see get_creds())
+    spreadsheet_id: The Google Sheets spreadsheet ID
+    id_sheet_name: The name of the inventory sheet
+Returns:
+    Sheets_Inventory object
+'''
+def get_sheets_inventory(creds, spreadsheet_id=SPREADSHEET_ID, id_sheet_name=ID_SHEET_NAME):
+    key = (id(creds), spreadsheet_id, id_sheet_name)
+    if ((key not in SHEETS_INVENTORIES) or (SHEETS_INVENTORIES[key].creds is not creds)):
+        SHEETS_INVENTORIES[key] = Sheets_Inventory(creds, spreadsheet_id, id_sheet_name)
+    return SHEETS_INVENTORIES[key]
+
+'''
+Normalizes a die ID for inventory lookups: backplane/array/module IDs of the same die all map to the
+backplane ID, e.g. 'E2421-002-001-E5_T1_R1-103' to 'E2421-002-001-E5'
+Parameters:
+    die_id: Backplane, array or module ID
+Returns:
+    Upper case backplane ID
+'''
+def get_die_id_key(die_id):
+    return die_id.rstrip("_").upper().split('_')[0]
+
 '''
 Helper function that checks if a passed-in value is an integer or something else
 Parameters:
@@ -1499,6 +3545,7 @@ Parameters:
 Returns:
     String with '1' for 1T array or '3' for 3T array, or NoneType object if not found/error
 '''
+@traced("sheets", ("array_id",))
 def get_array_transistor_type(creds, array_id, dieid_cols='A', dieid_tfts='R',
                               spreadsheet_id=SPREADSHEET_ID, id_sheet_name=ID_SHEET_NAME, debug_mode_in=False):
     if debug_mode_in:
@@ -1506,34 +3553,9 @@ def get_array_transistor_type(creds, array_id, dieid_cols='A', dieid_tfts='R',
         return 3
     else:
         try:
-            service = build("sheets", "v4", credentials=creds)
-            sheet = service.spreadsheets()
-            # Define the range (A1 notation) to append the data at the end of the sheet
-            range_name_dieid = f'{id_sheet_name}!' + dieid_cols + ':' + dieid_cols
-            range_name_tfttype = f'{id_sheet_name}!' + dieid_tfts + ':' + dieid_tfts
-            result_dieid = (
-                sheet.values()
-                .get(spreadsheetId=spreadsheet_id, range=range_name_dieid)
-                .execute()
-            )
-            result_tfttype = (
-                sheet.values()
-                .get(spreadsheetId=spreadsheet_id, range=range_name_tfttype)
-                .execute()
-            )
-            values_dieid = result_dieid.get("values", [])
-            values_tfttype = result_tfttype.get("values", [])
-
-            found_array = False
-            i = 0
-            tft_type="INVALID"
-            for i in range(len(values_dieid)):
-                if (len(values_dieid[i]) > 0):
-                    if (values_dieid[i][0].rstrip("_").upper().split('_')[0] == array_id.upper().split('_')[0]):
-                    # print("Found at index " + str(i))
-                        found_array = True
-                        tft_type = values_tfttype[i][0]
-                        break
+            tft_type = get_sheets_inventory(creds, spreadsheet_id, id_sheet_name).lookup(dieid_cols, array_id, dieid_tfts,
+                                                                                         get_die_id_key)
+            found_array = (tft_type is not None)
             if (found_array):
                 if (tft_type.split('-')[0] == 'FS'):
                     val_raw = tft_type.split('-')[1][0]
@@ -1566,28 +3588,15 @@ Parameters:
 Returns:
     String with full sensor ID of the match, or NoneType object if not found/error
 '''
+@traced("sheets", ("search_string",))
 def get_array_full_name(creds, search_string, dieid_cols='A', flexid_cols='AK',
                         spreadsheet_id=SPREADSHEET_ID, id_sheet_name=ID_SHEET_NAME):
     try:
-        service = build("sheets", "v4", credentials=creds)
-        sheet = service.spreadsheets()
-        # Define the range (A1 notation) to append the data at the end of the sheet
-        range_name_dieid = f'{id_sheet_name}!' + dieid_cols + ':' + dieid_cols
-        result_dieid = (
-            sheet.values()
-            .get(spreadsheetId=spreadsheet_id, range=range_name_dieid)
-            .execute()
-        )
-        values_dieid = result_dieid.get("values", [])
+        matches = get_sheets_inventory(creds, spreadsheet_id, id_sheet_name).find_values_containing(dieid_cols, search_string)
         full_array_id = None
-        i = 0
-        match_count = 0
-        for i in range(len(values_dieid)):
-            if (len(values_dieid[i]) > 0):
-                if (search_string.upper() in values_dieid[i][0].upper()):
-                    # print("Found at index " + str(i))
-                    full_array_id = values_dieid[i][0].upper()
-                    match_count += 1
+        match_count = len(matches)
+        if (match_count > 0):
+            full_array_id = matches[-1].upper()
         if (match_count <= 0):
             print("Array not found in inventory!")
             return None
@@ -1614,38 +3623,16 @@ Parameters:
 Returns:
     Int with BT[x] status (i.e. 1, 2, 3), or NoneType object 
 '''
+@traced("sheets", ("search_string",))
 def get_wafer_build_type(creds, search_string, wafer_col='L', mask_col='M',
                          spreadsheet_id=SPREADSHEET_ID, id_sheet_name=ID_SHEET_NAME, debug_mode_in=False):
     if debug_mode_in:
         print("DEBUG MODE: Return 3 (int) for BT3 for testing purposes")
         return 3
     try:
-        service = build("sheets", "v4", credentials=creds)
-        sheet = service.spreadsheets()
-        wafer_name_ids = f'{id_sheet_name}!' + wafer_col + ':' + wafer_col
-        result_waferids = (
-            sheet.values()
-            .get(spreadsheetId=spreadsheet_id, range=wafer_name_ids)
-            .execute()
-        )
-        wafer_is_found = False
-        wafer_gsheets_index = -1
-        values_waferids = result_waferids.get("values", [])
-        for i in range(len(values_waferids)):
-            if (len(values_waferids[i]) > 0):
-                if (values_waferids[i][0] == search_string):
-                    wafer_is_found = True
-                    wafer_gsheets_index = i
-                    break
-        if (wafer_is_found):
-            wafer_mask_ids = f'{id_sheet_name}!' + mask_col + ':' + mask_col
-            result_maskids = (
-                sheet.values()
-                .get(spreadsheetId=spreadsheet_id, range=wafer_mask_ids)
-                .execute()
-            )
-            values_maskids = result_maskids.get("values", [])
-            return int(values_maskids[wafer_gsheets_index][0][2:])
+        mask_id = get_sheets_inventory(creds, spreadsheet_id, id_sheet_name).lookup(wafer_col, search_string, mask_col)
+        if (mask_id is not None):
+            return int(mask_id[2:])
         else:
             print("Wafer not found in inventory!")
             return None
@@ -1660,24 +3647,28 @@ Data is appended after the last data-containing row of the spreadsheet.
 Parameters:
     creds:      Initialized Google Apps credential, with token.json initialized. Refer to 'main()' in
                 'google_sheets_example.py' for initialization example
-    payload:    a 1D array containing the data to write to the spreadsheet, in string format
+    payload:    a 1D array containing the data to write to the spreadsheet, in string format,
+                or a 2D array (list of rows) to append several rows in one request
     range_out_start_col: The first (leftmost) column to start writing to
     range_out_end_Col  : The last (rightmost) column to end writing to
     spreadsheet_id : The Google Sheets spreadsheet ID, extracted from the URL (docs.google.com/spreadsheets/d/***)
     out_sheet_name : The name of the sheet to write in, by default set to global variable
+    service        : Google Sheets API service to use, None for the shared one (see get_sheets_service())
 Returns:
     True if successfully written, or False otherwise
 '''
+@traced("sheets")
 def write_to_spreadsheet(creds, payload, range_out_start_col='A', range_out_end_col='E',
-                         spreadsheet_id=SPREADSHEET_ID, out_sheet_name=OUT_SHEET_NAME):
+                         spreadsheet_id=SPREADSHEET_ID, out_sheet_name=OUT_SHEET_NAME, service=None):
     if (type(payload) is not list):
         print("ERROR: payload is not a list...")
         return False
     try:
-        service = build("sheets", "v4", credentials=creds)
+        if (service is None):
+            service = get_sheets_service(creds)
         # Prepare the request body with the values to append
         body_out = {
-            'values': [payload]
+            'values': payload if (len(payload) > 0 and type(payload[0]) is list) else [payload]
         }
         range_name_out = f'{out_sheet_name}!' + range_out_start_col + ':' + range_out_end_col
         # Call the API to append the new row
@@ -1694,6 +3685,304 @@ def write_to_spreadsheet(creds, payload, range_out_start_col='A', range_out_end_
         print(err)
         return False
 
+'''
+Converts a 0-indexed column number to its letter(s), e.g. 0 to 'A' and 26 to 'AA'
+Parameters:
+    index: 0-indexed column number
+Returns:
+    Column letter string
+'''
+def get_column_letter(index):
+    letters = ""
+    index += 1
+    while (index > 0):
+        (index, remainder) = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+'''
+Idempotency key of a results row, so a retried upload never adds the same row twice
+Parameters:
+    timestamp: "Timestamp" field of the row
+    array_serial_number: "Array Serial Number" field of the row
+Returns:
+    Key string
+'''
+def get_results_key(timestamp, array_serial_number):
+    return str(timestamp) + " " + str(array_serial_number)
+
+'''
+Durable outbox for the results rows uploaded to the Google Sheets output sheet. Rows are appended to a
+local journal (fsynced) before put() returns, and a background worker uploads them in order, retrying
+failures with exponential backoff, so the next DUT can start right away and no row is lost to a network
+error or a crash. Rows are uploaded in batches with one append request each: the worker waits until
+batch_rows rows are queued, the oldest has waited batch_wait seconds, or flush() or close() is called.
+Journal lines are {"key": key, "payload": [...]} when a row is queued and {"key": key}
+once it's uploaded; rows still pending when the program stops are uploaded on the next start.
+Every row has an idempotency key (timestamp + array serial number). A row whose upload may have gone
+through (a failed or interrupted attempt, or any row from a previous run) is first looked up in the
+sheet by its key, and only appended if it's not there.
+Parameters:
+    creds: Initialized Google Apps credential (see get_creds())
+    filename: Journal file
+    spreadsheet_id: The Google Sheets spreadsheet ID
+    out_sheet_name: The name of the sheet to append the rows to
+    batch_rows: Max number of rows per append request
+    batch_wait: Max time in seconds a row waits for the batch to fill up
+'''
+class Results_Outbox:
+    def __init__(self, creds, filename=RESULTS_OUTBOX_FILENAME, spreadsheet_id=SPREADSHEET_ID,
+                 out_sheet_name=OUT_SHEET_NAME, batch_rows=RESULTS_UPLOAD_BATCH_ROWS,
+                 batch_wait=RESULTS_UPLOAD_BATCH_WAIT):
+        self.creds = creds
+        self.filename = filename
+        self.spreadsheet_id = spreadsheet_id
+        self.out_sheet_name = out_sheet_name
+        self.batch_rows = batch_rows
+        self.batch_wait = batch_wait
+        self.condition = threading.Condition()
+        # key: {"payload": list of values, "uncertain": True if it may be in the sheet, "queued_at": time.monotonic()}
+        self.pending = dict()
+        self.flushing = False
+        self.closing = False
+        self.load()
+        self.file = open(filename, 'a')
+        self.thread = threading.Thread(target=self.run, name="results_outbox", daemon=True)
+        self.thread.start()
+
+    '''
+    Loads the rows still pending from the journal and compacts it to just those rows
+    Returns: None
+    '''
+    def load(self):
+        if (not os.path.exists(self.filename)):
+            return
+        with open(self.filename) as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue                    # blank, or cut off by a crash
+                if ("payload" in record):
+                    self.pending[record["key"]] = {"payload": record["payload"], "uncertain": True, "queued_at": 0}
+                else:
+                    self.pending.pop(record["key"], None)
+        with open(self.filename + ".tmp", 'w') as file:
+            for (key, entry) in self.pending.items():
+                file.write(json.dumps({"key": key, "payload": entry["payload"]}) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(self.filename + ".tmp", self.filename)
+        if (len(self.pending) > 0):
+            print(str(len(self.pending)) + " result row(s) from an earlier run still waiting to upload to Google Sheets")
+
+    def write(self, record, sync=False):
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        if (sync):
+            os.fsync(self.file.fileno())
+
+    '''
+    Queues a results row for upload
+    Parameters:
+        key: Idempotency key, see get_results_key()
+        payload: 1D list of values for the row, see write_to_spreadsheet()
+    Returns: None
+    '''
+    def put(self, key, payload):
+        with self.condition:
+            if (key in self.pending):
+                return
+            self.write({"key": key, "payload": payload}, sync=True)
+            self.pending[key] = {"payload": payload, "uncertain": False, "queued_at": time.monotonic()}
+            self.condition.notify()
+
+    '''
+    Uploads the queued rows now instead of waiting for the batch to fill up
+    Returns: None
+    '''
+    def flush(self):
+        with self.condition:
+            self.flushing = True
+            self.condition.notify()
+
+    '''
+    Reads the idempotency keys of the rows in the output sheet
+    Parameters:
+        service: Google Sheets API service to use
+    Returns:
+        Set of keys, see get_results_key()
+    '''
+    def get_uploaded_keys(self, service):
+        ranges = [self.out_sheet_name + "!" + column + ":" + column for column in
+                  [get_column_letter(OUT_COLUMN_FIELDS.index(field)) for field in ["Timestamp", "Array Serial Number"]]]
+        result = (
+            service.spreadsheets().values()
+            .batchGet(spreadsheetId=self.spreadsheet_id, ranges=ranges)
+            .execute()
+        )
+        columns = [[(row[0] if (len(row) > 0) else "") for row in value_range.get("values", [])]
+                   for value_range in result.get("valueRanges", [])]
+        if (len(columns) < 2):
+            return set()
+        return {get_results_key(timestamp, serial) for (timestamp, serial) in zip(columns[0], columns[1])}
+
+    '''
+    Waits until a batch is due (see class description), must be called holding self.condition
+    Returns:
+        List of (key, entry) of the rows to upload, or None to stop the worker
+    '''
+    def wait_for_batch(self):
+        while True:
+            if (len(self.pending) == 0):
+                if (self.closing):
+                    return None
+                self.flushing = False       # nothing left to flush
+                self.condition.wait()
+                continue
+            oldest_wait = time.monotonic() - next(iter(self.pending.values()))["queued_at"]
+            if (self.closing or self.flushing or len(self.pending) >= self.batch_rows or
+                oldest_wait >= self.batch_wait):
+                return list(self.pending.items())[:self.batch_rows]
+            self.condition.wait(self.batch_wait - oldest_wait)
+
+    '''
+    Background worker: uploads the pending rows, then closes the journal. The worker owns the journal
+    file, so a batch still uploading when close() gives up on it is journaled once it goes through.
+    Returns: None
+    '''
+    def run(self):
+        try:
+            self.upload_pending()
+        finally:
+            with self.condition:
+                self.file.close()
+
+    '''
+    Uploads the pending rows in order and in batches, backing off after a failure, until close() is called
+    Returns: None
+    '''
+    def upload_pending(self):
+        service = None          # own service, the shared one from get_sheets_service() isn't thread-safe
+        num_failures = 0
+        while True:
+            with self.condition:
+                batch = self.wait_for_batch()
+            if (batch is None):
+                return
+            try:
+                if (service is None):
+                    service = build("sheets", "v4", credentials=self.creds)
+                if (any(entry["uncertain"] for (key, entry) in batch)):
+                    uploaded_keys = self.get_uploaded_keys(service)
+                    rows = [(key, entry) for (key, entry) in batch if (key not in uploaded_keys)]
+                else:
+                    rows = batch
+                uploaded = True
+                if (len(rows) > 0):
+                    for (key, entry) in rows:
+                        entry["uncertain"] = True   # from here on the row may have reached the sheet
+                    uploaded = write_to_spreadsheet(self.creds, [entry["payload"] for (key, entry) in rows],
+                                                    spreadsheet_id=self.spreadsheet_id,
+                                                    out_sheet_name=self.out_sheet_name, service=service)
+            except Exception as err:
+                print("WARNING: couldn't upload results to Google Sheets (" + str(err) + ")")
+                uploaded = False
+            with self.condition:
+                if (uploaded):
+                    num_failures = 0
+                    for (key, entry) in batch:
+                        del self.pending[key]
+                        self.write({"key": key})
+                    continue
+                num_failures += 1
+                if (self.closing):
+                    return                          # stays in the journal for the next run
+                delay = min(RESULTS_UPLOAD_RETRY_MAX, RESULTS_UPLOAD_RETRY_MIN*2**(num_failures-1))
+                print("WARNING: " + str(len(batch)) + " result row(s) not uploaded yet, retrying in " + str(delay) + " s")
+                self.condition.wait(delay)          # woken early by close()
+
+    '''
+    Returns:
+        Number of rows not uploaded yet
+    '''
+    def count_pending(self):
+        with self.condition:
+            return len(self.pending)
+
+    '''
+    Gives the worker up to timeout seconds to upload the pending rows and stop.
+    Rows still pending stay in the journal and are uploaded on the next start; if the worker is still
+    uploading a batch after the timeout, it's left to finish (and journal it) in the background.
+    Parameters:
+        timeout: Max time to wait in seconds
+    Returns:
+        Number of rows left pending, including a batch still uploading
+    '''
+    def close(self, timeout=RESULTS_UPLOAD_FLUSH_TIMEOUT):
+        with self.condition:
+            self.closing = True
+            self.condition.notify_all()
+        self.thread.join(timeout)
+        return self.count_pending()
+
+# Results_Outbox of the running program, see start_results_outbox()
+RESULTS_OUTBOX = None
+
+'''
+Starts the results outbox, which also uploads any rows left pending by an earlier run
+Parameters:
+    creds: Initialized Google Apps credential (see get_creds())
+    filename: Journal file
+Returns:
+    Results_Outbox object
+'''
+def start_results_outbox(creds, filename=RESULTS_OUTBOX_FILENAME):
+    global RESULTS_OUTBOX
+    if (RESULTS_OUTBOX is None):
+        RESULTS_OUTBOX = Results_Outbox(creds, filename)
+    return RESULTS_OUTBOX
+
+'''
+Queues a results row for upload to the Google Sheets output sheet, see Results_Outbox
+Parameters:
+    creds: Initialized Google Apps credential (see get_creds())
+    payload_dict: Dictionary with a value for every field in OUT_COLUMN_FIELDS, in order
+Returns:
+    Idempotency key of the row
+'''
+def queue_results_upload(creds, payload_dict):
+    key = get_results_key(payload_dict["Timestamp"], payload_dict["Array Serial Number"])
+    start_results_outbox(creds).put(key, list(payload_dict.values()))
+    return key
+
+'''
+Uploads the queued results rows now instead of waiting for a full batch, see Results_Outbox
+Returns: None
+'''
+def flush_results_outbox():
+    if (RESULTS_OUTBOX is not None):
+        RESULTS_OUTBOX.flush()
+
+'''
+Stops the results outbox, giving it time to upload the pending rows first
+Parameters:
+    timeout: Max time to wait in seconds
+Returns: None
+'''
+def finish_results_outbox(timeout=RESULTS_UPLOAD_FLUSH_TIMEOUT):
+    global RESULTS_OUTBOX
+    outbox = RESULTS_OUTBOX
+    RESULTS_OUTBOX = None
+    if (outbox is None):
+        return
+    if (outbox.count_pending() > 0):
+        print("Uploading results to Google Sheets...")
+    num_pending = outbox.close(timeout)
+    if (num_pending > 0):
+        print("WARNING: " + str(num_pending) + " result row(s) not confirmed uploaded yet, they're kept in " +
+              outbox.filename + " and uploaded on the next run")
+
 '''
 Helper function to pass/fail continuity check function results
 Parameters:
@@ -49,17 +49,109 @@ DMM_SERIAL_STRING_DEFAULT  = "USB0::0x05E6::0x6500::04611761::INSTR"
 SERIAL_PORT_DEFAULT = "COM3"
 
 # default amount of time to wait between commands for each instrument
-PSU_DELAY_TIME = 3 # seconds, PSU delay to stabilize output voltage especially when switching on/off
+PSU_DELAY_TIME = 3 # seconds, max time to wait for the PSU output voltage to settle when switching on/off
 DMM_DELAY_TIME = 0 # seconds, DMM delay not necessary for continuity checks
 SERIAL_DELAY_TIME = 0.02 # seconds, any faster and the GPIB interface cannot keep up
 DMM_DELAY_TIME_CAP = 0 # seconds, for experimenting with cap check specifically
 SERIAL_DELAY_TIME_CAP = 0.02 # tester cannot synchronize GPIB/serial faster than 0.02sec delay
 
+# PSU settle detection -- instead of sleeping PSU_DELAY_TIME, the PSU's measured output voltage is
+# polled on both channels until it's within tolerance (on) or near 0V (off); PSU_DELAY_TIME is the timeout
+PSU_VOLTAGE_SETPOINT = 18          # volts, both channels
+PSU_SETTLE_TOLERANCE = 0.2         # volts, max difference from PSU_VOLTAGE_SETPOINT to be considered settled on
+PSU_OFF_VOLTAGE_THRESHOLD = 0.5    # volts, max output voltage to be considered settled off
+PSU_SETTLE_POLL_TIME = 0.05        # seconds, how often to measure the outputs while waiting
+PSU_SETTLE_LOG_FILENAME = "psu_settle_log.csv" # in PATH_BASE, every settle time is appended here, to track supply drift
+PSU_CURRENT_LIMITS = [0.05, 0.075] # amps, current limit of channel 0 (-) and 1 (+)
+PSU_CURRENT_LIMIT_FRACTION = 0.95  # a channel drawing this fraction of its limit once on is in current limit (e.g. a short)
+
+# acknowledged serial mode -- the Arduino replies once its muxes have settled, so the fixed
+# SERIAL_DELAY_TIME/SERIAL_DELAY_TIME_CAP sleeps are skipped. Older firmware that never replies
+# falls back to the fixed delays automatically.
+SERIAL_ACK_MODE_DEFAULT = True # True: try acknowledged mode on connect, False: always use fixed delays
+SERIAL_ACK_TIMEOUT = 0.5       # seconds, max time to wait for the tester to acknowledge a command
+SERIAL_ACK_PROBE_ATTEMPTS = 5  # number of times to try enabling acknowledged mode on connect
+SERIAL_ACK_RETRIES = 2         # number of times to resend a command the tester didn't acknowledge before aborting
+
+# buffered DMM acquisition for full-array resistance scans (DMM6500 trigger model + reading buffer)
+# instead of one blocking 'meas:res?' per cell, the DMM stores every reading in its buffer and the host
+# pulls all of them in one bulk read at the end of the scan
+# Pacing options:
+# - "host":    DMM waits for a bus trigger (*TRG) after the host steps the muxes, works with any firmware
+# - "trigger": DMM paces itself (settle delay, measure) and its EXT TRIG OUT steps the Arduino scan sequencer,
+#              requires the DMM's external trigger out wired to Arduino pin 19 and the scan sequencer firmware
+DMM_BUFFERED_SCAN_DEFAULT = False
+DMM_BUFFERED_SCAN_PACING = "host"
+DMM_BUFFERED_SCAN_SETTLE_TIME = 0.02 # seconds, DMM delay between the mux step and each reading
+DMM_BUFFERED_SCAN_POLL_TIME = 0.05   # seconds, how often to check if the DMM buffer is full
+DMM_BUFFERED_SCAN_TIMEOUT = 120      # seconds, max time to wait for a buffered scan to finish
+DMM_BUFFERED_READING_TIMEOUT = 2     # seconds, max time to wait for each "host" paced reading to reach the buffer
+DMM_BUFFER_NAME = "defbuffer1"
+
+# scan pipeline -- the scan loops hand each reading to a background thread that does the CSV writing,
+# threshold counting and progress printing, so the measurement loop never waits on disk (PATH_BASE is a
+# Google Drive sync folder) or terminal output
+SCAN_QUEUE_SIZE = 1024 # readings, max number of readings waiting to be written before the scan loop blocks
+
+# run tracing -- each run saves a timeline of spans (per test, row, cell, serial/VISA command, PSU switching,
+# Google Sheets call and CSV write) next to its summary.txt, viewable in chrome://tracing or ui.perfetto.dev
+TRACE_RUNS_DEFAULT = True            # True: save a trace for every run, False: no tracing (no overhead)
+TRACE_FILENAME_SUFFIX = "_trace.json" # replaces "_summary.txt" in the summary filename
+
+# run checkpoints -- every measured cell and finished test is appended to a checkpoint file next to the
+# output files, so an interrupted run of the same DUT + stage on the same tester can be resumed
+# without re-measuring anything; the file is deleted once the run finishes
+CHECKPOINT_FILENAME_SUFFIX = "_checkpoint.jsonl"
+
 # default multimeter ranges for each class of measurement
 RES_RANGE_DEFAULT = '100E6'  # ohm
 RES_RANGE_LOOPBACKS = '10E3' # ohm
 CAP_RANGE_DEFAULT = '1E-9'   # farad
 
+# DMM measurement profiles, trading speed for accuracy
+# Each profile sets the following on the DMM:
+# - "res_nplc":       resistance integration time in power line cycles (more = slower, less noise)
+# - "res_azer":       resistance autozero, "on" or "off" (off skips the zero reference reading)
+# - "res_range":      resistance range (ohm)
+# - "cap_range":      capacitance range (farad)
+# - "cap_aver_count": number of cap measurements averaged per reading (1 disables averaging)
+# A short/open decision against RES_SHORT_THRESHOLD_ROWCOL doesn't need 6.5 digits, so the
+# continuity tests default to "fast_screen". Add add'l profiles like below:
+# DMM_PROFILES["profile_name"] = {"res_nplc": ..., "res_azer": ..., ...}
+DMM_PROFILES = {
+    "fast_screen"     : {"res_nplc": 0.1, "res_azer": "off", "res_range": RES_RANGE_DEFAULT,
+                         "cap_range": CAP_RANGE_DEFAULT, "cap_aver_count": 1},
+    "standard"        : {"res_nplc": 1,   "res_azer": "on",  "res_range": RES_RANGE_DEFAULT,
+                         "cap_range": CAP_RANGE_DEFAULT, "cap_aver_count": 10},
+    "characterization": {"res_nplc": 10,  "res_azer": "on",  "res_range": RES_RANGE_DEFAULT,
+                         "cap_range": CAP_RANGE_DEFAULT, "cap_aver_count": 100}
+}
+DMM_PROFILE_DEFAULT = "standard"       # set when the DMM is initialized
+DMM_PROFILE_CONT = "fast_screen"       # continuity tests (2D, 1D, node, col to PZBIAS w/ TFTs on)
+DMM_PROFILE_CAP = "standard"           # capacitance tests
+DMM_PROFILE_LOOPBACKS = "fast_screen"  # loopback tests, range is overridden to RES_RANGE_LOOPBACKS
+
+# ------------------------------------------
+# TESTER SIMULATOR (debug mode)
+# ------------------------------------------
+
+# In debug mode the tester, DMM and PSU are replaced by a simulator (Tester_Sim in tester_hw_test_classes.py)
+# that tracks the firmware's mux state and measures a virtual 16x16 array with the faults below.
+# Set DEBUG_USE_SIMULATOR to False to use the old constant-value dummies instead.
+DEBUG_USE_SIMULATOR = True
+# Nets: "row0"..."row15", "col0"..."col15", "rst0"..."rst15", "PZBIAS", "SHIELD", "VDD", "VRST"
+SIM_SHORTS = []    # shorted net pairs, e.g. [("row3", "col5"), ("col7", "PZBIAS")]
+SIM_OPENS = []     # nets with an open trace, e.g. ["col7"], or "LOOP1"/"LOOP2" for an open loopback
+SIM_CAP_PF = 20.0  # sensor capacitance of every cell (pF), or a 16x16 list of lists [row][col]
+SIM_SEED = None    # random seed for the measurement noise, None for a different sequence each run
+# timing model, so debug runs take about as long as the real tester
+SIM_SERIAL_BYTE_TIME = 10/115200 # seconds per serial byte at 115200 baud
+SIM_MUX_SETTLE_TIME = 500e-6     # seconds the firmware waits before acknowledging a command
+SIM_DMM_LATENCY = 0.003          # seconds of bus + processing overhead per DMM reading (plus NPLC time)
+SIM_DMM_JITTER = 0.002           # max random seconds added to each DMM reading
+SIM_PSU_RAMP_TIME = 0.2          # seconds for the PSU outputs to ramp on/off
+BENCHMARK_RESULTS_FILENAME = "benchmark_results.jsonl" # benchmark.py appends one JSON result per run here
+
 # ------------------------------------------
 # TEST PASS/FAIL THRESHOLDS
 # ------------------------------------------
@@ -100,6 +192,29 @@ TOKEN_FILE_DEFAULT = "token.json"
 CRED_FILE_DEFAULT = "credentials.json"
 ID_SHEET_NAME = "Sensor Modules"
 OUT_SHEET_NAME = "Tester Output"
+# Inventory lookups (TFT type, full array name, wafer build type) read these columns of ID_SHEET_NAME
+# in one request and keep them in memory (see Sheets_Inventory in test_helper_functions.py),
+# re-reading them once the snapshot is older than INVENTORY_SNAPSHOT_TTL
+INVENTORY_COLUMNS = ['A', 'L', 'M', 'R'] # die ID, wafer ID, mask (BT[x]), TFT type
+INVENTORY_SNAPSHOT_TTL = 300 # seconds
+# The snapshot is mirrored to this SQLite file, so lookups are answered locally right away at startup
+# (and when Google Sheets can't be reached); stale data is refreshed in the background and flagged with
+# a warning instead of blocking. A lookup that misses on stale data waits up to INVENTORY_REFRESH_WAIT
+# for the refresh, in case the DUT was only just added to the inventory. None to not mirror to disk.
+INVENTORY_CACHE_FILENAME = "inventory_cache.sqlite3"
+INVENTORY_REFRESH_WAIT = 5 # seconds
+# Results for OUT_SHEET_NAME are appended to this local journal first, and a background worker uploads
+# them (see Results_Outbox in test_helper_functions.py), so a failed upload is retried instead of lost.
+# Failed uploads are retried after RESULTS_UPLOAD_RETRY_MIN seconds, doubling up to RESULTS_UPLOAD_RETRY_MAX;
+# on shutdown the worker gets RESULTS_UPLOAD_FLUSH_TIMEOUT seconds to finish, anything left is uploaded next run.
+RESULTS_OUTBOX_FILENAME = "results_outbox.jsonl"
+RESULTS_UPLOAD_RETRY_MIN = 2 # seconds
+RESULTS_UPLOAD_RETRY_MAX = 300 # seconds
+RESULTS_UPLOAD_FLUSH_TIMEOUT = 15 # seconds
+# Queued rows are uploaded together in one append request, once RESULTS_UPLOAD_BATCH_ROWS rows are queued
+# (a whole wafer) or the oldest one has waited RESULTS_UPLOAD_BATCH_WAIT seconds; shutdown uploads them right away
+RESULTS_UPLOAD_BATCH_ROWS = 24
+RESULTS_UPLOAD_BATCH_WAIT = 600 # seconds
 # Below is the list of column fields in the output sheet specified by OUT_SHEET_NAME.
 # This is in the EXACT order, left to right, of the columns in the output sheet. That's the order
 # data will be appended to the sheet in each new row.
@@ -216,7 +331,106 @@ the reason we're using these names is because we're limited to one character + c
 - '%' for writing secondary board to "vrst/SHIELD" output
 - '^' for writing secondary board to "vrst/PZBIAS" output
 - '(' for writing secondary board to "SHIELD/PZBIAS" output
+- '<' ... '>' for a framed command, e.g. "<ZUR3L5O>", applied in order once the whole frame is received
+- '[' to enable acknowledged mode (tester replies ACK/NAK after each command or frame)
+- ']' to disable acknowledged mode (default)
+- '{' ... '}' for setting up a scan, e.g. "{UR0fL0fO}" (see SERIAL_SCAN_START below)
+- 'G' for stepping the scan to the next cell
+- 'H' for halting the scan (all off)
+'''
+
+'''
+Start/end characters of a framed command. Every character inside the frame is handled by the Arduino
+exactly as if it had been sent on its own, but the host only needs one serial write (and one delay)
+to set the full mux state for a measurement.
+'''
+SERIAL_FRAME_START = b'<'
+SERIAL_FRAME_END = b'>'
+
+'''
+Characters used by the optional acknowledged mode. In acknowledged mode the Arduino replies with
+SERIAL_ACK after every command or frame once the muxes have settled, or SERIAL_NAK if a frame was dropped.
+'''
+SERIAL_ACK_MODE_ON = b'['
+SERIAL_ACK_MODE_OFF = b']'
+SERIAL_ACK = b'\x06'
+SERIAL_NAK = b'\x15'
+
+'''
+Characters used by the firmware scan sequencer. The host sends the scan type and range once,
+SERIAL_SCAN_START + (secondary mode, dim1 write mode, dim1 start, dim1 end,
+dim2 write mode, dim2 start, dim2 end, output mode) + SERIAL_SCAN_END, e.g. b'{UR0fL0fO}',
+with inclusive hex start/end indices. The Arduino sets the first cell, then steps to the next cell
+(dim2 fastest) on every SERIAL_SCAN_NEXT or falling edge on its scan trigger input (pin 19),
+and turns everything off after the last cell or on SERIAL_SCAN_HALT.
+USE_FIRMWARE_SCAN_DEFAULT is False because firmware without the sequencer misreads the scan setup
+as individual commands.
+'''
+SERIAL_SCAN_START = b'{'
+SERIAL_SCAN_END = b'}'
+SERIAL_SCAN_NEXT = b'G'
+SERIAL_SCAN_HALT = b'H'
+USE_FIRMWARE_SCAN_DEFAULT = False
+
+'''
+Adaptive 2D scans (row/rst to column): each row is first measured against every column at once, and only
+rows that read below the short threshold are measured column by column, so a clean array takes 16
+readings instead of 256. This needs a tester state with all columns connected together, selected by
+SERIAL_GANG_COLS after the row is addressed and cleared by 'Z' or the next column address.
+The current column mux board connects one column at a time and the firmware has no such state, so
+TESTER_CAN_GANG_COLUMNS is False and adaptive scans fall back to measuring every cell. The simulator
+(debug mode) supports the ganged state when TESTER_CAN_GANG_COLUMNS is True.
+'''
+SERIAL_GANG_COLS = b'K'
+TESTER_CAN_GANG_COLUMNS = False
+ADAPTIVE_SCAN_DEFAULT = False
+
+'''
+Visit order of cell-by-cell 2D scans (see Scan_Plan in test_helper_functions.py):
+- "row_major":  every row visits its columns 0...15
+- "serpentine": every other row visits its columns in reverse, so stepping to the next row only re-sends
+                the row address instead of the row + column address
+- "auto":       plans both and uses the one that sends the fewest serial writes, then bytes. With the firmware's
+                write mode semantics that's row major for continuity scans (the column write mode stays selected
+                along a row, 1 byte per cell) and serpentine for cap scans (the output mode changes every cell)
+Scans stepped by the firmware scan sequencer are always row major.
+Run 'python benchmark.py --plans' for a dry run of every plan's serial byte/sleep budget.
+CAP_ALTERNATE_OUTPUT_MODES measures every other cap cell TFT on first (P, I instead of I, P), so
+consecutive cells share the output mode and only the column address is sent between them; it's off by
+default because it changes which state each cell's TFT was left in before its off measurement.
+SCAN_ORDER_DEFAULT is "row_major" for the same reason: "auto" scans cap tests serpentine, which changes each
+cell's mux history and writes the CSV rows in visit order, so it stays opt-in until validated on hardware.
+'''
+SCAN_ORDER_DEFAULT = "row_major"
+CAP_ALTERNATE_OUTPUT_MODES = False
+
+'''
+TFT off baseline of the cap tests. With the primary row mux in 'I' (binary counter disable) mode every
+TFT is off, so the off measurement doesn't depend on the addressed row and can be shared:
+- "per_cell":      measures the off baseline at every cell (2 readings per cell)
+- "per_column":    measures it at the first cell visited in each column and reuses it for the column
+- "per_row_block": same, but once per column in each block of CAP_OFF_BASELINE_ROW_BLOCK rows
+- "validate":      measures every cell's off baseline like "per_cell" and reports the error the shared
+                   baselines would have had against them (and how many cells would change pass/fail)
+The CSV's "Cap Off Baseline" column records how each cell's off value was taken.
+'''
+CAP_OFF_BASELINES = ["per_cell", "per_column", "per_row_block", "validate"]
+CAP_OFF_BASELINE_DEFAULT = "per_cell"
+CAP_OFF_BASELINE_ROW_BLOCK = 4
+
+'''
+Adaptive cap averaging: instead of the DMM averaging a fixed cap_aver_count readings (DMM_PROFILES),
+test_cap takes CAP_ADAPTIVE_MIN_SAMPLES single readings per measurement and only adds readings (up to the
+profile's cap_aver_count) while the calibrated value (on - off) is within
+CAP_ADAPTIVE_MARGIN_PF + CAP_ADAPTIVE_SIGMAS standard errors of a CAP_THRESHOLD_VALS bound, or its
+standard error is above CAP_ADAPTIVE_MAX_STDERR_PF. Clearly in range or dead cells stop at the minimum.
+The CSV records the number of readings averaged for every cell's off and on measurement.
 '''
+CAP_ADAPTIVE_AVERAGING_DEFAULT = False
+CAP_ADAPTIVE_MIN_SAMPLES = 2
+CAP_ADAPTIVE_MARGIN_PF = 1.0
+CAP_ADAPTIVE_SIGMAS = 3
+CAP_ADAPTIVE_MAX_STDERR_PF = 0.5
 
 '''
 Dictionary with 1-character commands to set secondary mux board into the correct mode for the measurement
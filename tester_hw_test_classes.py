@@ -1,3 +1,6 @@
+import random
+import threading
+import time
 
 # dummy classes for serial and VISA objects
 class Serial_Dummy:
@@ -19,6 +22,10 @@ class Serial_Dummy:
         return self.port
     def write(self, data):
         return True
+    def read(self, size=1):
+        return b''
+    def reset_input_buffer(self):
+        return True
     def close(self):
         self.port = ""
         print("FOR DEBUGGING USE ONLY, VIRTUAL SERIAL DEVICE CLOSED")
@@ -30,6 +37,10 @@ class VISA_Dummy:
         self.config_val = ""
         self.res_default = 0.01
         self.cap_default = 1e-9
+        self.buffer_points = 0
+        self.channel = 0
+        self.output_volts = [0, 0]
+        self.output_on = [False, False]
         self.visa_id = visa_id_in
         print("FOR DEBUGGING USE ONLY, VIRTUAL VISA DEVICE CREATED")
     def __str__(self):
@@ -42,12 +53,573 @@ class VISA_Dummy:
             return self.res_default
         elif (query_in == "meas:cap?"):
             return self.cap_default
+        elif (query_in.startswith("trac:act?")):
+            return self.buffer_points
+        elif (query_in.startswith("trac:data?")):
+            return ",".join([str(self.res_default)]*int(query_in.split(",")[1]))
+        elif (query_in == "MEAS:VOLT?"):
+            return self.output_volts[self.channel] if self.output_on[self.channel] else 0
+        elif (query_in == "MEAS:CURR?"):
+            return 0.001 if self.output_on[self.channel] else 0
         else:
             return 0
     def write(self, data):
         self.config_val = data
+        if (data.startswith("trac:poin")):
+            self.buffer_points = int(data.split(" ")[1].split(",")[0])
+        elif (data.startswith("INST:SEL")):
+            self.channel = int(data.split(" ")[1])
+        elif (data.startswith("APPL")):
+            self.output_volts[self.channel] = float(data.split(" ")[1].split(",")[0])
+        elif (data.startswith("OUTP:STAT")):
+            self.output_on[self.channel] = (data.split(" ")[1] == "1")
+        elif (data.startswith("OUTP:ALL")):
+            self.output_on = [data.split(" ")[1] == "1"]*2
         return True
     def close(self):
         self.visa_id = ""
         print("FOR DEBUGGING USE ONLY, VIRTUAL SERIAL DEVICE CLOSED")
-        return True
\ No newline at end of file
+        return True
+
+'''
+Software model of the automated_arduino_cap_cont_checker_16x16_noack.ino state machine,
+used in place of the Arduino's serial port so scans can be checked without hardware.
+Handles the same 1-character commands, framed commands ('<' ... '>'), acknowledged mode ('[' / ']')
+and the scan sequencer ('{' ... '}', 'G', 'H'), and keeps track of the resulting mux state.
+Acknowledgements are queued and returned by read(), like the real serial port.
+Call trigger() to emulate a falling edge on the scan trigger input.
+'''
+class Arduino_Sim:
+    SECONDARY_CMDS = "UVWXYMNQ!@#$%^&*("
+    OUTPUT_CMDS = "OPSI"
+    WRITE_CMDS = "RLT"
+    HEX_CHARS = "0123456789abcdefABCDEF"
+    ACK = b'\x06'
+    NAK = b'\x15'
+    MAX_FRAME_LENGTH = 32
+    SCAN_SETUP_LENGTH = 8
+
+    def __init__(self, port_in=""):
+        self.port = port_in
+        self.baudrate = 115200
+        self.bytesize = None
+        self.parity = None
+        self.stopbits = None
+        self.timeout = None
+        self.xonxoff = None
+        self.rtscts = None
+        self.dsrdtr = None
+        self.writeTimeout = 0
+        self.is_open = False
+        self.reply_buffer = b''
+        self.frame_end = None
+        self.frame = ""
+        self.ack_mode = False
+        self.state = ' '
+        self.secondary = None
+        self.secondary_enabled = False
+        self.output_mode = 'Z'
+        self.addresses = {'R': 0, 'L': 0, 'T': 0}
+        self.scan_active = False
+        self.scan_setup = None
+        self.scan_dim1 = 0
+        self.scan_dim2 = 0
+        self.bytes_received = 0
+        self.commands_applied = 0
+        self.byte_time = 0          # seconds per serial byte, e.g. 10/115200 to model the baud rate
+        self.settle_time = 0        # seconds the firmware waits before each acknowledgement
+        self.gang_cols_supported = False    # True to model a tester that can connect every column at once
+        self.cols_ganged = False
+    def __str__(self):
+        return self.port
+    def open(self):
+        self.is_open = True
+        return self.port
+    def close(self):
+        self.is_open = False
+        return True
+    def reset_input_buffer(self):
+        self.reply_buffer = b''
+        return True
+    def read(self, size=1):
+        data = self.reply_buffer[:size]
+        self.reply_buffer = self.reply_buffer[size:]
+        return data
+    def write(self, data):
+        if (self.byte_time > 0):
+            time.sleep(len(data)*self.byte_time)            # serial transfer time
+        for i in range(len(data)):
+            self.receive(chr(data[i]))
+        return len(data)
+
+    # handles one received character the same way loop() does
+    def receive(self, char):
+        self.bytes_received += 1
+        if (self.frame_end is not None):
+            if (char == self.frame_end):
+                if (self.frame_end == '>'):
+                    success = self.handle_frame(self.frame)
+                else:
+                    success = self.handle_scan_setup(self.frame)
+                self.frame_end = None
+                self.acknowledge(success)
+            elif (len(self.frame) >= self.MAX_FRAME_LENGTH):
+                self.frame_end = None
+                self.off_mode()
+                self.acknowledge(False)
+            else:
+                self.frame += char
+            return
+        if (char == '<'):
+            self.frame_end = '>'
+            self.frame = ""
+            return
+        if (char == '{'):
+            self.frame_end = '}'
+            self.frame = ""
+            return
+        self.handle_command(char)
+        self.acknowledge(True)
+
+    def acknowledge(self, success):
+        if (self.ack_mode):
+            if (self.settle_time > 0):
+                time.sleep(self.settle_time)
+            self.reply_buffer += self.ACK if success else self.NAK
+
+    def handle_frame(self, frame):
+        for char in frame:
+            self.handle_command(char)
+        return True
+
+    def handle_scan_setup(self, setup):
+        self.scan_active = False
+        if ((len(setup) == self.SCAN_SETUP_LENGTH) and
+            all(char in self.HEX_CHARS for char in (setup[2], setup[3], setup[5], setup[6]))):
+            (dim1_start, dim1_end) = (int(setup[2], 16), int(setup[3], 16))
+            (dim2_start, dim2_end) = (int(setup[5], 16), int(setup[6], 16))
+            if (dim1_end >= dim1_start and dim2_end >= dim2_start):
+                self.scan_setup = (setup[0], setup[1], dim1_start, dim1_end, setup[4], dim2_start, dim2_end, setup[7])
+                self.scan_dim1 = dim1_start
+                self.scan_dim2 = dim2_start
+                self.handle_command('Z')
+                self.handle_command(setup[0])
+                self.apply_scan_address()
+                self.scan_active = True
+                return True
+        self.off_mode()
+        return False
+
+    def apply_scan_address(self):
+        (secondary, dim1_cmd, dim1_start, dim1_end, dim2_cmd, dim2_start, dim2_end, output_mode) = self.scan_setup
+        self.handle_command(dim1_cmd)
+        self.handle_command(format(self.scan_dim1, 'x'))
+        self.handle_command(dim2_cmd)
+        self.handle_command(format(self.scan_dim2, 'x'))
+        self.handle_command(output_mode)
+
+    def advance_scan(self):
+        if (not self.scan_active):
+            return
+        (secondary, dim1_cmd, dim1_start, dim1_end, dim2_cmd, dim2_start, dim2_end, output_mode) = self.scan_setup
+        if (self.scan_dim2 < dim2_end):
+            self.scan_dim2 += 1
+        elif (self.scan_dim1 < dim1_end):
+            self.scan_dim1 += 1
+            self.scan_dim2 = dim2_start
+        else:
+            self.scan_active = False
+            self.handle_command('Z')
+            return
+        self.apply_scan_address()
+
+    # emulates a falling edge on the scan trigger input, e.g. from the DMM trigger out
+    def trigger(self):
+        self.advance_scan()
+
+    def off_mode(self):
+        self.state = 'Z'
+        self.output_mode = 'Z'
+        self.secondary_enabled = False
+        self.cols_ganged = False
+
+    # applies one command, same as handleCommand() in the firmware
+    def handle_command(self, char):
+        self.commands_applied += 1
+        if (char == '['):
+            self.ack_mode = True
+        elif (char == ']'):
+            self.ack_mode = False
+        elif (char == 'G'):
+            self.advance_scan()
+        elif (char == 'H'):
+            self.scan_active = False
+            self.handle_command('Z')
+        elif (char == 'Z'):
+            self.off_mode()
+        elif (char in self.OUTPUT_CMDS):
+            self.state = char
+            self.output_mode = char
+        elif (char in self.WRITE_CMDS):
+            self.state = char
+        elif (char in self.SECONDARY_CMDS):
+            self.state = char
+            self.secondary = char
+            self.secondary_enabled = True
+        elif (char == 'K'):
+            self.cols_ganged = self.gang_cols_supported
+        elif (char in self.HEX_CHARS):
+            if (self.state in self.WRITE_CMDS):
+                self.addresses[self.state] = int(char, 16)
+                if (self.state == 'L'):
+                    self.cols_ganged = False
+
+    '''
+    Returns the current mux state as a dictionary, e.g.
+    {"secondary": 'U', "output_mode": 'O', "row": 3, "col": 5, "rst": 0, "cols_ganged": False}
+    "secondary" is None while the secondary board is disabled (e.g. after 'Z')
+    "cols_ganged" is True while every column is connected at once ('K', see SERIAL_GANG_COLS)
+    '''
+    def get_mux_state(self):
+        return {"secondary"  : self.secondary if self.secondary_enabled else None,
+                "output_mode": self.output_mode,
+                "row"        : self.addresses['R'],
+                "col"        : self.addresses['L'],
+                "rst"        : self.addresses['T'],
+                "cols_ganged": self.cols_ganged}
+
+'''
+Virtual 16x16 sensor array with an injectable fault model, measured through the tester muxes.
+Nets are named "row0"..."row15", "col0"..."col15", "rst0"..."rst15", "PZBIAS", "SHIELD", "VDD" and "VRST".
+Parameters:
+    shorts: List of (net, net) pairs that are shorted, e.g. [("row3", "col5"), ("col7", "PZBIAS")]
+            Shorts are transitive, e.g. row3-col5 + col5-PZBIAS also shorts row3 to PZBIAS
+    opens: List of nets with an open trace (e.g. "col7", or "LOOP1"/"LOOP2" for an open loopback),
+           which measure open and have no sensor capacitance
+    cap_pf: Sensor capacitance (pF) of every cell, a number or a 16x16 list of lists [row][col]
+    seed: Random seed for the measurement noise, None for a different sequence each run
+'''
+class Array_Sim:
+    # secondary board mode -> the two nets it connects to the DMM, "row"/"col"/"rst" are addressed by the muxes
+    SECONDARY_NETS = {'U': ("row", "col"), 'V': ("row", "PZBIAS"), 'W': ("col", "PZBIAS"),
+                      'X': ("row", "SHIELD"), 'Y': ("col", "SHIELD"), 'M': ("rst", "PZBIAS"),
+                      'N': ("rst", "SHIELD"), 'Q': ("rst", "col"), '!': ("VDD", "col"),
+                      '@': ("VDD", "SHIELD"), '#': ("VDD", "PZBIAS"), '$': ("VRST", "col"),
+                      '%': ("VRST", "SHIELD"), '^': ("VRST", "PZBIAS"), '(': ("SHIELD", "PZBIAS")}
+    LOOPBACKS = {'&': "LOOP1", '*': "LOOP2"}
+    MUX_ADDRESSED_NETS = ("row", "col", "rst")
+    OPEN_READING = 9.9e37           # what the DMM returns on overflow
+    SHORT_RES = 50.0                # ohm, short through the muxes
+    LOOPBACK_RES = 20.0             # ohm, closed loopback through the probe card/flex
+    PARASITIC_CAP_PF = 100.0        # pF, tester + cabling capacitance seen with all TFT's off
+    NOISE = 0.01                    # relative measurement noise
+
+    def __init__(self, shorts=[], opens=[], cap_pf=20.0, seed=None):
+        self.rng = random.Random(seed)
+        self.opens = set(opens)
+        self.shorts = dict()
+        for (net_a, net_b) in shorts:
+            self.add_short(net_a, net_b)
+        if (isinstance(cap_pf, (int, float))):
+            self.cap_pf = [[float(cap_pf)]*16 for row in range(16)]
+        else:
+            self.cap_pf = [list(row) for row in cap_pf]
+
+    def add_short(self, net_a, net_b):
+        self.shorts.setdefault(net_a, set()).add(net_b)
+        self.shorts.setdefault(net_b, set()).add(net_a)
+
+    # True if the two nets are connected through one or more shorts
+    def is_shorted(self, net_a, net_b):
+        if (net_a in self.opens or net_b in self.opens):
+            return False
+        visited = {net_a}
+        to_visit = [net_a]
+        while (len(to_visit) > 0):
+            net = to_visit.pop()
+            if (net == net_b):
+                return True
+            for next_net in self.shorts.get(net, ()):
+                if (next_net not in visited and next_net not in self.opens):
+                    visited.add(next_net)
+                    to_visit.append(next_net)
+        return False
+
+    def noisy(self, val):
+        return val*(1 + self.rng.gauss(0, self.NOISE))
+
+    def get_nets(self, mux_state):
+        (net_a, net_b) = self.SECONDARY_NETS[mux_state["secondary"]]
+        if (net_a in self.MUX_ADDRESSED_NETS):
+            net_a += str(mux_state[net_a])
+        if (net_b in self.MUX_ADDRESSED_NETS):
+            net_b += str(mux_state[net_b])
+        return (net_a, net_b)
+
+    '''
+    Returns the resistance the DMM would read for the given tester mux state
+    Parameters:
+        mux_state: Dictionary from Arduino_Sim.get_mux_state()
+    '''
+    def measure_resistance(self, mux_state):
+        secondary = mux_state["secondary"]
+        if (secondary in self.LOOPBACKS):
+            if (self.LOOPBACKS[secondary] in self.opens):
+                return self.OPEN_READING
+            return self.noisy(self.LOOPBACK_RES)
+        if (secondary not in self.SECONDARY_NETS or mux_state["output_mode"] == 'Z'):
+            return self.OPEN_READING
+        (net_a, net_b) = self.get_nets(mux_state)
+        if (mux_state.get("cols_ganged") and "col" in self.SECONDARY_NETS[secondary]):
+            # every column connected at once, shorted columns read in parallel
+            other_net = net_a if net_b.startswith("col") else net_b
+            num_shorted = sum([self.is_shorted(other_net, "col" + str(col)) for col in range(16)])
+            if (num_shorted > 0):
+                return self.noisy(self.SHORT_RES/num_shorted)
+            return self.OPEN_READING
+        if (self.is_shorted(net_a, net_b)):
+            return self.noisy(self.SHORT_RES)
+        return self.OPEN_READING
+
+    '''
+    Returns the capacitance (F) the DMM would read for the given tester mux state. The addressed cell's
+    sensor capacitance only adds to the parasitic capacitance when its row TFT is on (output mode 'P')
+    Parameters:
+        mux_state: Dictionary from Arduino_Sim.get_mux_state()
+    '''
+    def measure_capacitance(self, mux_state):
+        secondary = mux_state["secondary"]
+        if (secondary not in ('W', 'Y') or mux_state["output_mode"] not in ('P', 'I')):
+            return 0.0
+        cap = self.PARASITIC_CAP_PF
+        (row, col) = (mux_state["row"], mux_state["col"])
+        if (mux_state["output_mode"] == 'P' and ("row" + str(row)) not in self.opens and
+            ("col" + str(col)) not in self.opens):
+            cap += self.cap_pf[row][col]
+        return self.rng.gauss(cap, self.PARASITIC_CAP_PF*self.NOISE*0.01)*1e-12
+
+'''
+Virtual Keithley DMM6500 that measures the Array_Sim through the mux state of an Arduino_Sim,
+with the reading time modelled from the NPLC/autozero settings plus latency and jitter.
+Supports the commands used by test_helper_functions.py, including the buffered scan trigger model,
+which runs in the background like the real one: each reading waits the trigger model's delay, then
+measures whatever the mux state is by then, and a *TRG arriving before it's waiting again is dropped.
+Parameters:
+    arduino: Arduino_Sim the DMM is wired to
+    array: Array_Sim being measured
+    psu: PSU_Sim powering the tester boards, None if the tester is always powered
+    latency: Seconds of fixed overhead per reading (bus + processing)
+    jitter: Max random seconds added to each reading
+    line_freq: Power line frequency (Hz), used for the NPLC integration time
+'''
+class DMM_Sim:
+    def __init__(self, arduino, array, psu=None, latency=0.0, jitter=0.0, line_freq=60, visa_id_in=""):
+        self.arduino = arduino
+        self.array = array
+        self.psu = psu
+        self.latency = latency
+        self.jitter = jitter
+        self.line_freq = line_freq
+        self.read_termination = ""
+        self.visa_id = visa_id_in
+        self.nplc = 1.0
+        self.azer = True
+        self.cap_aver_count = 1
+        self.buffer = []
+        self.buffer_points = 0
+        self.trigger_pacing = None      # None: idle, "host": waiting for *TRG, "trigger": self-paced
+        self.trigger_out = False
+        self.num_readings = 0
+        self.readings_taken = 0
+        self.trigger_delay = 0.0
+        self.trigger_thread = None
+        self.trigger_event = threading.Event()
+        self.trigger_abort = False
+    def __str__(self):
+        return self.visa_id
+    def open(self, port_in):
+        self.visa_id = port_in
+        return self.visa_id
+    def close(self):
+        self.visa_id = ""
+        return True
+
+    def is_powered(self):
+        return (self.psu is None) or self.psu.is_powered()
+
+    # waits as long as the real DMM would take to make one reading
+    def wait_reading(self, integration_time):
+        delay = self.latency + integration_time
+        if (self.jitter > 0):
+            delay += self.array.rng.uniform(0, self.jitter)
+        if (delay > 0):
+            time.sleep(delay)
+
+    def measure_res(self):
+        self.wait_reading(self.nplc/self.line_freq*(2 if self.azer else 1))
+        if (not self.is_powered()):
+            return Array_Sim.OPEN_READING
+        return self.array.measure_resistance(self.arduino.get_mux_state())
+
+    def measure_cap(self):
+        vals = []
+        for i in range(self.cap_aver_count):
+            self.wait_reading(0.02)
+            vals.append(self.array.measure_capacitance(self.arduino.get_mux_state()) if self.is_powered() else 0.0)
+        return sum(vals)/len(vals)
+
+    def query(self, query_in):
+        if (query_in == "meas:res?"):
+            return self.measure_res()
+        elif (query_in == "meas:cap?"):
+            return self.measure_cap()
+        elif (query_in.startswith("trac:act?")):
+            return len(self.buffer)
+        elif (query_in.startswith("trac:data?")):
+            (start, end) = (int(query_in.split(",")[0].split(" ")[1]), int(query_in.split(",")[1]))
+            return ",".join([str(val) for val in self.buffer[start-1:end]])
+        else:
+            return 0
+
+    def write(self, data):
+        if (data.startswith("sens:res:nplc")):
+            self.nplc = float(data.split(" ")[1])
+        elif (data.startswith("sens:res:azer")):
+            self.azer = (data.split(" ")[1].lower() in ("on", "1"))
+        elif (data.startswith("sens:cap:aver:coun")):
+            self.cap_aver_count = int(data.split(" ")[1])
+        elif (data.startswith("sens:cap:aver ")):
+            if (data.split(" ")[1].lower() in ("off", "0")):
+                self.cap_aver_count = 1
+        elif (data.startswith("trac:poin")):
+            self.buffer_points = int(data.split(" ")[1].split(",")[0])
+        elif (data.startswith("trac:cle")):
+            self.buffer = []
+        elif (data.startswith("trig:load")):
+            self.stop_trigger_model()
+            self.trigger_out = False
+        elif (data.startswith("trig:ext:out:stim")):
+            self.trigger_out = True
+        elif (data.startswith("trig:bloc:del:const")):
+            self.trigger_delay = float(data.split(",")[1])
+        elif (data.startswith("trig:bloc:bran:coun")):
+            self.num_readings = int(data.split(",")[1])
+        elif (data == "init"):
+            self.stop_trigger_model()
+            self.readings_taken = 0
+            self.trigger_pacing = "trigger" if self.trigger_out else "host"
+            self.trigger_thread = threading.Thread(target=self.run_trigger_model, daemon=True)
+            self.trigger_thread.start()
+        elif (data == "*TRG"):
+            self.trigger_event.set()
+        elif (data == "abor"):
+            self.stop_trigger_model()
+        return True
+
+    # trigger model loop: (wait for *TRG), delay, measure into the buffer, (pulse trigger out)
+    def run_trigger_model(self):
+        while (self.readings_taken < self.num_readings and not self.trigger_abort):
+            if (self.trigger_pacing == "host"):
+                while (not self.trigger_event.wait(0.01)):
+                    if (self.trigger_abort):
+                        return
+            time.sleep(self.trigger_delay)
+            reading = self.measure_res()
+            self.trigger_event.clear()              # triggers sent during the delay or measurement are dropped
+            self.buffer.append(reading)
+            self.readings_taken += 1
+            if (self.trigger_pacing == "trigger"):
+                self.arduino.trigger()              # step the Arduino's scan sequencer
+        self.trigger_pacing = None
+
+    def stop_trigger_model(self):
+        if (self.trigger_thread is not None):
+            self.trigger_abort = True
+            self.trigger_thread.join()
+            self.trigger_thread = None
+        self.trigger_abort = False
+        self.trigger_pacing = None
+
+'''
+Virtual BK Precision 9141 power supply with two channels whose measured output voltage ramps
+to the setpoint (or down to 0V) over ramp_time after the output is switched.
+Parameters:
+    ramp_time: Seconds for an output to reach its setpoint or 0V
+'''
+class PSU_Sim:
+    def __init__(self, ramp_time=0.0, visa_id_in=""):
+        self.ramp_time = ramp_time
+        self.read_termination = ""
+        self.visa_id = visa_id_in
+        self.channel = 0
+        self.setpoint = [0.0, 0.0]
+        self.output_on = [False, False]
+        self.switch_time = [0.0, 0.0]
+        self.start_volts = [0.0, 0.0]
+    def __str__(self):
+        return self.visa_id
+    def open(self, port_in):
+        self.visa_id = port_in
+        return self.visa_id
+    def close(self):
+        self.visa_id = ""
+        return True
+
+    def get_volts(self, channel):
+        target = self.setpoint[channel] if self.output_on[channel] else 0.0
+        if (self.ramp_time <= 0):
+            return target
+        progress = min((time.time() - self.switch_time[channel])/self.ramp_time, 1.0)
+        return self.start_volts[channel] + (target - self.start_volts[channel])*progress
+
+    def is_powered(self):
+        return all(self.output_on[channel] and self.get_volts(channel) >= 0.9*self.setpoint[channel]
+                   for channel in range(2))
+
+    def switch_output(self, channel, on):
+        self.start_volts[channel] = self.get_volts(channel)
+        self.output_on[channel] = on
+        self.switch_time[channel] = time.time()
+
+    def query(self, query_in):
+        if (query_in == "MEAS:VOLT?"):
+            return self.get_volts(self.channel)
+        elif (query_in == "MEAS:CURR?"):
+            return 0.02*self.get_volts(self.channel)/max(self.setpoint[self.channel], 1)
+        else:
+            return 0
+
+    def write(self, data):
+        if (data.startswith("INST:SEL")):
+            self.channel = int(data.split(" ")[1])
+        elif (data.startswith("APPL")):
+            self.setpoint[self.channel] = float(data.split(" ")[1].split(",")[0])
+        elif (data.startswith("OUTP:STAT")):
+            self.switch_output(self.channel, data.split(" ")[1] == "1")
+        elif (data.startswith("OUTP:ALL")):
+            for channel in range(2):
+                self.switch_output(channel, data.split(" ")[1] == "1")
+        return True
+
+'''
+Complete virtual tester: Arduino_Sim + DMM_Sim + PSU_Sim measuring one Array_Sim, so the test flows
+can run (and be timed) without hardware. The DMM reads open everywhere while the PSU is off,
+like the real tester boards.
+Parameters:
+    array: Array_Sim to measure, None for a fault-free array
+    serial_byte_time: Seconds per serial byte (10/115200 at 115200 baud)
+    mux_settle_time: Seconds the firmware waits before acknowledging a command
+    dmm_latency: Seconds of fixed overhead per DMM reading
+    dmm_jitter: Max random seconds added to each DMM reading
+    psu_ramp_time: Seconds for the PSU outputs to ramp on/off
+'''
+class Tester_Sim:
+    def __init__(self, array=None, serial_byte_time=0.0, mux_settle_time=0.0, dmm_latency=0.0,
+                 dmm_jitter=0.0, psu_ramp_time=0.0):
+        self.array = array if array is not None else Array_Sim()
+        self.arduino = Arduino_Sim()
+        self.arduino.byte_time = serial_byte_time
+        self.arduino.settle_time = mux_settle_time
+        self.psu = PSU_Sim(psu_ramp_time)
+        self.dmm = DMM_Sim(self.arduino, self.array, self.psu, dmm_latency, dmm_jitter)
+        print("FOR DEBUGGING USE ONLY, SIMULATED TESTER CREATED")